@@ -0,0 +1,14 @@
+"""mysite URL Configuration with the async polls pages.
+
+``ROOT_URLCONF`` points here when ``POLLS_ASYNC_VIEWS`` is set; the
+other URLs are those of ``mysite.urls``.
+"""
+from django.urls import include, path
+
+from polls.urls import app_name, async_urlpatterns
+from . import urls
+
+urlpatterns = [
+    path('polls/', include((async_urlpatterns, app_name))),
+] + [pattern for pattern in urls.urlpatterns
+     if getattr(pattern, 'app_name', None) != app_name]
@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,7 +41,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'polls.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'polls.middleware.PrimaryPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -50,7 +52,11 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'mysite.urls'
+# POLLS_ASYNC_VIEWS serves the polls index, detail, vote and results pages
+# with the async views in polls/async_views.py; it only pays off under
+# ASGI (mysite/asgi.py), since WSGI runs each one in its own event loop.
+POLLS_ASYNC_VIEWS = config("POLLS_ASYNC_VIEWS", default=False, cast=bool)
+ROOT_URLCONF = 'mysite.async_urls' if POLLS_ASYNC_VIEWS else 'mysite.urls'
 
 TEMPLATES = [
     {
@@ -81,6 +87,39 @@ DATABASES = {
     }
 }
 
+# DATABASE_PROFILE=tuned keeps connections open between requests and
+# switches SQLite to WAL so vote writes no longer block results readers.
+# The PRAGMAs run on each new connection (see polls/sqlite.py); bench_sqlite
+# measures the same POLLS_SQLITE_TUNED_PRAGMAS.
+DATABASE_PROFILE = config("DATABASE_PROFILE", default='default')
+POLLS_SQLITE_TUNED_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 268435456,
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+}
+POLLS_SQLITE_PRAGMAS = {}
+if DATABASE_PROFILE == 'tuned':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': config("DB_CONN_MAX_AGE", default=600, cast=int),
+        'OPTIONS': {'timeout': 20},
+    })
+    POLLS_SQLITE_PRAGMAS = POLLS_SQLITE_TUNED_PRAGMAS
+
+# Read replicas for the polls app. DB_REPLICA_FILES lists SQLite files
+# (e.g. copies of db.sqlite3) that stand in for replicas locally; polls
+# reads go to them and writes to 'default' (see polls/routers.py).
+for _index, _name in enumerate(config("DB_REPLICA_FILES", default='',
+                                      cast=Csv())):
+    DATABASES['replica%d' % (_index + 1)] = dict(
+        DATABASES['default'], NAME=_name, TEST={'MIRROR': 'default'})
+POLLS_READ_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+POLLS_PRIMARY_PIN_SECONDS = config("POLLS_PRIMARY_PIN_SECONDS", default=10,
+                                   cast=int)
+DATABASE_ROUTERS = ['polls.routers.PrimaryReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -125,4 +164,130 @@ USE_TZ = True
 STATIC_URL = '/static/style.css/'
 LOGIN_REDIRECT_URL = '/polls'
 LOGOUT_REDIRECT_URL = '/polls'
-AUTHENTICATION_BACKENDS = ('django.contrib.auth.backends.ModelBackend',)
\ No newline at end of file
+
+# Sessions: SESSION_STORE 'db' keeps them in the database, 'cached_db'
+# reads them from the SESSION_CACHE_ALIAS cache and writes through to the
+# database, and 'signed_cookies' keeps them in the browser, signed with
+# SECRET_KEY, so they cost no query (but the vote map travels in the
+# cookie and a copied cookie outlives logout). 'cached_db' needs a cache
+# shared by every worker: in a per-process cache such as the default
+# LocMemCache each worker keeps its own copy of a session until the
+# session expires, so a logout is not seen by the others and a stale
+# copy can overwrite newer data (check polls.W001 warns about it).
+# With POLLS_CACHED_USERS the logged-in user is loaded from the default
+# cache too (see polls/auth.py); with a per-process cache a password
+# change may take POLLS_USER_CACHE_TIMEOUT seconds to reach other workers.
+SESSION_STORE = config("SESSION_STORE", default='db')
+SESSION_ENGINE = 'django.contrib.sessions.backends.%s' % SESSION_STORE
+SESSION_CACHE_ALIAS = config("SESSION_CACHE_ALIAS", default='default')
+POLLS_CACHED_USERS = config("POLLS_CACHED_USERS", default=False, cast=bool)
+POLLS_USER_CACHE_TIMEOUT = config("POLLS_USER_CACHE_TIMEOUT", default=300,
+                                  cast=int)
+# ModelBackend stays listed so sessions started before POLLS_CACHED_USERS
+# was turned on remain logged in.
+AUTHENTICATION_BACKENDS = (
+    ('polls.auth.CachedModelBackend',) if POLLS_CACHED_USERS else ()
+) + ('django.contrib.auth.backends.ModelBackend',)
+# Each session remembers the user's POLLS_SESSION_VOTES most recent votes
+# for the detail page; older ones cost a query when shown.
+POLLS_SESSION_VOTES = config("POLLS_SESSION_VOTES", default=200, cast=int)
+
+
+# Polls
+# Seconds a sharded question's summed vote counts stay cached.
+POLLS_SHARD_CACHE_TIMEOUT = config("POLLS_SHARD_CACHE_TIMEOUT", default=2,
+                                   cast=int)
+
+# 'sync' writes each vote in the request; 'buffered' appends it to the
+# spool file below and leaves the write to `manage.py flush_votes`.
+POLLS_VOTE_INGESTION = config("POLLS_VOTE_INGESTION", default='sync')
+POLLS_VOTE_SPOOL = config("POLLS_VOTE_SPOOL",
+                          default=str(BASE_DIR / 'vote_spool.sqlite3'))
+
+# Polls shown per index page, and the longest an index page stays cached.
+POLLS_INDEX_PAGE_SIZE = config("POLLS_INDEX_PAGE_SIZE", default=50, cast=int)
+POLLS_INDEX_CACHE_TIMEOUT = config("POLLS_INDEX_CACHE_TIMEOUT", default=300,
+                                   cast=int)
+
+# Seconds between tally reads for live results, and between keep-alives.
+POLLS_LIVE_INTERVAL = config("POLLS_LIVE_INTERVAL", default=1.0, cast=float)
+POLLS_LIVE_HEARTBEAT = config("POLLS_LIVE_HEARTBEAT", default=15, cast=int)
+
+# Seconds after end_date before a poll's results are frozen in a snapshot,
+# and where archive_votes writes the raw votes of old polls.
+POLLS_SNAPSHOT_GRACE = config("POLLS_SNAPSHOT_GRACE", default=60, cast=int)
+POLLS_ARCHIVE_DIR = config("POLLS_ARCHIVE_DIR",
+                           default=str(BASE_DIR / 'archive'))
+
+# Seconds a rendered choice list or results table stays cached; entries
+# are keyed on the question's version, so edits and votes replace them.
+POLLS_FRAGMENT_CACHE_TIMEOUT = config("POLLS_FRAGMENT_CACHE_TIMEOUT",
+                                      default=600, cast=int)
+
+# Hot polls: the POLLS_HOT_SIZE most viewed questions of each process, with
+# counts halved every POLLS_HOT_WINDOW views. A warming pass loads their
+# choices and results, and those of polls opening within POLLS_WARM_LEAD
+# seconds; each web process starts one at most every POLLS_WARM_INTERVAL
+# seconds (0 turns that off). run_poll_scheduler warms too, but it sees no
+# hits and fills its own cache: with a per-process cache such as the
+# default LocMemCache its passes, like its warming when polls open or
+# close, never reach the web workers.
+# A request missing an entry another is already loading waits up to
+# POLLS_FILL_WAIT seconds for it.
+POLLS_HOT_SIZE = config("POLLS_HOT_SIZE", default=20, cast=int)
+POLLS_HOT_WINDOW = config("POLLS_HOT_WINDOW", default=10000, cast=int)
+POLLS_WARM_LEAD = config("POLLS_WARM_LEAD", default=60, cast=int)
+POLLS_WARM_INTERVAL = config("POLLS_WARM_INTERVAL", default=30, cast=int)
+POLLS_FILL_WAIT = config("POLLS_FILL_WAIT", default=5, cast=float)
+
+# Vote rate limits: each user and each client IP get a bucket of BURST
+# votes refilled at RATE per second. POLLS_RATELIMIT is 'local' (per
+# process), 'cache' (shared through the default cache) or 'off'.
+# Only trust X-Forwarded-For behind a proxy that sets it.
+POLLS_RATELIMIT = config("POLLS_RATELIMIT", default='local')
+POLLS_VOTE_RATE = config("POLLS_VOTE_RATE", default=1.0, cast=float)
+POLLS_VOTE_BURST = config("POLLS_VOTE_BURST", default=10, cast=int)
+POLLS_VOTE_IP_RATE = config("POLLS_VOTE_IP_RATE", default=20.0, cast=float)
+POLLS_VOTE_IP_BURST = config("POLLS_VOTE_IP_BURST", default=200, cast=int)
+POLLS_TRUST_X_FORWARDED_FOR = config("POLLS_TRUST_X_FORWARDED_FOR",
+                                     default=False, cast=bool)
+
+# Audit log of logins, logouts and votes (see polls/audit.py): NDJSON
+# appended by a background thread in batches of up to POLLS_AUDIT_BATCH
+# records and rotated at POLLS_AUDIT_MAX_BYTES, keeping POLLS_AUDIT_BACKUPS
+# old files. Records beyond POLLS_AUDIT_QUEUE_SIZE waiting ones are
+# dropped rather than waited for. An empty POLLS_AUDIT_LOG turns it off;
+# the tests write it to a temporary directory (see TEST_RUNNER).
+POLLS_AUDIT_LOG = config("POLLS_AUDIT_LOG",
+                         default=str(BASE_DIR / 'logs' / 'audit.ndjson'))
+POLLS_AUDIT_BATCH = config("POLLS_AUDIT_BATCH", default=100, cast=int)
+POLLS_AUDIT_MAX_BYTES = config("POLLS_AUDIT_MAX_BYTES",
+                               default=10 * 1024 * 1024, cast=int)
+POLLS_AUDIT_BACKUPS = config("POLLS_AUDIT_BACKUPS", default=5, cast=int)
+POLLS_AUDIT_QUEUE_SIZE = config("POLLS_AUDIT_QUEUE_SIZE", default=10000,
+                                cast=int)
+
+# Per-view timing (see polls.middleware.ProfilingMiddleware): off unless
+# POLLS_PROFILING is set. Figures cover the last POLLS_PROFILING_WINDOW
+# requests per view and are logged every POLLS_PROFILING_LOG_INTERVAL s.
+POLLS_PROFILING = config("POLLS_PROFILING", default=False, cast=bool)
+POLLS_PROFILING_WINDOW = config("POLLS_PROFILING_WINDOW", default=1000,
+                                cast=int)
+POLLS_PROFILING_LOG_INTERVAL = config("POLLS_PROFILING_LOG_INTERVAL",
+                                      default=60, cast=int)
+
+# Keeps the tests' audit events out of POLLS_AUDIT_LOG.
+TEST_RUNNER = 'polls.tests.runner.PollsTestRunner'
+
+# The polls loggers print INFO and above to the console; the audit log
+# has its own pipeline and does not propagate here.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'polls': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
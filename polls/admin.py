@@ -1,6 +1,89 @@
 """Admin page modifier, adding objects (Question ,Choice) to admin page."""
+import csv
+
 from django.contrib import admin
-from .models import Question, Choice
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path
+from django.utils.functional import cached_property
+from . import search
+from .models import Question, Choice, Vote
+
+BALLOT_FIELDS = ['question', 'user', 'choice', 'voted_at']
+
+
+class Echo:
+    """File-like object whose ``write`` hands back what it was given."""
+
+    def write(self, value):
+        """Return `value` instead of buffering it."""
+        return value
+
+
+def ballot_rows(question_ids, chunk_size=2000):
+    """Yield the CSV lines of the votes cast in `question_ids`."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(BALLOT_FIELDS)
+    rows = Vote.objects.filter(question__in=question_ids)\
+        .values_list('question', 'user__username',
+                     'selected_choice__choice_text', 'voted_at')\
+        .order_by('pk').iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ballots_response(question_ids, filename):
+    """Return a streamed CSV download of the votes in `question_ids`."""
+    response = StreamingHttpResponse(ballot_rows(question_ids),
+                                     content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="%s"' % filename
+    return response
+
+
+def estimate_rows(queryset):
+    """Return a cheap estimate of the number of rows in the table.
+
+    PostgreSQL keeps one in its statistics; elsewhere the highest primary
+    key is read from the index, which overcounts by the deleted rows.
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class "
+                           "WHERE relname = %s", [model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return row[0]
+    return model._default_manager.using(queryset.db)\
+        .aggregate(last=Max('pk'))['last'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that counts at most ``exact_limit`` rows exactly.
+
+    Past the limit the whole table's size is estimated, and a filtered
+    list is reported as ``exact_limit`` rows long.
+    """
+
+    exact_limit = 10000
+
+    @cached_property
+    def count(self):
+        """Return the exact count, or an estimate for big lists."""
+        queryset = self.object_list
+        count = queryset.order_by().values('pk')[:self.exact_limit + 1]\
+            .count()
+        if count <= self.exact_limit:
+            return count
+        if queryset.query.where:
+            return self.exact_limit
+        return max(count, estimate_rows(queryset))
 
 
 # Register your models here.
@@ -10,6 +93,7 @@ class ChoiceInline(admin.StackedInline):
 
     model = Choice
     extra = 3
+    readonly_fields = ['votes']
 
 
 class QuestionAdmin(admin.ModelAdmin):
@@ -19,12 +103,61 @@ class QuestionAdmin(admin.ModelAdmin):
         (None, {'fields': ['question_text']}),
         ('Date information', {'fields': ['pub_date', 'end_date'],
                               'classes': ['collapse']}),
+        ('Vote counting', {'fields': ['counter_shards'],
+                           'classes': ['collapse']}),
     ]
     inlines = [ChoiceInline]
-    list_display = ('question_text', 'pub_date', 'end_date',
-                    'was_published_recently')
-    list_filter = ['pub_date']
-    search_fields = ['question_text']
+    list_display = ('question_text', 'pub_date', 'end_date', 'status',
+                    'choice_count', 'vote_total', 'was_published_recently')
+    list_filter = ['status', 'pub_date', 'end_date']
+    ordering = ['-pub_date', '-id']
+    search_fields = ['^question_text']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['export_ballots']
+
+    def get_queryset(self, request):
+        """Add each question's choice count to the changelist query."""
+        choices = Choice.objects.filter(question=OuterRef('pk')).order_by()\
+            .values('question').annotate(count=Count('pk')).values('count')
+        return super().get_queryset(request).annotate(choice_count=Coalesce(
+            Subquery(choices, output_field=IntegerField()), 0))
+
+    @admin.display(description='Choices', ordering='choice_count')
+    def choice_count(self, question):
+        """Return the number of choices of `question`."""
+        return question.choice_count
+
+    def get_search_results(self, request, queryset, search_term):
+        """Search question text with FTS5 when the index is installed.
+
+        Otherwise fall back to the prefix search of ``search_fields``.
+        """
+        if search.is_available(queryset.db):
+            return search.matching(queryset, search_term), False
+        return super().get_search_results(request, queryset, search_term)
+
+    def get_urls(self):
+        """Add the ballot download to the question admin URLs."""
+        return [
+            path('<int:pk>/ballots.csv',
+                 self.admin_site.admin_view(self.ballots_view),
+                 name='polls_question_ballots'),
+        ] + super().get_urls()
+
+    def ballots_view(self, request, pk):
+        """Stream one question's votes as CSV."""
+        question = get_object_or_404(Question, pk=pk)
+        if not self.has_view_permission(request, question):
+            raise PermissionDenied
+        return ballots_response([question.pk],
+                                'question-%d-ballots.csv' % question.pk)
+
+    @admin.action(description="Download ballots of selected questions (CSV)")
+    def export_ballots(self, request, queryset):
+        """Stream the votes of the selected questions as one CSV."""
+        return ballots_response(list(queryset.values_list('pk', flat=True)),
+                                'ballots.csv')
 
 
 admin.site.register(Question, QuestionAdmin)
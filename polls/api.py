@@ -0,0 +1,146 @@
+"""Read-only JSON API for poll listings and results.
+
+Results responses carry a strong ETag built from the question's results
+version, which every vote and every edit of the poll bumps, so a
+matching ``If-None-Match`` is answered with 304 after one primary key
+lookup and without aggregating anything.
+"""
+import hashlib
+import json
+
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition, require_GET
+
+from . import caching
+from .models import Question
+
+CURVE_STEPS = ('minute', 'hour', 'day')
+
+
+def question_state(question):
+    """Return ``(version, last_modified)`` naming the question's results."""
+    if question.is_sharded:
+        # Sharded votes leave the question row alone; the cached shard
+        # sums are what the page would show, so they name the version.
+        counts = sorted(question.shard_counts().items())
+        return '%d-s%s' % (question.results_version, hashlib.md5(
+            repr(counts).encode()).hexdigest()[:12]), None
+    return (question.results_version,
+            question.results_modified or question.pub_date)
+
+
+def results_state(request, pk):
+    """Return ``(version, last_modified, question)`` for a question.
+
+    The lookup is memoized on the request because the ETag and the
+    Last-Modified callbacks and the view itself all need it.
+    """
+    states = request.__dict__.setdefault('polls_results_state', {})
+    if pk not in states:
+        question = Question.objects.filter(pk=pk).first()
+        if question is None:
+            raise Http404("No question matches the given query.")
+        states[pk] = question_state(question) + (question,)
+    return states[pk]
+
+
+def results_etag(kind):
+    """Return an ETag callback for the `kind` representation of results."""
+    def etag(request, pk, **kwargs):
+        return '"%s-%d-%s"' % (kind, pk, results_state(request, pk)[0])
+    return etag
+
+
+def results_last_modified(request, pk, **kwargs):
+    """Return when the question's results last changed, if known."""
+    return results_state(request, pk)[1]
+
+
+@require_GET
+def question_list(request):
+    """Return one page of published questions."""
+    questions, next_cursor, _ = caching.index_page(
+        request.GET.get('before'))
+    data = {
+        'questions': [{
+            'id': question.pk,
+            'question_text': question.question_text,
+            'pub_date': question.pub_date.isoformat(),
+            'end_date': question.end_date and question.end_date.isoformat(),
+            'open': question.open_now,
+        } for question in questions],
+        'next': next_cursor,
+    }
+    content = json.dumps(data).encode()
+    etag = quote_etag(hashlib.md5(content).hexdigest())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(data)
+        response['ETag'] = etag
+    return response
+
+
+@require_GET
+@condition(etag_func=results_etag('json'),
+           last_modified_func=results_last_modified)
+def question_results(request, pk):
+    """Return the vote counts and percentages of one question."""
+    question = results_state(request, pk)[2]
+    return JsonResponse({
+        'id': question.pk,
+        'question_text': question.question_text,
+        'total_votes': question.total_votes(),
+        'choices': [{
+            'id': choice.pk,
+            'choice_text': choice.choice_text,
+            'votes': choice.votes,
+            'percent': round(choice.percent, 1),
+        } for choice in question.results()],
+    })
+
+
+def parse_bound(value):
+    """Return the ISO 8601 `value` as an aware datetime, or None if empty.
+
+    Raise ValueError if it is not a date and time.
+    """
+    if not value:
+        return None
+    when = parse_datetime(value)
+    if when is None:
+        raise ValueError(value)
+    if timezone.is_naive(when):
+        when = timezone.make_aware(when)
+    return when
+
+
+@require_GET
+@condition(etag_func=results_etag('curve'),
+           last_modified_func=results_last_modified)
+def question_curve(request, pk):
+    """Return one question's votes per choice over time.
+
+    ``step`` is minute, hour (the default) or day; ``since`` and ``until``
+    optionally bound the range. Counts come from the per-minute tallies.
+    """
+    step = request.GET.get('step', 'hour')
+    if step not in CURVE_STEPS:
+        return HttpResponseBadRequest("step must be one of %s."
+                                      % ", ".join(CURVE_STEPS))
+    try:
+        since = parse_bound(request.GET.get('since'))
+        until = parse_bound(request.GET.get('until'))
+    except ValueError:
+        return HttpResponseBadRequest("since and until must be ISO 8601.")
+    question = results_state(request, pk)[2]
+    buckets = []
+    for row in question.vote_curve(since, until, step):
+        if not buckets or buckets[-1]['start'] != row['bucket'].isoformat():
+            buckets.append({'start': row['bucket'].isoformat(), 'votes': {}})
+        buckets[-1]['votes'][row['choice']] = row['votes']
+    return JsonResponse({'id': question.pk, 'step': step,
+                         'buckets': buckets})
@@ -6,3 +6,49 @@ class PollsConfig(AppConfig):
     """Set app name to 'polls'."""
 
     name = 'polls'
+
+    def ready(self):
+        """Connect the cache invalidation and database signals."""
+        from django.contrib.auth import get_user_model
+        from django.core import checks
+        from django.contrib.auth.signals import (user_logged_in,
+                                                user_logged_out,
+                                                user_login_failed)
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import (post_migrate, post_save,
+                                              post_delete)
+        from . import audit, auth
+        from .caching import question_changed, results_changed, status_changed
+        from .lifecycle import poll_opened, poll_closed
+        from .models import Question, Choice
+        from .search import install_fts
+        from .sqlite import apply_pragmas
+        from .votestate import fill_on_login
+        checks.register(auth.check_session_cache)
+        connection_created.connect(apply_pragmas,
+                                   dispatch_uid='polls_sqlite_pragmas')
+        post_migrate.connect(install_fts, sender=self,
+                             dispatch_uid='polls_install_fts')
+        user_logged_in.connect(fill_on_login,
+                               dispatch_uid='polls_fill_vote_state')
+        user_logged_in.connect(audit.logged_in,
+                               dispatch_uid='polls_audit_login')
+        user_login_failed.connect(audit.login_failed,
+                                  dispatch_uid='polls_audit_login_failed')
+        user_logged_out.connect(audit.logged_out,
+                                dispatch_uid='polls_audit_logout')
+        poll_opened.connect(status_changed, dispatch_uid='polls_opened')
+        poll_closed.connect(status_changed, dispatch_uid='polls_closed')
+        post_save.connect(question_changed, sender=Question,
+                          dispatch_uid='polls_question_saved')
+        post_delete.connect(question_changed, sender=Question,
+                            dispatch_uid='polls_question_deleted')
+        post_save.connect(auth.user_changed, sender=get_user_model(),
+                          dispatch_uid='polls_user_saved')
+        post_delete.connect(auth.user_changed, sender=get_user_model(),
+                            dispatch_uid='polls_user_deleted')
+        for model in (Question, Choice):
+            post_save.connect(results_changed, sender=model,
+                              dispatch_uid='polls_results_saved')
+            post_delete.connect(results_changed, sender=model,
+                                dispatch_uid='polls_results_deleted')
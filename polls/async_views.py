@@ -0,0 +1,135 @@
+"""Async versions of the busiest polls pages, for ASGI deployments.
+
+Under ASGI a sync view runs on a worker thread together with the
+middleware around it. These views run on the event loop and make one
+``sync_to_async`` call per request for everything that needs the
+database: the session, the user, the question and its choices. The
+page is then rendered on the loop from what that call returned. Django
+3.2 has no async ORM, so this is as little thread time as a request can
+take. ``POLLS_ASYNC_VIEWS`` routes the index, detail, vote and results
+URLs here (see ``mysite.async_urls``).
+"""
+from calendar import timegm
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponseNotAllowed
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from . import api, ratelimit, views
+
+
+def load_user(request):
+    """Load the request's user, and with it the session.
+
+    Templates can then read both on the event loop without a query.
+    """
+    return request.user.is_authenticated
+
+
+def login_redirect(request):
+    """Return a redirect to the login page unless the user is logged in."""
+    if not load_user(request):
+        return redirect_to_login(request.get_full_path())
+    return None
+
+
+def index_context(request):
+    """Return the index page context."""
+    view = views.IndexView()
+    view.setup(request)
+    view.object_list = view.get_queryset()
+    load_user(request)
+    return view.get_context_data()
+
+
+async def index(request):
+    """Show a page of published polls."""
+    context = await sync_to_async(index_context)(request)
+    return render(request, 'polls/index.html', context)
+
+
+def navigate(request, question_id):
+    """Run ``views.navigate`` for a logged-in user."""
+    return login_redirect(request) or views.navigate(request, question_id)
+
+
+async def polls_navigate(request, question_id):
+    """Navigate to index if poll expired if not go to its detail."""
+    outcome = await sync_to_async(navigate)(request, question_id)
+    return views.respond(request, outcome)
+
+
+def cast_vote(request, question_id, store, ip_checked):
+    """Run ``views.cast_vote`` for a logged-in user within their rate.
+
+    The client IP's rate is checked here too unless `ip_checked`.
+    """
+    wait = store and ((not ip_checked and ratelimit.ip_wait(request, store))
+                      or ratelimit.user_wait(request, store))
+    if wait:
+        return ratelimit.too_many_votes(wait)
+    return login_redirect(request) or views.cast_vote(request, question_id)
+
+
+async def vote(request, question_id):
+    """Vote mechanism for polls app.
+
+    With the in-memory store the client IP's rate is checked on the
+    event loop, so a flood of votes is turned away without taking a
+    thread. The cache store does network I/O, so it is checked in the
+    thread with the rest.
+    """
+    store = ratelimit.get_store()
+    on_loop = isinstance(store, ratelimit.LocalStore)
+    wait = on_loop and ratelimit.ip_wait(request, store)
+    if wait:
+        return ratelimit.too_many_votes(wait)
+    outcome = await sync_to_async(cast_vote)(request, question_id, store,
+                                             on_loop)
+    return views.respond(request, outcome)
+
+
+def validators(request, pk):
+    """Return the results page's quoted ETag and Last-Modified timestamp."""
+    last_modified = api.results_last_modified(request, pk)
+    return (quote_etag(api.results_etag('html')(request, pk)),
+            last_modified and timegm(last_modified.utctimetuple()))
+
+
+def results_context(request, pk):
+    """Return a 304 response if the client's copy is current, else a context.
+
+    The choices are loaded here, on the worker thread, and come from the
+    cache unless the results changed since they were last counted.
+    """
+    etag, last_modified = validators(request, pk)
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified)
+    if response is not None:
+        return response
+    view = views.ResultsView()
+    view.setup(request, pk=pk)
+    view.object = view.get_object()
+    context = view.get_context_data(object=view.object)
+    # The template may skip them if its fragment is cached, but that
+    # entry can expire before rendering, which must not query.
+    context['choices'] = list(context['choices'])
+    context['total_votes'] = view.object.total_votes()
+    return context
+
+
+async def results(request, pk):
+    """Show the results of a poll, or 304 if the client has them."""
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    outcome = await sync_to_async(results_context)(request, pk)
+    etag, last_modified = validators(request, pk)
+    if isinstance(outcome, dict):
+        outcome = render(request, 'polls/results.html', outcome)
+    if last_modified and not outcome.has_header('Last-Modified'):
+        outcome['Last-Modified'] = http_date(last_modified)
+    outcome.setdefault('ETag', etag)
+    return outcome
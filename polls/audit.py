@@ -0,0 +1,188 @@
+"""Audit log of logins, logouts and votes, written off the request thread.
+
+``event`` puts a record on a bounded queue through a ``QueueHandler`` and
+returns; a ``BatchListener`` thread takes whatever has queued up, up to
+``POLLS_AUDIT_BATCH`` records, and appends it to ``POLLS_AUDIT_LOG`` as
+one line of JSON per record in a single write. The file is rotated at
+``POLLS_AUDIT_MAX_BYTES``. A full queue drops records rather than make
+the request wait; the count is logged when the pipeline stops.
+"""
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+from django.conf import settings
+
+from .ratelimit import get_client_ip
+
+log = logging.getLogger("polls")
+audit_log = logging.getLogger("polls.audit")
+audit_log.setLevel(logging.INFO)
+audit_log.propagate = False
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue records without ever blocking, counting those that don't fit."""
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Audit records go to this handler only and carry no arguments
+        # or exceptions, so they are queued as they are, not copied.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class NdjsonFileHandler(logging.handlers.RotatingFileHandler):
+    """Write records as JSON lines, a batch at a time."""
+
+    def format(self, record):
+        data = {
+            'time': datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc).isoformat(
+                timespec='milliseconds'),
+            'event': record.getMessage(),
+        }
+        data.update(getattr(record, 'audit', {}))
+        return json.dumps(data, default=str)
+
+    def handle_batch(self, records):
+        """Append `records` with one write, rotating the file first if full."""
+        lines = ''.join(self.format(record) + self.terminator
+                        for record in records)
+        self.acquire()
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes and self.stream.tell() \
+                    and self.stream.tell() + len(lines) > self.maxBytes:
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+            self.stream.write(lines)
+            self.stream.flush()
+        finally:
+            self.release()
+
+
+class BatchListener(logging.handlers.QueueListener):
+    """Hand the handlers every record waiting, up to `batch_size` at once."""
+
+    def __init__(self, queue, handler, batch_size=100):
+        super().__init__(queue, handler)
+        self.batch_size = batch_size
+        self.stopping = False
+
+    def enqueue_sentinel(self):
+        # Wait for room: stopping must not fail on a full queue.
+        self.queue.put(self._sentinel)
+
+    def dequeue(self, block):
+        # The sentinel taken by ``handle`` is handed back to the loop
+        # here; putting it back could find the queue full again.
+        if self.stopping:
+            return self._sentinel
+        return super().dequeue(block)
+
+    def handle(self, record):
+        records = [record]
+        while len(records) < self.batch_size:
+            try:
+                record = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is self._sentinel:
+                # Stopping: write this batch, then let the loop see it.
+                self.stopping = True
+                break
+            self.queue.task_done()
+            records.append(record)
+        for handler in self.handlers:
+            handler.handle_batch(records)
+
+
+_lock = threading.Lock()
+_pipeline = None
+
+
+def start():
+    """Start the pipeline if ``POLLS_AUDIT_LOG`` is set; return its handler."""
+    global _pipeline
+    with _lock:
+        if _pipeline is None:
+            path = getattr(settings, 'POLLS_AUDIT_LOG', '')
+            if not path:
+                return None
+            os.makedirs(os.path.dirname(os.path.abspath(path)),
+                        exist_ok=True)
+            records = queue.Queue(getattr(settings, 'POLLS_AUDIT_QUEUE_SIZE',
+                                          10000))
+            handler = DroppingQueueHandler(records)
+            listener = BatchListener(records, NdjsonFileHandler(
+                path, maxBytes=getattr(settings, 'POLLS_AUDIT_MAX_BYTES', 0),
+                backupCount=getattr(settings, 'POLLS_AUDIT_BACKUPS', 0),
+                encoding='utf-8', delay=True),
+                getattr(settings, 'POLLS_AUDIT_BATCH', 100))
+            audit_log.addHandler(handler)
+            listener.start()
+            _pipeline = (handler, listener)
+        return _pipeline[0]
+
+
+def stop():
+    """Write out the queued records and stop the pipeline."""
+    global _pipeline
+    with _lock:
+        if _pipeline is None:
+            return
+        handler, listener = _pipeline
+        _pipeline = None
+        audit_log.removeHandler(handler)
+    listener.stop()
+    for target in listener.handlers:
+        target.close()
+    if handler.dropped:
+        log.warning("Audit log dropped %d record(s) on a full queue.",
+                    handler.dropped)
+
+
+atexit.register(stop)
+
+
+def event(name, request=None, **fields):
+    """Record the audit event `name` with `fields` and the client's IP."""
+    if _pipeline is None and start() is None:
+        return
+    if request is not None:
+        fields['ip'] = get_client_ip(request)
+    # makeRecord skips the caller lookup of Logger.info, half the cost.
+    audit_log.handle(audit_log.makeRecord(audit_log.name, logging.INFO, '', 0,
+                                          name, None, None,
+                                          extra={'audit': fields}))
+
+
+def logged_in(sender, request, user, **kwargs):
+    """Signal receiver for ``user_logged_in``."""
+    event('login', request, user=user.get_username())
+
+
+def login_failed(sender, credentials, request=None, **kwargs):
+    """Signal receiver for ``user_login_failed``."""
+    event('login_failed', request, user=credentials.get('username'))
+
+
+def logged_out(sender, request, user, **kwargs):
+    """Signal receiver for ``user_logged_out``."""
+    event('logout', request, user=user and user.get_username())
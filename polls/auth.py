@@ -0,0 +1,60 @@
+"""Authentication backend that keeps logged-in users in the cache.
+
+``AuthenticationMiddleware`` loads the user of every authenticated
+request. ``CachedModelBackend`` serves it from the default cache for
+``POLLS_USER_CACHE_TIMEOUT`` seconds instead of selecting the row again.
+Saving or deleting a user drops its entry, so a password change or a
+deactivation applies on the next request. With a per-process cache such
+as LocMemCache that only holds for the process that made the change;
+the others notice within the timeout. ``check_session_cache`` warns when
+sessions are cached in such a per-process cache.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core import checks
+from django.core.cache import cache
+
+
+def user_key(user_id):
+    """Return the cache key of the user with primary key `user_id`."""
+    return 'polls:user:%s' % user_id
+
+
+class CachedModelBackend(ModelBackend):
+    """``ModelBackend`` whose ``get_user`` reads through the cache."""
+
+    def get_user(self, user_id):
+        key = user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, getattr(
+                    settings, 'POLLS_USER_CACHE_TIMEOUT', 300))
+        return user
+
+
+def user_changed(sender, instance, **kwargs):
+    """Signal receiver that forgets a saved or deleted user."""
+    cache.delete(user_key(instance.pk))
+
+
+def check_session_cache(app_configs=None, **kwargs):
+    """Warn if sessions are cached in a per-process cache.
+
+    Each worker would then keep its own copy of a session until it
+    expires: a logout elsewhere is not seen, and an old copy can be
+    saved over newer data such as the vote map.
+    """
+    engine = settings.SESSION_ENGINE.rsplit('.', 1)[-1]
+    if engine not in ('cache', 'cached_db'):
+        return []
+    alias = settings.SESSION_CACHE_ALIAS
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', '')
+    if not backend.endswith(('LocMemCache', 'DummyCache')):
+        return []
+    return [checks.Warning(
+        "Sessions are cached in the per-process cache %r." % alias,
+        hint="Point SESSION_CACHE_ALIAS at a cache shared by every worker, "
+             "such as Memcached or Redis, or use SESSION_STORE='db'.",
+        id='polls.W001')]
@@ -0,0 +1,527 @@
+"""Data generation and timing helpers for the polls benchmarks.
+
+``seed`` fills the database with synthetic polls, and ``Endpoint`` and
+``measure`` time the polls views through the Django test client. The
+``seed_polls`` and ``bench_polls`` management commands are thin wrappers
+around them.
+"""
+import asyncio
+import datetime
+import io
+import math
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from . import profiling
+from .models import Question, Choice, Vote
+from .ratelimit import limit_votes
+from .utils import BATCH_SIZE, chunks
+
+# The benchmarks clear the cache between runs and fill it from a throwaway
+# database, so they run on this private one; a shared default cache keeps
+# its sessions, cached users and index pages.
+PRIVATE_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'polls-benchmarks',
+    },
+}
+
+def created_after(model, last_pk):
+    """Return the primary keys `model` rows created after `last_pk`."""
+    return list(model.objects.filter(pk__gt=last_pk or 0)
+                .order_by('pk').values_list('pk', flat=True))
+
+
+def last_pk(model):
+    """Return the highest primary key of `model`, or 0."""
+    return model.objects.order_by('-pk').values_list('pk', flat=True)\
+        .first() or 0
+
+
+def seed(questions, choices, votes, rng=None):
+    """Create `questions` open polls with `choices` each and `votes` votes.
+
+    Every user votes at most once per question, so ``ceil(votes /
+    questions)`` users are created. Counters are filled in per choice
+    rather than by replaying each vote. Return the new question ids.
+    """
+    rng = rng or random.Random(0)
+    now = timezone.now()
+    before = last_pk(Question)
+    Question.objects.bulk_create(
+        (Question(question_text='Benchmark question %d' % i,
+                  pub_date=now - datetime.timedelta(days=1, seconds=i),
+                  end_date=now + datetime.timedelta(days=30),
+                  status=Question.OPEN)
+         for i in range(questions)), batch_size=BATCH_SIZE)
+    question_ids = created_after(Question, before)
+    Choice.objects.bulk_create(
+        (Choice(question_id=question_id, choice_text='Choice %d' % i)
+         for question_id in question_ids for i in range(choices)),
+        batch_size=BATCH_SIZE)
+    options = {}
+    for choice_id, question_id in Choice.objects.filter(
+            question__in=question_ids).values_list('pk', 'question'):
+        options.setdefault(question_id, []).append(choice_id)
+    before = last_pk(User)
+    User.objects.bulk_create(
+        (User(username='bench-%d-%d' % (before, i))
+         for i in range(math.ceil(votes / questions))),
+        batch_size=BATCH_SIZE)
+    user_ids = created_after(User, before)
+    counts = Counter()
+    totals = Counter()
+    for batch in chunks(range(votes)):
+        ballots = []
+        for i in batch:
+            question_id = question_ids[i % questions]
+            choice_id = rng.choice(options[question_id])
+            ballots.append(Vote(user_id=user_ids[i // questions],
+                                question_id=question_id,
+                                selected_choice_id=choice_id))
+            counts[choice_id] += 1
+            totals[question_id] += 1
+        Vote.objects.bulk_create(ballots)
+    for choice_id, amount in counts.items():
+        Choice.objects.filter(pk=choice_id).update(votes=amount)
+    for question_id, amount in totals.items():
+        Question.objects.filter(pk=question_id).update(vote_total=amount)
+    return question_ids
+
+
+def percentile(samples, fraction):
+    """Return the `fraction` percentile of `samples` (nearest rank)."""
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Endpoint:
+    """One view to benchmark: a name and how to call it."""
+
+    def __init__(self, name, method, url, data=None, login=False):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.data = data
+        self.login = login
+
+    def call(self, client):
+        """Make one request and return the response."""
+        return getattr(client, self.method)(self.url, self.data)
+
+
+def polls_endpoints(question, choice):
+    """Return the endpoints of the four polls hot paths for `question`."""
+    return [
+        Endpoint('polls:index', 'get', reverse('polls:index')),
+        Endpoint('polls:detail', 'get',
+                 reverse('polls:detail', args=(question.pk,)), login=True),
+        Endpoint('polls:vote', 'post',
+                 reverse('polls:vote', args=(question.pk,)),
+                 {'choice': choice.pk}, login=True),
+        Endpoint('polls:results', 'get',
+                 reverse('polls:results', args=(question.pk,))),
+    ]
+
+
+def measure(endpoint, requests, warmup=5, user=None):
+    """Time `requests` calls of `endpoint` and return a result dict.
+
+    Queries are counted on one extra request, so the timed requests run
+    without the debug cursor.
+    """
+    client = Client()
+    if endpoint.login:
+        client.force_login(user)
+    for _ in range(warmup):
+        endpoint.call(client)
+    with CaptureQueriesContext(connection) as queries:
+        status = endpoint.call(client).status_code
+    query_count = len(queries)
+    samples = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        start = time.perf_counter()
+        endpoint.call(client)
+        samples.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+    return {
+        'endpoint': endpoint.name,
+        'status': status,
+        'requests': requests,
+        'queries': query_count,
+        'p50_ms': round(percentile(samples, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 3),
+        'mean_ms': round(sum(samples) / len(samples) * 1000, 3),
+        'rps': round(requests / elapsed, 1),
+    }
+
+
+def render_times(endpoint, requests, user=None, warm=True):
+    """Return the mean request and template time of `endpoint` in ms.
+
+    Unless `warm`, the cache is cleared before every request so cached
+    pages and fragments are rebuilt each time; run it with
+    ``CACHES=PRIVATE_CACHES``.
+    """
+    profiling.time_templates()
+    client = Client()
+    if endpoint.login:
+        client.force_login(user)
+    endpoint.call(client)
+    wall = template = 0.0
+    for _ in range(requests):
+        if not warm:
+            cache.clear()
+        profile = profiling.RequestProfile()
+        token = profiling.current.set(profile)
+        start = time.perf_counter()
+        try:
+            endpoint.call(client)
+        finally:
+            profiling.current.reset(token)
+        wall += time.perf_counter() - start
+        template += profile.template_seconds
+    return {
+        'endpoint': endpoint.name,
+        'requests': requests,
+        'mean_ms': round(wall / requests * 1000, 3),
+        'template_ms': round(template / requests * 1000, 3),
+    }
+
+
+def auth_settings(session_store, cached_users):
+    """Return the settings for `session_store`, with or without cached users.
+
+    `session_store` is a ``SESSION_STORE`` value: 'db', 'cached_db' or
+    'signed_cookies'.
+    """
+    backends = ['django.contrib.auth.backends.ModelBackend']
+    if cached_users:
+        backends.insert(0, 'polls.auth.CachedModelBackend')
+    return {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.%s' % (
+            session_store),
+        'AUTHENTICATION_BACKENDS': backends,
+    }
+
+
+def compare(baseline, current, tolerance):
+    """Return descriptions of results slower than `baseline` by `tolerance`.
+
+    Runs are matched on data size and endpoint; p50 latency and query
+    counts are compared.
+    """
+    def key(result):
+        return (tuple(sorted(result['size'].items())), result['endpoint'])
+    old = {key(result): result for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        before = old.get(key(result))
+        if before is None:
+            continue
+        if result['p50_ms'] > before['p50_ms'] * (1 + tolerance):
+            regressions.append('%s %s: p50 %.3f ms -> %.3f ms' % (
+                result['endpoint'], result['size'], before['p50_ms'],
+                result['p50_ms']))
+        if result['queries'] > before['queries']:
+            regressions.append('%s %s: %d -> %d queries' % (
+                result['endpoint'], result['size'], before['queries'],
+                result['queries']))
+    return regressions
+
+
+def limiter_overhead(calls, threads=1, keys=1000):
+    """Time the vote rate limiter around a view that does nothing.
+
+    Each of `threads` threads makes `calls` requests spread over `keys`
+    users and IPs. Return the per-request cost in microseconds and the
+    share of requests that were refused.
+    """
+    view = limit_votes(lambda request: HttpResponse())
+    factory = RequestFactory()
+    lock = threading.Lock()
+    samples = []
+    refused = Counter()
+
+    def worker(index):
+        requests = []
+        for i in range(calls):
+            request = factory.post('/', REMOTE_ADDR='10.%d.%d.%d' % (
+                index, i % keys // 256, i % keys % 256))
+            request.session = {SESSION_KEY: str(i % keys)}
+            requests.append(request)
+        times = []
+        for request in requests:
+            start = time.perf_counter()
+            status = view(request).status_code
+            times.append(time.perf_counter() - start)
+            if status == 429:
+                refused[index] += 1
+        with lock:
+            samples.extend(times)
+
+    workers = [threading.Thread(target=worker, args=(i,))
+               for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return {
+        'threads': threads,
+        'requests': len(samples),
+        'mean_us': round(sum(samples) / len(samples) * 1e6, 2),
+        'p50_us': round(percentile(samples, 0.5) * 1e6, 2),
+        'p99_us': round(percentile(samples, 0.99) * 1e6, 2),
+        'refused': round(sum(refused.values()) / len(samples), 3),
+    }
+
+
+def mixed_load(users, question_ids, seconds, write_ratio, reconnect,
+               rng_seed=0):
+    """Run vote/results traffic from one thread per user for `seconds`.
+
+    Each thread votes with probability `write_ratio` and otherwise loads
+    a results page. With `reconnect` every request opens a new database
+    connection, as with ``CONN_MAX_AGE = 0``. Return a result dict with
+    throughput, latency and the number of failed requests.
+    """
+    choices = {}
+    for choice_id, question_id in Choice.objects.filter(
+            question__in=question_ids).values_list('pk', 'question'):
+        choices.setdefault(question_id, []).append(choice_id)
+    deadline = time.perf_counter() + seconds
+    lock = threading.Lock()
+    samples = {'vote': [], 'results': []}
+    errors = Counter()
+
+    def worker(index, user):
+        rng = random.Random(rng_seed + index)
+        client = Client()
+        client.force_login(user)
+        try:
+            while time.perf_counter() < deadline:
+                question_id = rng.choice(question_ids)
+                start = time.perf_counter()
+                try:
+                    if rng.random() < write_ratio:
+                        kind = 'vote'
+                        client.post(reverse('polls:vote', args=(question_id,)),
+                                    {'choice': rng.choice(choices[question_id])})
+                    else:
+                        kind = 'results'
+                        client.get(reverse('polls:results',
+                                           args=(question_id,)))
+                except Exception as error:
+                    with lock:
+                        errors[type(error).__name__] += 1
+                    continue
+                finally:
+                    if reconnect:
+                        connections.close_all()
+                with lock:
+                    samples[kind].append(time.perf_counter() - start)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(i, user))
+               for i, user in enumerate(users)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    result = {'threads': len(users), 'seconds': round(elapsed, 2),
+              'errors': dict(errors)}
+    for kind, times in samples.items():
+        result[kind] = {
+            'requests': len(times),
+            'rps': round(len(times) / elapsed, 1),
+            'p50_ms': round(percentile(times, 0.5) * 1000, 3)
+            if times else None,
+            'p99_ms': round(percentile(times, 0.99) * 1000, 3)
+            if times else None,
+        }
+    return result
+
+
+def slow_clients(users, question_ids, requests, write_ratio, rng_seed=0):
+    """Return ``(cookie, requests)`` for each user's logged-in client.
+
+    Each client makes `requests` requests to the index, detail, results
+    and (with probability `write_ratio`) vote pages of random questions.
+    A request is ``(method, path, body)``; votes carry a CSRF token that
+    matches the client's cookie, as a browser's would.
+    """
+    choices = {}
+    for choice_id, question_id in Choice.objects.filter(
+            question__in=question_ids).values_list('pk', 'question'):
+        choices.setdefault(question_id, []).append(choice_id)
+    clients = []
+    for index, user in enumerate(users):
+        rng = random.Random(rng_seed + index)
+        client = Client()
+        client.force_login(user)
+        token = get_random_string(32)
+        cookie = '%s=%s; %s=%s' % (
+            settings.SESSION_COOKIE_NAME,
+            client.cookies[settings.SESSION_COOKIE_NAME].value,
+            settings.CSRF_COOKIE_NAME, token)
+        batch = []
+        for _ in range(requests):
+            question_id = rng.choice(question_ids)
+            if rng.random() < write_ratio:
+                batch.append(('POST', reverse('polls:vote',
+                                              args=(question_id,)),
+                              urlencode({'choice': rng.choice(
+                                  choices[question_id]),
+                                  'csrfmiddlewaretoken': token}).encode()))
+            else:
+                name = rng.choice(('polls:index', 'polls:detail',
+                                   'polls:results'))
+                args = () if name == 'polls:index' else (question_id,)
+                batch.append(('GET', reverse(name, args=args), b''))
+        clients.append((cookie, batch))
+    return clients
+
+
+def load_result(latencies, statuses, elapsed):
+    """Return throughput, latency and status counts of a load run."""
+    return {
+        'requests': len(latencies),
+        'seconds': round(elapsed, 2),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        'errors': sum(count for status, count in statuses.items()
+                      if status >= 400),
+        'statuses': dict(statuses),
+    }
+
+
+def wsgi_load(clients, threads, delay):
+    """Serve `clients` (see ``slow_clients``) with `threads` WSGI workers.
+
+    Like a threaded WSGI server, a worker reads the request from the
+    client and writes the response back itself, so a client that takes
+    `delay` seconds for each holds the worker all that time. Requests
+    beyond `threads` wait for a free worker.
+    """
+    application = WSGIHandler()
+    latencies, statuses = [], Counter()
+    lock = threading.Lock()
+
+    def serve(method, path, body, cookie):
+        time.sleep(delay)
+        started = []
+        environ = {
+            'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': '',
+            'SERVER_NAME': 'testserver', 'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1', 'REMOTE_ADDR': '127.0.0.1',
+            'HTTP_COOKIE': cookie, 'CONTENT_LENGTH': str(len(body)),
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'wsgi.input': io.BytesIO(body), 'wsgi.errors': io.StringIO(),
+            'wsgi.url_scheme': 'http',
+        }
+        response = application(environ,
+                               lambda status, headers: started.append(status))
+        try:
+            b''.join(response)
+        finally:
+            response.close()
+        time.sleep(delay)
+        return int(started[0].split()[0])
+
+    def client(cookie, batch, pool):
+        for method, path, body in batch:
+            start = time.perf_counter()
+            status = pool.submit(serve, method, path, body, cookie).result()
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                statuses[status] += 1
+
+    with ThreadPoolExecutor(threads) as pool:
+        started = time.perf_counter()
+        runners = [threading.Thread(target=client, args=(cookie, batch, pool))
+                   for cookie, batch in clients]
+        for runner in runners:
+            runner.start()
+        for runner in runners:
+            runner.join()
+        elapsed = time.perf_counter() - started
+    return load_result(latencies, statuses, elapsed)
+
+
+def asgi_load(clients, delay):
+    """Serve `clients` (see ``slow_clients``) with Django's ASGI handler.
+
+    The client's `delay` to send the request and to read the response is
+    spent awaiting ``receive`` and ``send`` on the event loop, as under
+    an ASGI server; only the views' sync work takes a thread.
+    """
+    application = ASGIHandler()
+    latencies, statuses = [], Counter()
+
+    async def serve(method, path, body, cookie):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'},
+            'http_version': '1.1', 'method': method, 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': b'',
+            'root_path': '', 'client': ('127.0.0.1', 50000),
+            'server': ('testserver', 80),
+            'headers': [
+                (b'host', b'testserver'), (b'cookie', cookie.encode()),
+                (b'content-length', str(len(body)).encode()),
+                (b'content-type', b'application/x-www-form-urlencoded'),
+            ],
+        }
+        started = []
+
+        async def receive():
+            await asyncio.sleep(delay)
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                started.append(message['status'])
+            elif not message.get('more_body'):
+                await asyncio.sleep(delay)
+
+        await application(scope, receive, send)
+        return started[0]
+
+    async def client(cookie, batch):
+        for method, path, body in batch:
+            start = time.perf_counter()
+            status = await serve(method, path, body, cookie)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+
+    async def run():
+        await asyncio.gather(*(client(cookie, batch)
+                               for cookie, batch in clients))
+
+    started = time.perf_counter()
+    asyncio.run(run())
+    return load_result(latencies, statuses, time.perf_counter() - started)
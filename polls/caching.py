@@ -0,0 +1,209 @@
+"""Cached pages of the polls index and per-question data.
+
+Each index page is cached under the current listing version, which the
+``Question`` save/delete signals bump, and expires at the next moment a
+poll opens or closes so the listing never shows a stale state. A
+question's choices are cached under its ``edit_version``. Per-question
+entries are filled through ``single_flight``, so a burst of requests for
+a poll that is not cached yet runs its queries once.
+"""
+import datetime
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BooleanField, Case, F, Min, Q, Value, When
+from django.utils import timezone
+
+from .models import Question, ResultSnapshot
+
+INDEX_VERSION_KEY = 'polls:index-version'
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def single_flight(key, load, timeout):
+    """Return the cached value of `key`, calling `load` once on a miss.
+
+    Threads of this process that miss the same key wait for the first
+    one's load. Other processes sharing the cache see a lock entry and
+    poll for the value instead. Nobody waits longer than
+    ``POLLS_FILL_WAIT`` seconds before loading the value themselves.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+    wait = getattr(settings, 'POLLS_FILL_WAIT', 5)
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = threading.Event()
+    if not leader:
+        flight.wait(wait)
+        value = cache.get(key)
+        return load() if value is None else value
+    try:
+        lock_key = key + ':filling'
+        if not cache.add(lock_key, 1, wait):
+            deadline = time.monotonic() + wait
+            while time.monotonic() < deadline:
+                time.sleep(0.01)
+                value = cache.get(key)
+                if value is not None:
+                    return value
+        value = load()
+        cache.set(key, value, timeout)
+        cache.delete(lock_key)
+        return value
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.set()
+
+
+def bump_index_version():
+    """Make every cached index page stale."""
+    if not cache.add(INDEX_VERSION_KEY, 1, None):
+        try:
+            cache.incr(INDEX_VERSION_KEY)
+        except ValueError:
+            cache.set(INDEX_VERSION_KEY, 1, None)
+
+
+def question_changed(**kwargs):
+    """Signal receiver for any Question save or delete."""
+    bump_index_version()
+    # A page filled before the commit could still hold the old rows.
+    transaction.on_commit(bump_index_version)
+
+
+def results_changed(sender, instance, **kwargs):
+    """Signal receiver that bumps the versions of an edited poll."""
+    question_id = instance.pk if sender is Question else instance.question_id
+    Question.objects.filter(pk=question_id).update(
+        results_version=F('results_version') + 1,
+        results_modified=timezone.now(),
+        edit_version=F('edit_version') + 1)
+    # An edited poll is snapshotted again, unless only the snapshot is left.
+    ResultSnapshot.objects.filter(question_id=question_id,
+                                  votes_archived=False).delete()
+
+
+def question_key(question, version):
+    """Return a cache key part naming `question` at `version`.
+
+    The publication time is included so a reused primary key (after a
+    database reset) cannot pick up an old entry.
+    """
+    return '%d.%s.%d' % (question.pk, version,
+                         question.pub_date.timestamp() * 10**6)
+
+
+def question_choices(question):
+    """Return the question's choices, cached until it is next edited."""
+    return single_flight(
+        'polls:choices:%s' % question_key(question, question.edit_version),
+        lambda: list(question.choice_set.order_by('pk')),
+        getattr(settings, 'POLLS_FRAGMENT_CACHE_TIMEOUT', 600))
+
+
+def question_results(question, version):
+    """Return the question's results at `version`, counted once per version.
+
+    `version` is the one ``api.question_state`` names the results with.
+    """
+    return single_flight(
+        'polls:results:%s' % question_key(question, version),
+        lambda: list(question.results()),
+        getattr(settings, 'POLLS_FRAGMENT_CACHE_TIMEOUT', 600))
+
+
+def status_changed(sender, questions, **kwargs):
+    """Signal receiver for polls opened or closed by the scheduler.
+
+    The listing is made stale and its first page rebuilt straight away,
+    and the choice lists of newly opened polls are loaded, so the first
+    visitors after the change do not all miss the cache at once. That
+    only helps if the scheduler shares its cache with the web workers;
+    with a per-process cache their listings expire at the change anyway
+    and are rebuilt by their next visitor.
+    """
+    bump_index_version()
+    index_page()
+    for question in questions:
+        if question.is_open:
+            question_choices(question)
+
+
+def encode_cursor(question):
+    """Return the keyset cursor that pages past `question`."""
+    delta = question.pub_date - EPOCH
+    micros = (delta.days * 86400 + delta.seconds) * 10**6 \
+        + delta.microseconds
+    return '%d_%d' % (micros, question.pk)
+
+
+def decode_cursor(cursor):
+    """Return ``(micros, pk)`` from a cursor, or None if it is invalid."""
+    try:
+        micros, pk = (int(part) for part in cursor.split('_'))
+    except (AttributeError, ValueError):
+        return None
+    return micros, pk
+
+
+def seconds_until_next_change(now):
+    """Return seconds until the next poll opens or closes, capped."""
+    limit = getattr(settings, 'POLLS_INDEX_CACHE_TIMEOUT', 300)
+    upcoming = Question.objects.aggregate(
+        opens=Min('pub_date', filter=Q(pub_date__gt=now)),
+        closes=Min('end_date', filter=Q(end_date__gt=now)))
+    times = [t for t in upcoming.values() if t is not None]
+    if not times:
+        return limit
+    return max(1, min(limit, int((min(times) - now).total_seconds()) + 1))
+
+
+def index_page(cursor=None):
+    """Return ``(questions, next_cursor, page_key)`` for one index page.
+
+    Questions are listed once their ``pub_date`` has passed and carry an
+    ``open_now`` flag computed from ``end_date`` in the query, so the page
+    is right whether or not the scheduler has caught up. The stored status
+    only narrows the scan. `page_key` changes every time the page is
+    rebuilt and names its cached rendering.
+    """
+    version = cache.get_or_set(INDEX_VERSION_KEY, 1, None)
+    position = decode_cursor(cursor)
+    key = 'polls:index:%s:%s' % (
+        version, '%d_%d' % position if position else 'first')
+    page = cache.get(key)
+    if page is None:
+        now = timezone.now()
+        size = getattr(settings, 'POLLS_INDEX_PAGE_SIZE', 50)
+        questions = Question.objects.filter(
+            Q(status__in=[Question.OPEN, Question.CLOSED])
+            | Q(status=Question.SCHEDULED, pub_date__lte=now),
+        ).annotate(
+            open_now=Case(When(Q(end_date__isnull=True)
+                               | Q(end_date__gte=now), then=Value(True)),
+                          default=Value(False),
+                          output_field=BooleanField()),
+        ).order_by('-pub_date', '-pk')
+        if position:
+            micros, pk = position
+            pub_date = EPOCH + datetime.timedelta(microseconds=micros)
+            questions = questions.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk))
+        rows = list(questions[:size + 1])
+        next_cursor = encode_cursor(rows[size - 1]) \
+            if len(rows) > size else None
+        page = (rows[:size], next_cursor,
+                 '%s:%d' % (key, now.timestamp() * 10**6))
+        cache.set(key, page, seconds_until_next_change(now))
+    return page
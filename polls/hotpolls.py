@@ -0,0 +1,141 @@
+"""Hot-poll detection and cache warming.
+
+``tracker`` counts the detail and results page hits of each question in
+a count-min sketch and keeps the ``POLLS_HOT_SIZE`` most hit ones. Every
+``POLLS_HOT_WINDOW`` hits all counts are halved, so a poll that cools
+down drops out. ``warm_pass`` loads the choices and results of the hot
+polls and of the polls opening within ``POLLS_WARM_LEAD`` seconds through
+the single-flight loaders the views use, so their first visitors find
+them cached. Hits are counted per process, so each web process warms its
+own hot polls: a hit starts a pass in the background at most every
+``POLLS_WARM_INTERVAL`` seconds. The pass ``run_poll_scheduler`` makes
+only warms polls about to open, and only helps the web processes if they
+share its cache.
+"""
+import datetime
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from . import api, caching
+from .models import Question
+
+log = logging.getLogger("polls.hotpolls")
+
+
+class CountMinSketch:
+    """Approximate counts of many items in ``width * depth`` counters.
+
+    An estimate is never below the true count and only exceeds it by
+    what colliding items added to the least crowded row.
+    """
+
+    def __init__(self, width=1024, depth=4):
+        self.width = width
+        self.rows = [[0] * width for _ in range(depth)]
+
+    def add(self, item, count=1):
+        """Count `item` `count` more times; return its new estimate."""
+        estimate = None
+        for seed, row in enumerate(self.rows):
+            index = hash((seed, item)) % self.width
+            row[index] += count
+            if estimate is None or row[index] < estimate:
+                estimate = row[index]
+        return estimate
+
+    def estimate(self, item):
+        """Return how many times `item` was counted, at least."""
+        return min(row[hash((seed, item)) % self.width]
+                   for seed, row in enumerate(self.rows))
+
+    def halve(self):
+        """Halve every counter, so older hits weigh less."""
+        for row in self.rows:
+            row[:] = [count >> 1 for count in row]
+
+
+class HotTracker:
+    """The most hit questions of this process, shared by its threads."""
+
+    def __init__(self, size=None, window=None):
+        self.size = size or getattr(settings, 'POLLS_HOT_SIZE', 20)
+        self.window = window or getattr(settings, 'POLLS_HOT_WINDOW', 10000)
+        self.lock = threading.Lock()
+        self.last_warm = time.monotonic()
+        self.reset()
+
+    def reset(self):
+        """Forget every hit counted so far."""
+        with self.lock:
+            self.sketch = CountMinSketch()
+            self.top = {}
+            self.hits = 0
+
+    def hit(self, question_id):
+        """Count one page view of a question, warming hot polls if due."""
+        with self.lock:
+            estimate = self.sketch.add(question_id)
+            if question_id in self.top or len(self.top) < self.size:
+                self.top[question_id] = estimate
+            else:
+                coldest = min(self.top, key=self.top.get)
+                if estimate > self.top[coldest]:
+                    del self.top[coldest]
+                    self.top[question_id] = estimate
+            self.hits += 1
+            if self.hits >= self.window:
+                self.hits = 0
+                self.sketch.halve()
+                self.top = {pk: count >> 1 for pk, count in self.top.items()
+                            if count > 1}
+            interval = getattr(settings, 'POLLS_WARM_INTERVAL', 30)
+            due = interval and time.monotonic() - self.last_warm >= interval
+            if due:
+                self.last_warm = time.monotonic()
+        if due:
+            threading.Thread(target=warm_in_background, daemon=True).start()
+
+    def hottest(self):
+        """Return the tracked question ids, most hit first."""
+        with self.lock:
+            return sorted(self.top, key=self.top.get, reverse=True)
+
+
+tracker = HotTracker()
+
+
+def warm(question):
+    """Load the question's choices and current results into the cache."""
+    caching.question_choices(question)
+    caching.question_results(question, api.question_state(question)[0])
+
+
+def warm_pass(now=None):
+    """Warm the hot polls and those about to open; return how many."""
+    now = now or timezone.now()
+    lead = datetime.timedelta(
+        seconds=getattr(settings, 'POLLS_WARM_LEAD', 60))
+    questions = Question.objects.filter(
+        Q(pk__in=tracker.hottest())
+        | Q(status=Question.SCHEDULED, pub_date__lte=now + lead))
+    warmed = 0
+    for question in questions:
+        warm(question)
+        warmed += 1
+    return warmed
+
+
+def warm_in_background():
+    """Run ``warm_pass`` off the request thread."""
+    try:
+        warm_pass()
+    except Exception:
+        log.exception("Warming the polls cache failed.")
+    finally:
+        connections.close_all()
@@ -0,0 +1,135 @@
+"""Buffered vote ingestion through a local SQLite spool file.
+
+With ``POLLS_VOTE_INGESTION = 'buffered'`` the vote view only appends the
+ballot to the spool and returns; the ``flush_votes`` command drains the
+spool into the Vote table in batches. Run a single flusher at a time so
+ballots are applied in the order they were cast.
+"""
+import datetime
+import logging
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Vote
+
+log = logging.getLogger("polls")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ballot (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    question_id INTEGER NOT NULL,
+    choice_id INTEGER NOT NULL,
+    cast_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS flush_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    flushed_total INTEGER NOT NULL,
+    last_batch INTEGER NOT NULL,
+    last_flush_ms REAL NOT NULL,
+    last_flush_at REAL NOT NULL
+);
+"""
+
+
+def is_buffered():
+    """Check if votes should go through the spool."""
+    return getattr(settings, 'POLLS_VOTE_INGESTION', 'sync') == 'buffered'
+
+
+class VoteSpool:
+    """Durable append-only queue of ballots waiting to be written."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.local = threading.local()
+
+    def connection(self):
+        """Return this thread's connection, creating the schema once."""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self.local.conn = conn
+        return conn
+
+    def put(self, user_id, question_id, choice_id):
+        """Append one ballot to the spool."""
+        self.connection().execute(
+            "INSERT INTO ballot (user_id, question_id, choice_id, cast_at) "
+            "VALUES (?, ?, ?, ?)",
+            (user_id, question_id, choice_id, time.time()))
+
+    def depth(self):
+        """Return the number of ballots waiting to be flushed."""
+        return self.connection().execute(
+            "SELECT COUNT(*) FROM ballot").fetchone()[0]
+
+    def flush(self, batch_size=500):
+        """Write the oldest `batch_size` ballots and drop them from the spool.
+
+        The ballots are removed only after the Vote transaction commits;
+        if the process dies in between they are applied again, which is
+        harmless because the last ballot per user and question wins.
+        Return the number of ballots taken from the spool.
+        """
+        conn = self.connection()
+        rows = conn.execute(
+            "SELECT id, user_id, question_id, choice_id, cast_at FROM ballot "
+            "ORDER BY id LIMIT ?", (batch_size,)).fetchall()
+        if not rows:
+            return 0
+        start = time.perf_counter()
+        Vote.objects.record_batch(
+            (user_id, question_id, choice_id,
+             datetime.datetime.fromtimestamp(cast_at, datetime.timezone.utc))
+            for _, user_id, question_id, choice_id, cast_at in rows)
+        conn.execute("DELETE FROM ballot WHERE id <= ?", (rows[-1][0],))
+        elapsed = (time.perf_counter() - start) * 1000
+        conn.execute(
+            "INSERT INTO flush_stats VALUES (1, ?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET "
+            "flushed_total = flushed_total + excluded.flushed_total, "
+            "last_batch = excluded.last_batch, "
+            "last_flush_ms = excluded.last_flush_ms, "
+            "last_flush_at = excluded.last_flush_at",
+            (len(rows), len(rows), elapsed, time.time()))
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Flushed %d ballots in %.1f ms, %d still queued.",
+                      len(rows), elapsed, self.depth())
+        return len(rows)
+
+    def metrics(self):
+        """Return queue depth and flush latency figures as a dict."""
+        conn = self.connection()
+        depth, oldest = conn.execute(
+            "SELECT COUNT(*), MIN(cast_at) FROM ballot").fetchone()
+        stats = conn.execute(
+            "SELECT flushed_total, last_batch, last_flush_ms, last_flush_at "
+            "FROM flush_stats").fetchone() or (0, 0, None, None)
+        return {
+            'depth': depth,
+            'oldest_age_s': time.time() - oldest if oldest else 0.0,
+            'flushed_total': stats[0],
+            'last_batch': stats[1],
+            'last_flush_ms': stats[2],
+            'last_flush_at': stats[3],
+        }
+
+
+_spool = None
+_spool_lock = threading.Lock()
+
+
+def get_spool():
+    """Return the process-wide spool for ``POLLS_VOTE_SPOOL``."""
+    global _spool
+    with _spool_lock:
+        if _spool is None or _spool.path != str(settings.POLLS_VOTE_SPOOL):
+            _spool = VoteSpool(settings.POLLS_VOTE_SPOOL)
+        return _spool
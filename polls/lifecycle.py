@@ -0,0 +1,85 @@
+"""Move polls through scheduled, open and closed as their dates pass.
+
+``advance`` flips the stored ``Question.status`` of every poll whose
+``pub_date`` or ``end_date`` has been reached and then sends
+``poll_opened`` and ``poll_closed`` with the polls that changed.
+``freeze_due`` snapshots closed polls once ``POLLS_SNAPSHOT_GRACE`` has
+passed. The ``run_poll_scheduler`` command calls both on a timer.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Question, ResultSnapshot
+from .routers import use_primary
+
+# Both are sent with ``questions``, a list of the polls that changed.
+poll_opened = Signal()
+poll_closed = Signal()
+
+
+def advance(now=None):
+    """Flip every poll whose status is behind its dates.
+
+    Return ``(opened, closed)`` lists of the polls that changed.
+    """
+    now = now or timezone.now()
+    with use_primary(), transaction.atomic():
+        closed = list(Question.objects.filter(
+            status__in=[Question.SCHEDULED, Question.OPEN],
+            pub_date__lte=now, end_date__lt=now))
+        opened = list(Question.objects.filter(
+            Q(end_date__gte=now) | Q(end_date__isnull=True),
+            status=Question.SCHEDULED, pub_date__lte=now))
+        Question.objects.filter(pk__in=[q.pk for q in closed])\
+            .update(status=Question.CLOSED)
+        Question.objects.filter(pk__in=[q.pk for q in opened])\
+            .update(status=Question.OPEN)
+    for question in closed:
+        question.status = Question.CLOSED
+    for question in opened:
+        question.status = Question.OPEN
+    if opened:
+        poll_opened.send(sender=Question, questions=opened)
+    if closed:
+        poll_closed.send(sender=Question, questions=closed)
+    return opened, closed
+
+
+def settled_before(now=None):
+    """Return the time polls must have closed by for their votes to settle.
+
+    ``POLLS_SNAPSHOT_GRACE`` seconds after ``end_date`` lets votes that
+    were already in flight at closing time land first.
+    """
+    now = now or timezone.now()
+    return now - datetime.timedelta(
+        seconds=getattr(settings, 'POLLS_SNAPSHOT_GRACE', 60))
+
+
+def freeze_due(now=None):
+    """Snapshot every closed poll past its grace period; return how many."""
+    taken = 0
+    with use_primary():
+        due = Question.objects.filter(end_date__lt=settled_before(now),
+                                      resultsnapshot__isnull=True)
+        for question in due.iterator():
+            ResultSnapshot.take(question)
+            taken += 1
+    return taken
+
+
+def next_boundary():
+    """Return the next pub_date or end_date a poll is waiting for, or None."""
+    opens = Question.objects.filter(status=Question.SCHEDULED)\
+        .order_by('pub_date').values_list('pub_date', flat=True).first()
+    closes = Question.objects.filter(
+        status__in=[Question.SCHEDULED, Question.OPEN],
+        end_date__isnull=False)\
+        .order_by('end_date').values_list('end_date', flat=True).first()
+    times = [t for t in (opens, closes) if t is not None]
+    return min(times) if times else None
@@ -0,0 +1,181 @@
+"""Live results pushed to browsers with Server-Sent Events.
+
+``LiveResultsRouter`` wraps the Django ASGI application and answers
+``/polls/<id>/stream/`` itself, so a connection costs a few small objects
+on the event loop instead of a worker thread. One ``Broadcaster`` per
+process reads the tallies of every watched question in a single pass per
+interval and hands each subscriber only the choices that changed.
+"""
+import asyncio
+import json
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Sum
+
+from .models import Question, Choice, ChoiceShard
+
+STREAM_PATH = re.compile(r'^/polls/(?P<pk>\d+)/stream/$')
+
+
+def read_tallies(question_ids):
+    """Return ``{question_id: {choice_id: votes}}`` for the questions."""
+    tallies = {question_id: {} for question_id in question_ids}
+    for question_id, choice_id, votes in Choice.objects.filter(
+            question__in=question_ids).values_list('question', 'pk', 'votes'):
+        tallies[question_id][choice_id] = votes
+    for question_id, choice_id, extra in ChoiceShard.objects.filter(
+            choice__question__in=question_ids).values_list(
+            'choice__question', 'choice').annotate(Sum('count')):
+        tallies[question_id][choice_id] += extra
+    return tallies
+
+
+def sse_event(name, data):
+    """Return one encoded Server-Sent Event."""
+    return ('event: %s\ndata: %s\n\n' % (name, json.dumps(data))).encode()
+
+
+class Subscriber:
+    """Changes waiting to be sent to one client.
+
+    Deltas are merged into ``pending`` rather than queued, so a slow client
+    holds at most one entry per choice however far behind it falls.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.changed = asyncio.Event()
+
+    def push(self, delta):
+        """Merge `delta` into the pending changes."""
+        self.pending.update(delta)
+        self.changed.set()
+
+    def take(self):
+        """Return and clear the pending changes."""
+        pending, self.pending = self.pending, {}
+        self.changed.clear()
+        return pending
+
+
+class Broadcaster:
+    """Poll the tallies of watched questions and fan out the changes."""
+
+    def __init__(self, interval=None):
+        self.interval = interval
+        self.subscribers = {}
+        self.tallies = {}
+        self.task = None
+
+    def subscribe(self, question_id):
+        """Register a new subscriber for `question_id` and return it."""
+        subscriber = Subscriber()
+        self.subscribers.setdefault(question_id, set()).add(subscriber)
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() \
+                or self.task.get_loop() is not loop:
+            self.task = loop.create_task(self.run())
+        return subscriber
+
+    def unsubscribe(self, question_id, subscriber):
+        """Forget `subscriber`, and the question once nobody watches it."""
+        watchers = self.subscribers.get(question_id, set())
+        watchers.discard(subscriber)
+        if not watchers:
+            self.subscribers.pop(question_id, None)
+            self.tallies.pop(question_id, None)
+
+    async def snapshot(self, question_id):
+        """Return the full tally of `question_id`."""
+        if question_id not in self.tallies:
+            tallies = await sync_to_async(read_tallies)([question_id])
+            self.tallies[question_id] = tallies[question_id]
+        return dict(self.tallies[question_id])
+
+    def publish(self, tallies):
+        """Send every subscriber the choices whose count changed."""
+        for question_id, counts in tallies.items():
+            previous = self.tallies.get(question_id)
+            self.tallies[question_id] = counts
+            if previous is None:
+                continue
+            delta = {choice_id: votes for choice_id, votes in counts.items()
+                     if previous.get(choice_id) != votes}
+            if delta:
+                for subscriber in self.subscribers.get(question_id, ()):
+                    subscriber.push(delta)
+
+    async def run(self):
+        """Poll once per interval while anyone is subscribed."""
+        interval = self.interval or getattr(settings, 'POLLS_LIVE_INTERVAL',
+                                            1.0)
+        while self.subscribers:
+            await asyncio.sleep(interval)
+            question_ids = list(self.subscribers)
+            if question_ids:
+                self.publish(await sync_to_async(read_tallies)(question_ids))
+
+
+broadcaster = Broadcaster()
+
+
+async def wait_for_disconnect(receive):
+    """Return once the client has gone, skipping request body messages."""
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def stream_results(scope, receive, send, question_id):
+    """Serve the event stream of one question until the client leaves."""
+    exists = await sync_to_async(
+        Question.objects.filter(pk=question_id).exists)()
+    if not exists:
+        await send({'type': 'http.response.start', 'status': 404,
+                    'headers': [(b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body', 'body': b'Not found'})
+        return
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(b'content-type', b'text/event-stream'),
+                            (b'cache-control', b'no-cache')]})
+    subscriber = broadcaster.subscribe(question_id)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    heartbeat = getattr(settings, 'POLLS_LIVE_HEARTBEAT', 15)
+    try:
+        snapshot = await broadcaster.snapshot(question_id)
+        await send({'type': 'http.response.body', 'more_body': True,
+                    'body': sse_event('snapshot', snapshot)})
+        while True:
+            changed = asyncio.ensure_future(subscriber.changed.wait())
+            done, _ = await asyncio.wait({changed, disconnected},
+                                         timeout=heartbeat,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                changed.cancel()
+                break
+            if changed in done:
+                body = sse_event('delta', subscriber.take())
+            else:
+                changed.cancel()
+                body = b': keep-alive\n\n'
+            await send({'type': 'http.response.body', 'body': body,
+                        'more_body': True})
+    finally:
+        disconnected.cancel()
+        broadcaster.unsubscribe(question_id, subscriber)
+
+
+class LiveResultsRouter:
+    """ASGI app that serves result streams and passes the rest to Django."""
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            match = STREAM_PATH.match(scope['path'])
+            if match:
+                return await stream_results(scope, receive, send,
+                                            int(match.group('pk')))
+        return await self.application(scope, receive, send)
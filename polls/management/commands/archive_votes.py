@@ -0,0 +1,73 @@
+"""Move the raw votes of long-closed polls into compressed NDJSON files."""
+import datetime
+import gzip
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from polls.lifecycle import settled_before
+from polls.models import Question, ResultSnapshot, Vote
+from polls.routers import use_primary
+
+
+class Command(BaseCommand):
+    """Archive and delete the Vote rows of polls closed over N days ago.
+
+    Polls still inside ``POLLS_SNAPSHOT_GRACE`` are left for a later run,
+    since votes in flight at closing time may still land.
+
+    Each poll gets ``question-<id>-votes.ndjson.gz`` in the archive
+    directory, one ``{"user": .., "choice": ..}`` object per line. The
+    poll's snapshot is written first and is what its results page shows
+    from then on.
+    """
+
+    help = "Archive the votes of polls closed more than --days days ago."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument(
+            '--output', default=None,
+            help="Directory for the archive files (POLLS_ARCHIVE_DIR).")
+
+    @use_primary()
+    def handle(self, *args, **options):
+        output = Path(options['output'] or settings.POLLS_ARCHIVE_DIR)
+        output.mkdir(parents=True, exist_ok=True)
+        now = timezone.now()
+        cutoff = min(now - datetime.timedelta(days=options['days']),
+                     settled_before(now))
+        questions = Question.objects.filter(end_date__lt=cutoff).exclude(
+            resultsnapshot__votes_archived=True)
+        for question in questions.iterator():
+            snapshot = question.snapshot()
+            path = output / ('question-%d-votes.ndjson.gz' % question.pk)
+            written = self.write_votes(question, path)
+            with transaction.atomic():
+                Vote.objects.filter(question=question).delete()
+                ResultSnapshot.objects.filter(pk=snapshot.pk)\
+                    .update(votes_archived=True)
+            self.stdout.write("Archived %d vote(s) of poll #%d to %s." % (
+                written, question.pk, path))
+
+    def write_votes(self, question, path):
+        """Stream the question's votes to `path` and return how many."""
+        written = 0
+        partial = path.with_suffix('.partial')
+        with gzip.open(partial, 'wt') as archive:
+            rows = Vote.objects.filter(question=question)\
+                .values_list('user', 'selected_choice')\
+                .order_by('pk').iterator(chunk_size=2000)
+            for user_id, choice_id in rows:
+                archive.write(json.dumps({'user': user_id,
+                                          'choice': choice_id}) + '\n')
+                written += 1
+        with open(partial, 'rb') as archive:
+            os.fsync(archive.fileno())
+        os.replace(partial, path)
+        return written
@@ -0,0 +1,89 @@
+"""Compare WSGI and ASGI throughput with many slow clients."""
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from polls.benchmarks import (PRIVATE_CACHES, asgi_load, seed,
+                              slow_clients, wsgi_load)
+
+SETUPS = (
+    ('wsgi', 'mysite.urls'),
+    ('asgi', 'mysite.urls'),
+    ('asgi-async', 'mysite.async_urls'),
+)
+
+
+class Command(BaseCommand):
+    """Serve the same slow clients three ways.
+
+    "wsgi" uses a pool of worker threads that each serve one client at a
+    time; "asgi" runs the sync views under the ASGI handler, and
+    "asgi-async" the async views of ``polls.async_views``. Each client
+    takes ``--delay`` seconds to send its request and again to read the
+    response. Runs on a temporary SQLite file in WAL mode.
+    """
+
+    help = "Benchmark WSGI vs ASGI throughput with slow clients."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=100)
+        parser.add_argument('--threads', type=int, default=8,
+                            help="WSGI worker threads.")
+        parser.add_argument('--requests', type=int, default=20,
+                            help="Requests per client.")
+        parser.add_argument('--delay', type=float, default=0.05)
+        parser.add_argument('--write-ratio', type=float, default=0.1)
+        parser.add_argument('--questions', type=int, default=20)
+        parser.add_argument('--output', help="Write the results to this file.")
+
+    @override_settings(CACHES=PRIVATE_CACHES, POLLS_RATELIMIT='off',
+                       POLLS_SQLITE_PRAGMAS={'journal_mode': 'WAL',
+                                             'busy_timeout': 20000})
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stderr.write("This benchmark needs the SQLite backend.")
+            return
+        directory = tempfile.mkdtemp()
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            directory, 'bench.sqlite3')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        report = {}
+        try:
+            question_ids = seed(options['questions'], 4, 0)
+            users = [User.objects.create(username='slow-%d' % i)
+                     for i in range(options['clients'])]
+            clients = slow_clients(users, question_ids, options['requests'],
+                                   options['write_ratio'])
+            connections.close_all()
+            for setup, urlconf in SETUPS:
+                cache.clear()
+                with override_settings(ROOT_URLCONF=urlconf):
+                    if setup == 'wsgi':
+                        result = wsgi_load(clients, options['threads'],
+                                           options['delay'])
+                    else:
+                        result = asgi_load(clients, options['delay'])
+                connections.close_all()
+                report[setup] = result
+                self.stdout.write(
+                    "%-10s %7.1f req/s  p50 %7.1f ms  p99 %7.1f ms  "
+                    "errors %d" % (setup, result['rps'], result['p50_ms'],
+                                   result['p99_ms'], result['errors']))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            connection.settings_dict['TEST']['NAME'] = None
+            os.rmdir(directory)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
@@ -0,0 +1,103 @@
+"""Benchmark the polls hot paths at several data sizes."""
+import datetime
+import json
+import platform
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from polls.benchmarks import (PRIVATE_CACHES, compare, measure,
+                              polls_endpoints, seed)
+from polls.models import Question, Vote
+
+
+def parse_size(text):
+    """Parse ``QUESTIONSxCHOICESxVOTES`` into a dict."""
+    try:
+        questions, choices, votes = (int(part) for part in text.split('x'))
+    except ValueError:
+        raise CommandError("Sizes look like 100x4x10000, not %r." % text)
+    return {'questions': questions, 'choices': choices, 'votes': votes}
+
+
+class Command(BaseCommand):
+    """Seed a throwaway database per size and time each endpoint.
+
+    The run uses a fresh test database, never the configured one. Results
+    are printed and, with ``--output``, saved as JSON; ``--compare``
+    fails the run if p50 latency or query counts regressed against an
+    earlier file.
+    """
+
+    help = "Measure latency, throughput and queries of the polls views."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=parse_size,
+                            default=[parse_size('10x4x100'),
+                                     parse_size('100x4x10000'),
+                                     parse_size('1000x8x100000')],
+                            help="QUESTIONSxCHOICESxVOTES, e.g. 100x4x10000.")
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--output', help="Write the results to this file.")
+        parser.add_argument('--compare', help="Earlier results to check against.")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Allowed p50 slowdown for --compare.")
+
+    @override_settings(CACHES=PRIVATE_CACHES, POLLS_RATELIMIT='off')
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = []
+            for size in options['sizes']:
+                results += self.run_size(size, options['requests'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        report = {
+            'meta': {
+                'date': datetime.datetime.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+        if options['compare']:
+            with open(options['compare']) as baseline:
+                regressions = compare(json.load(baseline), report,
+                                      options['tolerance'])
+            if regressions:
+                raise CommandError("Regressions:\n" + "\n".join(regressions))
+
+    def run_size(self, size, requests):
+        """Seed one data size and measure every endpoint on it."""
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+        question = Question.objects.get(pk=seed(**size)[0])
+        choice = question.choice_set.first()
+        vote = Vote.objects.filter(question=question, user__isnull=False)\
+            .select_related('user').first()
+        # Sizes seeded without votes have no voter to log in as.
+        user = vote.user if vote else User.objects.create(
+            username='bench-polls')
+        results = []
+        for endpoint in polls_endpoints(question, choice):
+            result = measure(endpoint, requests, user=user)
+            result['size'] = size
+            results.append(result)
+            self.stdout.write(
+                "%(endpoint)-14s %(size)s  p50 %(p50_ms)8.3f ms  "
+                "p99 %(p99_ms)8.3f ms  %(rps)8.1f req/s  "
+                "%(queries)d queries" % result)
+        return results
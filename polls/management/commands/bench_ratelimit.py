@@ -0,0 +1,45 @@
+"""Measure what the vote rate limiter adds to each request."""
+import json
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from polls import ratelimit
+from polls.benchmarks import limiter_overhead
+
+
+class Command(BaseCommand):
+    """Time ``limit_votes`` with each bucket store and thread count.
+
+    The wrapped view does nothing, so the figures are the limiter's own
+    cost: IP lookup, session read and one or two bucket updates.
+    """
+
+    help = "Benchmark the vote rate limiter."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=20000,
+                            help="Requests per thread.")
+        parser.add_argument('--threads', type=int, nargs='+', default=[1, 4])
+        parser.add_argument('--keys', type=int, default=1000,
+                            help="Distinct users and IPs per thread.")
+        parser.add_argument('--output', help="Write the results to this file.")
+
+    def handle(self, *args, **options):
+        report = []
+        for store in ('local', 'cache'):
+            for threads in options['threads']:
+                with override_settings(POLLS_RATELIMIT=store):
+                    ratelimit.get_store().reset()
+                    result = limiter_overhead(options['calls'], threads,
+                                              options['keys'])
+                result['store'] = store
+                report.append(result)
+                self.stdout.write(
+                    "%(store)-6s %(threads)2d thread(s)  mean %(mean_us)7.2f "
+                    "us  p50 %(p50_us)7.2f us  p99 %(p99_us)7.2f us  "
+                    "refused %(refused).1f%%" % dict(
+                        result, refused=result['refused'] * 100))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
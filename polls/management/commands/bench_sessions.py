@@ -0,0 +1,65 @@
+"""Count the queries of logged-in requests per session and user setup."""
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from polls.benchmarks import (PRIVATE_CACHES, auth_settings, measure,
+                              polls_endpoints, seed)
+from polls.models import Question
+
+SESSION_STORES = ('db', 'cached_db', 'signed_cookies')
+
+
+class Command(BaseCommand):
+    """Time the detail page and a vote for each session store.
+
+    Each store runs with users loaded from the database and from the
+    cache (``POLLS_CACHED_USERS``). Runs on a throwaway test database and
+    a private cache.
+    """
+
+    help = "Measure per-request queries of polls_navigate and vote."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--output', help="Write the results to this file.")
+
+    @override_settings(CACHES=PRIVATE_CACHES, POLLS_RATELIMIT='off')
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        report = []
+        try:
+            question = Question.objects.get(pk=seed(10, 4, 100)[0])
+            user = User.objects.create(username='bench-sessions')
+            endpoints = [endpoint for endpoint in polls_endpoints(
+                question, question.choice_set.first()) if endpoint.login]
+            for store in SESSION_STORES:
+                for cached_users in (False, True):
+                    cache.clear()
+                    with override_settings(**auth_settings(store,
+                                                           cached_users)):
+                        for endpoint in endpoints:
+                            result = measure(endpoint, options['requests'],
+                                             user=user)
+                            result.update(session_store=store,
+                                          cached_users=cached_users)
+                            report.append(result)
+                            self.stdout.write(
+                                "%-14s users %-8s %-13s %d queries  p50 "
+                                "%7.3f ms" % (
+                                    store, 'cached' if cached_users else 'db',
+                                    endpoint.name, result['queries'],
+                                    result['p50_ms']))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
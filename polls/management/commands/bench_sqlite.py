@@ -0,0 +1,77 @@
+"""Compare SQLite settings under concurrent vote and results traffic."""
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from polls.benchmarks import PRIVATE_CACHES, mixed_load, seed
+
+
+class Command(BaseCommand):
+    """Run the same mixed load against a default and a tuned SQLite file.
+
+    The "default" run uses rollback journaling and a new connection per
+    request; the "tuned" run uses WAL, the other ``DATABASE_PROFILE =
+    'tuned'`` PRAGMAs and one connection per thread. Both use a temporary
+    database file, never the configured one.
+    """
+
+    help = "Benchmark mixed vote/results traffic with and without tuning."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--write-ratio', type=float, default=0.1)
+        parser.add_argument('--questions', type=int, default=20)
+        parser.add_argument('--output', help="Write the results to this file.")
+
+    @override_settings(CACHES=PRIVATE_CACHES, POLLS_RATELIMIT='off')
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stderr.write("This benchmark needs the SQLite backend.")
+            return
+        report = {}
+        profiles = (('default', {}, True),
+                    ('tuned', settings.POLLS_SQLITE_TUNED_PRAGMAS, False))
+        for profile, pragmas, reconnect in profiles:
+            report[profile] = self.run_profile(pragmas, reconnect, options)
+            result = report[profile]
+            self.stdout.write(
+                "%-8s votes %7.1f req/s (p99 %s ms)  results %7.1f req/s "
+                "(p99 %s ms)  errors %s" % (
+                    profile, result['vote']['rps'], result['vote']['p99_ms'],
+                    result['results']['rps'], result['results']['p99_ms'],
+                    result['errors'] or 0))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+    def run_profile(self, pragmas, reconnect, options):
+        """Build a fresh database file and run the load on it."""
+        directory = tempfile.mkdtemp()
+        test_settings = connection.settings_dict['TEST']
+        test_name = test_settings['NAME']
+        test_settings['NAME'] = os.path.join(directory, 'bench.sqlite3')
+        with override_settings(POLLS_SQLITE_PRAGMAS=pragmas):
+            setup_test_environment()
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False)
+            try:
+                connections.close_all()
+                question_ids = seed(options['questions'], 4, 0)
+                users = [User.objects.create(username='mixed-%d' % i)
+                         for i in range(options['threads'])]
+                connections.close_all()
+                return mixed_load(users, question_ids, options['seconds'],
+                                  options['write_ratio'], reconnect)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+                test_settings['NAME'] = test_name
+                os.rmdir(directory)
@@ -0,0 +1,62 @@
+"""Compare page rendering with and without the template fragment cache."""
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from polls.benchmarks import (PRIVATE_CACHES, polls_endpoints,
+                              render_times, seed)
+from polls.models import Question
+
+
+class Command(BaseCommand):
+    """Time the index, detail and results pages in two setups.
+
+    Both run with DEBUG off, so templates come from Django's cached
+    loader as they do in production. "before" clears the cache before
+    each request so no fragment is reused; "after" keeps the fragment
+    caches warm. Runs on a throwaway test database and a private cache.
+    """
+
+    help = "Measure render time per view before and after template caching."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--choices', type=int, default=8)
+        parser.add_argument('--output', help="Write the results to this file.")
+
+    @override_settings(CACHES=PRIVATE_CACHES, DEBUG=False,
+                       POLLS_RATELIMIT='off')
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            question = Question.objects.get(
+                pk=seed(50, options['choices'], 1000)[0])
+            user = User.objects.create(username='bench-templates')
+            endpoints = [endpoint for endpoint in polls_endpoints(
+                question, question.choice_set.first())
+                if endpoint.method == 'get']
+            report = []
+            for setup, warm in (('before', False), ('after', True)):
+                cache.clear()
+                for endpoint in endpoints:
+                    result = render_times(endpoint, options['requests'],
+                                          user, warm=warm)
+                    result['setup'] = setup
+                    report.append(result)
+                    self.stdout.write(
+                        "%(setup)-6s %(endpoint)-14s request "
+                        "%(mean_ms)7.3f ms  template %(template_ms)7.3f "
+                        "ms" % result)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
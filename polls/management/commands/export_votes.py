@@ -0,0 +1,46 @@
+"""Stream questions, choices and votes to a CSV or NDJSON file."""
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand
+
+from polls import transfer
+from polls.routers import use_primary
+
+
+class Command(BaseCommand):
+    """Export polls data for ``import_votes`` in another database.
+
+    Rows are read with server-side chunked iterators and written as they
+    arrive, so memory use stays flat however many votes there are. A
+    ``.gz`` output path is compressed.
+    """
+
+    help = "Export questions, choices and votes as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['ndjson', 'csv'],
+                            default=None,
+                            help="Defaults to the --output extension.")
+        parser.add_argument('--output', default='-',
+                            help="File to write, or - for stdout.")
+        parser.add_argument('--question', type=int, action='append',
+                            help="Only export this question (repeatable).")
+        parser.add_argument('--batch-size', type=int,
+                            default=transfer.BATCH_SIZE)
+
+    @use_primary()
+    def handle(self, *args, **options):
+        path = options['output']
+        file_format = options['format'] or (
+            'csv' if path.replace('.gz', '').endswith('.csv') else 'ndjson')
+        write = getattr(transfer, 'write_%s' % file_format)
+        rows = transfer.export_rows(options['question'],
+                                    options['batch_size'])
+        if path == '-':
+            write(rows, sys.stdout)
+            return
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'wt', newline='') as stream:
+            write(rows, stream)
+        self.stderr.write("Exported to %s." % path)
@@ -0,0 +1,40 @@
+"""Drain the buffered vote spool into the Vote table."""
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.ingest import get_spool
+
+
+class Command(BaseCommand):
+    """Flush spooled ballots once, or keep flushing with ``--loop``."""
+
+    help = "Write ballots queued by buffered vote ingestion."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep running, polling the spool every --interval seconds.")
+        parser.add_argument('--interval', type=float, default=1.0)
+        parser.add_argument(
+            '--stats', action='store_true',
+            help="Print queue depth and flush latency as JSON and exit.")
+
+    def handle(self, *args, **options):
+        spool = get_spool()
+        if options['stats']:
+            self.stdout.write(json.dumps(spool.metrics()))
+            return
+        while True:
+            total = 0
+            while True:
+                flushed = spool.flush(options['batch_size'])
+                total += flushed
+                if flushed < options['batch_size']:
+                    break
+            if not options['loop']:
+                self.stdout.write("Flushed %d ballot(s)." % total)
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,67 @@
+"""Load a file written by ``export_votes``."""
+import gzip
+import sys
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from polls import caching, transfer
+from polls.routers import use_primary
+
+
+class Command(BaseCommand):
+    """Insert exported questions, choices and votes in batches.
+
+    Rows already here are skipped and ids taken by other rows are
+    replaced (see ``transfer.Importer``). The vote counters are rebuilt
+    from the Vote table at the end, since bulk inserts bypass
+    ``record_vote``.
+    """
+
+    help = "Import questions, choices and votes from CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or - for stdin.")
+        parser.add_argument('--format', choices=['ndjson', 'csv'],
+                            default=None,
+                            help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int,
+                            default=transfer.BATCH_SIZE)
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help="Create users missing here instead of skipping their votes.")
+        parser.add_argument(
+            '--no-recount', action='store_true',
+            help="Leave the vote counters for a later rebuild_vote_counts.")
+
+    @use_primary()
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.replace('.gz', '').endswith('.csv') else 'ndjson')
+        read = getattr(transfer, 'read_%s' % file_format)
+        importer = transfer.Importer(options['batch_size'],
+                                     options['create_users'])
+        if path == '-':
+            self.load(importer, read(sys.stdin))
+        else:
+            opener = gzip.open if path.endswith('.gz') else open
+            with opener(path, 'rt', newline='') as stream:
+                self.load(importer, read(stream))
+        importer.reset_sequences()
+        caching.bump_index_version()
+        if not options['no_recount']:
+            call_command('rebuild_vote_counts', stdout=self.stdout,
+                         stderr=self.stderr)
+        counts = importer.counts
+        self.stdout.write(
+            "Read %d question(s), %d choice(s) and %d vote(s); skipped %d "
+            "vote(s) of unknown users." % (
+                counts['question'], counts['choice'], counts['vote'],
+                counts['skipped']))
+
+    def load(self, importer, rows):
+        """Feed `rows` to `importer` and write the last batch."""
+        for row in rows:
+            importer.add(row)
+        importer.flush()
@@ -0,0 +1,94 @@
+"""Recount Choice.votes and Question.vote_total from the Vote table."""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMinute
+
+from polls.models import Question, Choice, ChoiceShard, Vote, VoteTally
+from polls.routers import use_primary
+from polls.utils import chunks
+
+
+class Command(BaseCommand):
+    """Rebuild or verify the stored vote counters.
+
+    Rebuilding also folds the ``ChoiceShard`` rows of sharded questions
+    back into ``Choice.votes`` and recounts the per-minute ``VoteTally``
+    rows. Polls whose votes were archived are left alone, since their
+    Vote rows are gone.
+    """
+
+    help = "Rebuild the stored vote counters from the Vote table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help="Only report counters that disagree with the Vote table.")
+
+    @use_primary()
+    def handle(self, *args, **options):
+        verify = options['verify']
+        with transaction.atomic():
+            shards = ChoiceShard.objects.all()
+            wrong = self.fix(
+                Choice.objects.exclude(
+                    question__resultsnapshot__votes_archived=True),
+                'votes',
+                dict(shards.values_list('choice').annotate(Sum('count'))),
+                self.count('selected_choice'), verify)
+            wrong += self.fix(
+                Question.objects.exclude(
+                    resultsnapshot__votes_archived=True),
+                'vote_total',
+                dict(shards.values_list('choice__question')
+                     .annotate(Sum('count'))),
+                self.count('question'), verify)
+            if not verify:
+                shards.delete()
+                self.rebuild_tallies()
+                # Rebuilt counts may differ from what clients have cached.
+                Question.objects.update(
+                    results_version=F('results_version') + 1)
+        if verify and wrong:
+            raise CommandError("%d vote counter(s) out of date." % wrong)
+        action = "Found" if verify else "Fixed"
+        self.stdout.write("%s %d stale vote counter(s)." % (action, wrong))
+
+    def count(self, field):
+        """Return ``{pk: votes}`` counted from the Vote table by `field`."""
+        return dict(Vote.objects.values_list(field).annotate(Count('pk')))
+
+    def rebuild_tallies(self):
+        """Replace the VoteTally rows with counts of the timestamped votes."""
+        questions = Question.objects.exclude(
+            resultsnapshot__votes_archived=True)
+        VoteTally.objects.filter(question__in=questions).delete()
+        rows = Vote.objects.filter(question__in=questions,
+                                   voted_at__isnull=False)\
+            .annotate(minute=TruncMinute('voted_at'))\
+            .values_list('question', 'selected_choice', 'minute')\
+            .annotate(Count('pk')).order_by().iterator()
+        for batch in chunks(rows):
+            VoteTally.objects.bulk_create(
+                VoteTally(question_id=question_id, choice_id=choice_id,
+                          minute=minute, count=count)
+                for question_id, choice_id, minute, count in batch)
+
+    def fix(self, queryset, field, shards, counted, verify):
+        """Compare ``field`` plus shards with the real count.
+
+        Unless verifying, the real count is written back wherever it
+        differs or shards are about to be folded in.
+        """
+        model = queryset.model
+        wrong = 0
+        for pk, stored in queryset.values_list('pk', field).iterator():
+            stored += shards.get(pk, 0)
+            actual = counted.get(pk, 0)
+            if stored != actual:
+                wrong += 1
+                self.stderr.write("%s #%d: %s=%d, counted %d" % (
+                    model.__name__, pk, field, stored, actual))
+            if not verify and (stored != actual or pk in shards):
+                model.objects.filter(pk=pk).update(**{field: actual})
+        return wrong
@@ -0,0 +1,47 @@
+"""Open and close polls as their dates pass."""
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from polls.hotpolls import warm_pass
+from polls.lifecycle import advance, freeze_due, next_boundary
+
+
+class Command(BaseCommand):
+    """Keep ``Question.status`` in step with the dates.
+
+    Each pass flips due polls, which fires the cache-warming hooks,
+    snapshots polls closed longer than ``POLLS_SNAPSHOT_GRACE`` and warms
+    the caches of polls opening within ``POLLS_WARM_LEAD``. The warming
+    fills this process's cache, so it only reaches the web workers through
+    a shared cache such as Memcached or Redis. With ``--loop`` it sleeps
+    until the next boundary, at most ``--interval`` seconds. Run a single
+    scheduler at a time.
+    """
+
+    help = "Flip polls between scheduled, open and closed at their dates."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep running, waking at each boundary or --interval.")
+        parser.add_argument('--interval', type=float, default=30.0)
+
+    def handle(self, *args, **options):
+        while True:
+            opened, closed = advance()
+            frozen = freeze_due()
+            warm_pass()
+            if opened or closed or frozen or not options['loop']:
+                self.stdout.write(
+                    "Opened %d, closed %d and snapshotted %d poll(s)." % (
+                        len(opened), len(closed), frozen))
+            if not options['loop']:
+                return
+            wait = options['interval']
+            boundary = next_boundary()
+            if boundary is not None:
+                wait = min(wait, max(
+                    0.1, (boundary - timezone.now()).total_seconds()))
+            time.sleep(wait)
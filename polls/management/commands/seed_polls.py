@@ -0,0 +1,24 @@
+"""Fill the database with synthetic polls for load tests."""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from polls.benchmarks import seed
+
+
+class Command(BaseCommand):
+    """Create open polls with choices and votes."""
+
+    help = "Create --questions polls with --choices choices and --votes votes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=100)
+        parser.add_argument('--choices', type=int, default=4)
+        parser.add_argument('--votes', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['questions'] < 1 or options['choices'] < 1:
+            raise CommandError("Need at least one question and one choice.")
+        with transaction.atomic():
+            seed(options['questions'], options['choices'], options['votes'])
+        self.stdout.write("Created %(questions)d question(s), %(choices)d "
+                          "choice(s) each and %(votes)d vote(s)." % options)
@@ -0,0 +1,13 @@
+"""Freeze the results of every closed poll that has no snapshot yet."""
+from django.core.management.base import BaseCommand
+
+from polls.lifecycle import freeze_due
+
+
+class Command(BaseCommand):
+    """Write a ResultSnapshot for each closed poll."""
+
+    help = "Snapshot the results of closed polls."
+
+    def handle(self, *args, **options):
+        self.stdout.write("Snapshotted %d closed poll(s)." % freeze_due())
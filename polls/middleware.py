@@ -0,0 +1,91 @@
+"""Middleware for the polls app."""
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import profiling, routers
+
+
+class ProfilingMiddleware:
+    """Record wall, database and template time per URL name.
+
+    Enabled only when ``POLLS_PROFILING`` is true. Queries are timed with
+    ``execute_wrapper`` rather than the debug cursor, so SQL text is not
+    kept beyond a per-request tally. See ``polls.profiling`` for where
+    the figures go.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'POLLS_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        profiling.time_templates()
+
+    def __call__(self, request):
+        profile = profiling.RequestProfile()
+        token = profiling.current.set(profile)
+        try:
+            with QueryWrappers(profile):
+                response = self.get_response(request)
+        finally:
+            profiling.current.reset(token)
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        profiling.registry.add(view_name, profile,
+                               time.perf_counter() - profile.started)
+        return response
+
+
+class QueryWrappers:
+    """Install a query wrapper on every database connection."""
+
+    def __init__(self, wrapper):
+        self.wrapper = wrapper
+        self.contexts = []
+
+    def __enter__(self):
+        for connection in connections.all():
+            context = connection.execute_wrapper(self.wrapper)
+            context.__enter__()
+            self.contexts.append(context)
+
+    def __exit__(self, *exc_info):
+        for context in reversed(self.contexts):
+            context.__exit__(*exc_info)
+
+
+class PrimaryPinMiddleware:
+    """Read from the primary for clients that have just written.
+
+    ``routers.pin_response`` sets the cookie after a vote, so the results
+    page the voter is redirected to shows their own vote even when the
+    replicas lag behind. It works both ways, so async views are not
+    pushed back onto a thread under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Marked as Django 3.2's MiddlewareMixin does, which works
+            # with every asgiref release that Django accepts.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if routers.PIN_COOKIE not in request.COOKIES:
+            return self.get_response(request)
+        with routers.use_primary():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if routers.PIN_COOKIE not in request.COOKIES:
+            return await self.get_response(request)
+        with routers.use_primary():
+            return await self.get_response(request)
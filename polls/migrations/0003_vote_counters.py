@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:20
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    """Count the existing votes into the new counter columns."""
+    db = schema_editor.connection.alias
+    Choice = apps.get_model('polls', 'Choice')
+    Question = apps.get_model('polls', 'Question')
+    for choice in Choice.objects.using(db).annotate(n=Count('vote')):
+        Choice.objects.using(db).filter(pk=choice.pk).update(votes=choice.n)
+    for question in Question.objects.using(db).annotate(n=Count('vote')):
+        Question.objects.using(db).filter(pk=question.pk).update(vote_total=question.n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0002_rename_choice_field'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='vote_total',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0003_vote_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='counter_shards',
+            field=models.PositiveSmallIntegerField(default=1, help_text="Spread each choice's vote counter over this many rows to cut lock contention on hot polls."),
+        ),
+        migrations.CreateModel(
+            name='ChoiceShard',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('choice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='polls.choice')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='choiceshard',
+            constraint=models.UniqueConstraint(fields=('choice', 'shard'), name='unique_choice_shard'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0004_sharded_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['-pub_date', '-id'], name='question_listing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['end_date'], name='question_end_date_idx'),
+        ),
+    ]
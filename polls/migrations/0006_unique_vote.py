@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:18
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def drop_duplicate_votes(apps, schema_editor):
+    """Keep only the newest vote per user and question, then recount.
+
+    Recounting sets the plain counters directly, so any shards are dropped.
+    """
+    db = schema_editor.connection.alias
+    Vote = apps.get_model('polls', 'Vote')
+    Choice = apps.get_model('polls', 'Choice')
+    Question = apps.get_model('polls', 'Question')
+    duplicates = list(Vote.objects.using(db).filter(user__isnull=False)
+                      .values('user', 'question')
+                      .annotate(n=Count('id'), newest=Max('id'))
+                      .filter(n__gt=1))
+    if not duplicates:
+        return
+    for row in duplicates:
+        Vote.objects.using(db).filter(user=row['user'], question=row['question'])\
+            .exclude(id=row['newest']).delete()
+    apps.get_model('polls', 'ChoiceShard').objects.using(db).all().delete()
+    for choice in Choice.objects.using(db).annotate(n=Count('vote')):
+        Choice.objects.using(db).filter(pk=choice.pk).update(votes=choice.n)
+    for question in Question.objects.using(db).annotate(n=Count('vote')):
+        Question.objects.using(db).filter(pk=question.pk).update(vote_total=question.n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0005_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_votes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['question', 'selected_choice'], name='vote_question_choice_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(fields=('user', 'question'), name='unique_user_question_vote'),
+        ),
+    ]
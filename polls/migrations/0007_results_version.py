@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0006_unique_vote'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='results_modified',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='results_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
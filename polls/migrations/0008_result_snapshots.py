@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0007_results_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultSnapshot',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='polls.question')),
+                ('total_votes', models.IntegerField()),
+                ('choices', models.JSONField()),
+                ('taken_at', models.DateTimeField(auto_now_add=True)),
+                ('votes_archived', models.BooleanField(default=False, help_text='The raw votes were moved to cold storage and only this snapshot remains.')),
+            ],
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0008_result_snapshots'),
+    ]
+
+    operations = [
+        # Votes cast before this migration have no known time; leave them
+        # NULL rather than stamping them all with the migration time.
+        migrations.AddField(
+            model_name='vote',
+            name='voted_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='voted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, null=True),
+        ),
+        migrations.CreateModel(
+            name='VoteTally',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minute', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+                ('choice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tallies', to='polls.choice')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.question')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='votetally',
+            index=models.Index(fields=['question', 'minute'], name='tally_question_minute_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='votetally',
+            constraint=models.UniqueConstraint(fields=('choice', 'minute'), name='unique_choice_minute'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0009_vote_tallies'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='edit_version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Bumped whenever the question or its choices are edited.'),
+        ),
+    ]
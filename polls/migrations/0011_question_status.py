@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:43
+
+from django.db import migrations, models
+from django.db.models import Q
+from django.utils import timezone
+
+
+def fill_status(apps, schema_editor):
+    """Set the status of the existing questions from their dates."""
+    db = schema_editor.connection.alias
+    Question = apps.get_model('polls', 'Question')
+    now = timezone.now()
+    questions = Question.objects.using(db)
+    questions.filter(pub_date__lte=now, end_date__lt=now).update(
+        status='closed')
+    questions.filter(Q(end_date__gte=now) | Q(end_date__isnull=True),
+                     pub_date__lte=now).update(status='open')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0010_edit_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='status',
+            field=models.CharField(choices=[('scheduled', 'Scheduled'), ('open', 'Open'), ('closed', 'Closed')], default='scheduled', editable=False, help_text='Set from the dates on save and moved on at pub_date and end_date by the run_poll_scheduler command.', max_length=9),
+        ),
+        migrations.RunPython(fill_status, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['status', 'pub_date'], name='question_status_pub_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['status', 'end_date'], name='question_status_end_idx'),
+        ),
+    ]
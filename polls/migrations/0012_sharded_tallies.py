@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0011_question_status'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='votetally',
+            name='unique_choice_minute',
+        ),
+        migrations.AddField(
+            model_name='votetally',
+            name='shard',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='votetally',
+            constraint=models.UniqueConstraint(fields=('choice', 'minute', 'shard'), name='unique_choice_minute_shard'),
+        ),
+    ]
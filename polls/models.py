@@ -1,35 +1,244 @@
 """Question and Choice object."""
 import datetime
+import random
+from collections import Counter
 
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
+from django.core.cache import cache
+from django.db import models, connections, transaction, IntegrityError
+from django.db.models import F, FloatField, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, Trunc
 from django.utils import timezone
 
+from .routers import use_primary
+
+
+def save_without_counters(instance, counters, args, kwargs):
+    """Save an existing row without writing its vote-maintained `counters`.
+
+    Votes update those columns with queryset ``update()`` calls, so the
+    values held by an instance are usually stale; an admin edit must not
+    write them back.
+    """
+    if not instance._state.adding and not args \
+            and not kwargs.get('force_insert') \
+            and kwargs.get('update_fields') is None:
+        kwargs['update_fields'] = [
+            field.name for field in instance._meta.concrete_fields
+            if not field.primary_key and field.name not in counters]
+    models.Model.save(instance, *args, **kwargs)
+
 
 # Create your models here.
 class Question(models.Model):
     """Fields and methods for Question object."""
 
+    SCHEDULED = 'scheduled'
+    OPEN = 'open'
+    CLOSED = 'closed'
+    STATUS_CHOICES = [(SCHEDULED, 'Scheduled'), (OPEN, 'Open'),
+                      (CLOSED, 'Closed')]
+
     question_text = models.CharField(max_length=200)
     pub_date = models.DateTimeField('date published')
     end_date = models.DateTimeField("date expired", default=None, null=True)
+    vote_total = models.IntegerField(default=0)
+    counter_shards = models.PositiveSmallIntegerField(
+        default=1, help_text="Spread each choice's vote counter over this "
+                             "many rows to cut lock contention on hot polls.")
+    results_version = models.PositiveIntegerField(default=0, editable=False)
+    results_modified = models.DateTimeField(null=True, editable=False)
+    edit_version = models.PositiveIntegerField(
+        default=0, editable=False,
+        help_text="Bumped whenever the question or its choices are edited.")
+    status = models.CharField(
+        max_length=9, choices=STATUS_CHOICES, default=SCHEDULED,
+        editable=False,
+        help_text="Set from the dates on save and moved on at pub_date and "
+                  "end_date by the run_poll_scheduler command.")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='question_listing_idx'),
+            models.Index(fields=['end_date'], name='question_end_date_idx'),
+            models.Index(fields=['status', 'pub_date'],
+                         name='question_status_pub_idx'),
+            models.Index(fields=['status', 'end_date'],
+                         name='question_status_end_idx'),
+        ]
 
     def __str__(self):
         """Return question's text."""
         return self.question_text
 
+    def save(self, *args, **kwargs):
+        """Save the question, leaving the vote counters alone.
+
+        The status is recomputed from the dates, which may have changed.
+        Turning sharding off folds the shards into the plain counters,
+        which are all an unsharded question reads.
+        """
+        self.status = self.status_at()
+        adding = self._state.adding
+        save_without_counters(
+            self, ('vote_total', 'results_version', 'results_modified',
+                   'edit_version'), args, kwargs)
+        update_fields = kwargs.get('update_fields')
+        if not adding and not self.is_sharded and (
+                update_fields is None or 'counter_shards' in update_fields):
+            self.fold_shards()
+
+    def fold_shards(self):
+        """Add the question's ChoiceShard rows to its counters, then drop them.
+
+        A vote still in flight under the old setting may land in a shard
+        afterwards; ``rebuild_vote_counts`` folds that one in.
+        """
+        shards = ChoiceShard.objects.filter(choice__question=self)
+        with use_primary(), transaction.atomic(using=shards.db):
+            counts = dict(shards.values_list('choice')
+                          .annotate(Sum('count')))
+            if not counts:
+                return
+            for choice_id, count in counts.items():
+                Choice.objects.filter(pk=choice_id)\
+                    .update(votes=F('votes') + count)
+            Question.objects.filter(pk=self.pk).update(
+                vote_total=F('vote_total') + sum(counts.values()),
+                results_version=F('results_version') + 1,
+                results_modified=timezone.now())
+            shards.delete()
+        cache.delete('polls:shard-counts:%d' % self.pk)
+
     def was_published_recently(self):
         """Check if a specific question published recently."""
         now = timezone.now()
         return now - datetime.timedelta(days=1) <= self.pub_date <= now
 
+    def status_at(self, now=None):
+        """Return the status the dates give at `now`; no end_date never closes."""
+        now = now or timezone.now()
+        if self.pub_date > now:
+            return self.SCHEDULED
+        if self.end_date is not None and self.end_date < now:
+            return self.CLOSED
+        return self.OPEN
+
+    @property
+    def is_open(self):
+        """Check the stored status, as the scheduler last set it, for an open poll."""
+        return self.status == self.OPEN
+
     def is_published(self):
         """Check if a specific question published."""
-        return self.pub_date <= timezone.now() <= self.end_date
+        return self.status_at() == self.OPEN
 
     def can_vote(self):
         """Check if a specific question can be voted."""
-        return self.pub_date <= timezone.now() <= self.end_date
+        return self.status_at() == self.OPEN
+
+    @property
+    def is_sharded(self):
+        """Check if this question counts votes in ChoiceShard rows."""
+        return self.counter_shards > 1
+
+    def shard_counts(self):
+        """Return ``{choice_id: votes}`` summed over the shards.
+
+        The sums are cached for ``POLLS_SHARD_CACHE_TIMEOUT`` seconds so a
+        busy results page does not re-aggregate on every hit.
+        """
+        key = 'polls:shard-counts:%d' % self.pk
+        counts = cache.get(key)
+        if counts is None:
+            counts = dict(ChoiceShard.objects
+                          .filter(choice__question=self)
+                          .values_list('choice')
+                          .annotate(Sum('count')))
+            cache.set(key, counts,
+                      getattr(settings, 'POLLS_SHARD_CACHE_TIMEOUT', 2))
+        return counts
+
+    def is_frozen(self):
+        """Check if the poll closed long enough ago for its results to stay.
+
+        ``POLLS_SNAPSHOT_GRACE`` seconds after ``end_date`` lets votes that
+        were already in flight at closing time land first.
+        """
+        if self.end_date is None:
+            return False
+        grace = datetime.timedelta(
+            seconds=getattr(settings, 'POLLS_SNAPSHOT_GRACE', 60))
+        return self.end_date + grace < timezone.now()
+
+    def snapshot(self):
+        """Return the frozen results of a closed poll, writing them once."""
+        try:
+            return self.resultsnapshot
+        except ResultSnapshot.DoesNotExist:
+            return ResultSnapshot.take(self)
+
+    def total_votes(self):
+        """Return the number of votes cast on this question."""
+        if self.is_frozen():
+            return self.snapshot().total_votes
+        if self.is_sharded:
+            return self.vote_total + sum(self.shard_counts().values())
+        return self.vote_total
+
+    def results(self):
+        """Return the choices with their vote counts and percentages.
+
+        Closed polls are served from their snapshot; open ones are counted.
+        """
+        if self.is_frozen():
+            return self.snapshot().results()
+        return self.counted_results()
+
+    def counted_results(self):
+        """Return the choices with counts read from the stored counters.
+
+        Everything comes from one query over the stored counters, so the
+        cost does not grow with the number of choices.
+        """
+        if self.is_sharded:
+            return self.sharded_results()
+        percent = Cast(F('votes'), FloatField()) * 100.0 \
+            / NullIf(F('question__vote_total'), 0)
+        return self.choice_set.annotate(
+            percent=Coalesce(percent, Value(0.0))).order_by('pk')
+
+    def sharded_results(self):
+        """Return the choices with their shards added to the stored counts.
+
+        The stored counters keep whatever was counted before the question
+        was sharded; ``rebuild_vote_counts`` folds the shards back in.
+        """
+        counts = self.shard_counts()
+        total = self.vote_total + sum(counts.values())
+        choices = list(self.choice_set.order_by('pk'))
+        for choice in choices:
+            choice.votes += counts.get(choice.pk, 0)
+            choice.percent = choice.votes * 100.0 / total if total else 0.0
+        return choices
+
+    def vote_curve(self, since=None, until=None, step='hour'):
+        """Return ``{'bucket', 'choice', 'votes'}`` rows of votes over time.
+
+        Rows come from the per-minute ``VoteTally`` table, summed into
+        `step` buckets ('minute', 'hour' or 'day') between `since` and
+        `until`, so the Vote table is not scanned.
+        """
+        tallies = VoteTally.objects.filter(question=self)
+        if since is not None:
+            tallies = tallies.filter(minute__gte=since)
+        if until is not None:
+            tallies = tallies.filter(minute__lt=until)
+        return tallies.annotate(bucket=Trunc('minute', step))\
+            .values('bucket', 'choice').annotate(votes=Sum('count'))\
+            .order_by('bucket', 'choice')
 
     was_published_recently.admin_order_field = 'pub_date'
     was_published_recently.admin_order_field = 'end_date'
@@ -42,15 +251,302 @@ class Choice(models.Model):
 
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
-
-    @property
-    def votes(self):
-        return self.vote_set.all().count()
+    votes = models.IntegerField(default=0)
 
     def __str__(self):
         """Return choice's text."""
         return self.choice_text
 
+    def save(self, *args, **kwargs):
+        """Save the choice, leaving its vote counter alone."""
+        save_without_counters(self, ('votes',), args, kwargs)
+
+
+class ResultSnapshot(models.Model):
+    """Results of a closed poll, written once and served from then on."""
+
+    question = models.OneToOneField(Question, on_delete=models.CASCADE,
+                                    primary_key=True)
+    total_votes = models.IntegerField()
+    choices = models.JSONField()
+    taken_at = models.DateTimeField(auto_now_add=True)
+    votes_archived = models.BooleanField(
+        default=False, help_text="The raw votes were moved to cold storage "
+                                 "and only this snapshot remains.")
+
+    @classmethod
+    def take(cls, question):
+        """Count `question` now and store the result, unless already done.
+
+        The counts come from the primary, as a lagging replica's would be
+        frozen for good. The total is summed from them, since the
+        question's own ``vote_total`` may have been read from a replica.
+        """
+        with use_primary():
+            choices = [{'id': choice.pk, 'choice_text': choice.choice_text,
+                        'votes': choice.votes, 'percent': choice.percent}
+                       for choice in question.counted_results()]
+            snapshot, _ = cls.objects.get_or_create(
+                question=question, defaults={
+                    'total_votes': sum(choice['votes'] for choice in choices),
+                    'choices': choices,
+                })
+        return snapshot
+
+    def results(self):
+        """Return unsaved Choice objects carrying the frozen counts."""
+        results = []
+        for row in self.choices:
+            choice = Choice(pk=row['id'], question_id=self.question_id,
+                            choice_text=row['choice_text'],
+                            votes=row['votes'])
+            choice.percent = row['percent']
+            results.append(choice)
+        return results
+
+
+class ChoiceShard(models.Model):
+    """One slice of a sharded choice's vote counter."""
+
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE,
+                               related_name='shards')
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['choice', 'shard'],
+                                    name='unique_choice_shard'),
+        ]
+
+    @classmethod
+    def add(cls, choice_id, shards, amount):
+        """Add `amount` to a random one of the choice's `shards` rows."""
+        shard = random.randrange(shards)
+        rows = cls.objects.filter(choice_id=choice_id, shard=shard)
+        if rows.update(count=F('count') + amount):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(choice_id=choice_id, shard=shard,
+                                   count=amount)
+        except IntegrityError:
+            rows.update(count=F('count') + amount)
+
+
+def minute_of(when):
+    """Return `when` truncated to the start of its minute."""
+    return when.replace(second=0, microsecond=0)
+
+
+class VoteTally(models.Model):
+    """Votes cast for one choice during one minute.
+
+    Vote writers keep these rows in step with the Vote table, so the vote
+    curve of a poll is read from a few rows per minute instead of from
+    every vote. A changed vote is taken out of the minute it was first
+    cast in and counted in the minute it changed. Sharded questions spread
+    each minute over ``counter_shards`` rows, as their counters are.
+    """
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE,
+                               related_name='tallies')
+    minute = models.DateTimeField()
+    shard = models.PositiveSmallIntegerField(default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['choice', 'minute', 'shard'],
+                                    name='unique_choice_minute_shard'),
+        ]
+        indexes = [
+            models.Index(fields=['question', 'minute'],
+                         name='tally_question_minute_idx'),
+        ]
+
+    @classmethod
+    def add(cls, question_id, choice_id, when, amount, shards=1):
+        """Add `amount` to a random one of the tally's `shards` rows."""
+        shard = random.randrange(shards) if shards > 1 else 0
+        rows = cls.objects.filter(choice_id=choice_id, minute=minute_of(when),
+                                  shard=shard)
+        if rows.update(count=F('count') + amount):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(question_id=question_id,
+                                   choice_id=choice_id,
+                                   minute=minute_of(when), shard=shard,
+                                   count=amount)
+        except IntegrityError:
+            rows.update(count=F('count') + amount)
+
+
+class VoteManager(models.Manager):
+    """Write votes while keeping the stored tallies in step."""
+
+    def record_vote(self, user, question, selected_choice, voted_at=None):
+        """Create or change the user's vote and update the counters.
+
+        The vote row, the ``Choice.votes``/``Question.vote_total``
+        counters and the per-minute tallies are written in one
+        transaction, so a changed vote moves one count from the old
+        choice to the new one. Sharded questions update a random
+        ``ChoiceShard`` row instead of those counters, and a random shard
+        of the minute's tally.
+        """
+        voted_at = voted_at or timezone.now()
+        with use_primary(), transaction.atomic(using=self.db):
+            if self.insert_if_absent(user.pk, question.pk,
+                                     selected_choice.pk, voted_at):
+                self.touch_question(question, 1)
+                self.add_to_counter(question, selected_choice.pk, 1)
+                VoteTally.add(question.pk, selected_choice.pk, voted_at, 1,
+                              question.counter_shards)
+                return
+            vote = self.select_for_update().get(user=user,
+                                                question=question)
+            if vote.selected_choice_id == selected_choice.pk:
+                return
+            self.touch_question(question, 0)
+            self.add_to_counter(question, vote.selected_choice_id, -1)
+            if vote.voted_at is not None:
+                VoteTally.add(question.pk, vote.selected_choice_id,
+                              vote.voted_at, -1, question.counter_shards)
+            self.filter(pk=vote.pk).update(selected_choice=selected_choice,
+                                           voted_at=voted_at)
+            self.add_to_counter(question, selected_choice.pk, 1)
+            VoteTally.add(question.pk, selected_choice.pk, voted_at, 1,
+                          question.counter_shards)
+
+    def insert_if_absent(self, user_id, question_id, choice_id,
+                         voted_at=None):
+        """Insert a vote unless the user already has one; return True if so.
+
+        This is one ``INSERT ... ON CONFLICT DO NOTHING`` statement against
+        the unique (user, question) constraint, so two concurrent first
+        votes cannot both be stored.
+        """
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        meta = self.model._meta
+        user, question, choice, voted = (
+            quote(meta.get_field(name).column)
+            for name in ('user', 'question', 'selected_choice', 'voted_at'))
+        sql = ("INSERT INTO %s (%s, %s, %s, %s) VALUES (%%s, %%s, %%s, %%s) "
+               "ON CONFLICT (%s, %s) DO NOTHING" % (
+                   quote(meta.db_table), user, question, choice, voted,
+                   user, question))
+        voted_at = connection.ops.adapt_datetimefield_value(
+            voted_at or timezone.now())
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user_id, question_id, choice_id, voted_at])
+            return cursor.rowcount == 1
+
+    def record_batch(self, ballots):
+        """Apply many ``(user_id, question_id, choice_id)`` ballots at once.
+
+        A ballot may carry the time it was cast as a fourth item; it
+        defaults to now. As with ``record_vote`` the last ballot per user
+        and question wins. Ballots from users or for questions or choices
+        deleted since they were cast are dropped. Return the number of votes
+        created or changed.
+        """
+        now = timezone.now()
+        latest = {}
+        for user_id, question_id, choice_id, *cast_at in ballots:
+            latest[user_id, question_id] = (choice_id,
+                                            cast_at[0] if cast_at else now)
+        if not latest:
+            return 0
+        with use_primary(), transaction.atomic(using=self.db):
+            questions = Question.objects.in_bulk(
+                {question_id for _, question_id in latest})
+            valid = set(Choice.objects.filter(
+                pk__in={choice_id for choice_id, _ in latest.values()},
+                question__in=questions)
+                .values_list('pk', 'question'))
+            users = set(User.objects.filter(
+                pk__in={user_id for user_id, _ in latest})
+                .values_list('pk', flat=True))
+            existing = {(vote.user_id, vote.question_id): vote
+                        for vote in self.select_for_update().filter(
+                            question__in=questions, user__in=users)}
+            created, changed = [], []
+            deltas = Counter()
+            totals = Counter()
+            tallies = Counter()
+            for (user_id, question_id), (choice_id, voted_at) \
+                    in latest.items():
+                if (choice_id, question_id) not in valid \
+                        or user_id not in users:
+                    continue
+                vote = existing.get((user_id, question_id))
+                if vote is None:
+                    created.append(self.model(
+                        user_id=user_id, question_id=question_id,
+                        selected_choice_id=choice_id, voted_at=voted_at))
+                    totals[question_id] += 1
+                elif vote.selected_choice_id == choice_id:
+                    continue
+                else:
+                    deltas[question_id, vote.selected_choice_id] -= 1
+                    if vote.voted_at is not None:
+                        tallies[question_id, vote.selected_choice_id,
+                                minute_of(vote.voted_at)] -= 1
+                    vote.selected_choice_id = choice_id
+                    vote.voted_at = voted_at
+                    changed.append(vote)
+                deltas[question_id, choice_id] += 1
+                tallies[question_id, choice_id, minute_of(voted_at)] += 1
+            try:
+                with transaction.atomic(using=self.db):
+                    self.bulk_create(created)
+            except IntegrityError:
+                # A request stored one of these votes meanwhile; replay the
+                # batch ballot by ballot, which copes with existing rows.
+                for vote in created + changed:
+                    self.record_vote(User(pk=vote.user_id),
+                                     questions[vote.question_id],
+                                     Choice(pk=vote.selected_choice_id),
+                                     vote.voted_at)
+                return len(created) + len(changed)
+            self.bulk_update(changed, ['selected_choice', 'voted_at'])
+            for (question_id, choice_id), amount in deltas.items():
+                if amount:
+                    self.add_to_counter(questions[question_id], choice_id,
+                                        amount)
+            for (question_id, choice_id, minute), amount in tallies.items():
+                if amount:
+                    VoteTally.add(question_id, choice_id, minute, amount,
+                                  questions[question_id].counter_shards)
+            for question_id in {question_id for question_id, _ in deltas}:
+                self.touch_question(questions[question_id],
+                                    totals[question_id])
+        return len(created) + len(changed)
+
+    def touch_question(self, question, new_votes):
+        """Add `new_votes` to the total and bump the results version.
+
+        Sharded questions skip this to keep their hot row untouched; their
+        total and version come from the shard sums instead.
+        """
+        if not question.is_sharded:
+            Question.objects.filter(pk=question.pk).update(
+                vote_total=F('vote_total') + new_votes,
+                results_version=F('results_version') + 1,
+                results_modified=timezone.now())
+
+    def add_to_counter(self, question, choice_id, amount):
+        """Add `amount` to the choice's counter or one of its shards."""
+        if question.is_sharded:
+            ChoiceShard.add(choice_id, question.counter_shards, amount)
+        else:
+            Choice.objects.filter(pk=choice_id)\
+                .update(votes=F('votes') + amount)
+
 
 class Vote(models.Model):
     """Fields for Vote object."""
@@ -58,3 +554,16 @@ class Vote(models.Model):
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     selected_choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    voted_at = models.DateTimeField(default=timezone.now, null=True)
+
+    objects = VoteManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'question'],
+                                    name='unique_user_question_vote'),
+        ]
+        indexes = [
+            models.Index(fields=['question', 'selected_choice'],
+                         name='vote_question_choice_idx'),
+        ]
@@ -0,0 +1,173 @@
+"""Rolling per-view timings collected by ``ProfilingMiddleware``.
+
+Each URL name keeps the last ``POLLS_PROFILING_WINDOW`` requests of wall
+time, database time, query count and template time, plus a tally of the
+SQL statements that ran more than once in the same request.
+"""
+import bisect
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+
+log = logging.getLogger("polls.profiling")
+
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+current = contextvars.ContextVar('polls_profile', default=None)
+
+
+def window():
+    """Return how many recent requests each view keeps."""
+    return getattr(settings, 'POLLS_PROFILING_WINDOW', 1000)
+
+
+class RequestProfile:
+    """Measurements of one request while it runs."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        """Time one query; installed with ``connection.execute_wrapper``."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - start
+            self.queries += 1
+            self.statements[sql] += 1
+
+
+def summarize(samples):
+    """Return percentiles and a bucket histogram of `samples` in ms."""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def rank(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+    histogram = [0] * (len(BUCKETS_MS) + 1)
+    for sample in ordered:
+        histogram[bisect.bisect_left(BUCKETS_MS, sample)] += 1
+    return {
+        'count': len(ordered),
+        'mean': round(sum(ordered) / len(ordered), 3),
+        'p50': round(rank(0.5), 3),
+        'p90': round(rank(0.9), 3),
+        'p99': round(rank(0.99), 3),
+        'max': round(ordered[-1], 3),
+        'buckets_ms': dict(zip([str(b) for b in BUCKETS_MS] + ['inf'],
+                               histogram)),
+    }
+
+
+class ViewStats:
+    """Rolling window of measurements for one URL name."""
+
+    def __init__(self, size):
+        self.total = 0
+        self.wall = deque(maxlen=size)
+        self.db = deque(maxlen=size)
+        self.template = deque(maxlen=size)
+        self.queries = deque(maxlen=size)
+        self.duplicates = Counter()
+
+    def add(self, profile, wall_seconds):
+        """Record one finished request."""
+        self.total += 1
+        self.wall.append(wall_seconds * 1000)
+        self.db.append(profile.db_seconds * 1000)
+        self.template.append(profile.template_seconds * 1000)
+        self.queries.append(profile.queries)
+        for sql, count in profile.statements.items():
+            if count > 1:
+                self.duplicates[sql] += count - 1
+
+    def report(self, top=5):
+        """Return this view's figures as plain data."""
+        return {
+            'requests': self.total,
+            'wall_ms': summarize(self.wall),
+            'db_ms': summarize(self.db),
+            'template_ms': summarize(self.template),
+            'queries': summarize(self.queries),
+            'duplicate_sql': [{'sql': sql, 'repeats': count}
+                              for sql, count in
+                              self.duplicates.most_common(top)],
+        }
+
+
+class Registry:
+    """All views' stats, shared by every thread in the process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.last_log = time.monotonic()
+
+    def add(self, view_name, profile, wall_seconds):
+        """Record a request, then log a summary if one is due."""
+        with self.lock:
+            stats = self.views.get(view_name)
+            if stats is None:
+                stats = self.views[view_name] = ViewStats(window())
+            stats.add(profile, wall_seconds)
+            interval = getattr(settings, 'POLLS_PROFILING_LOG_INTERVAL', 60)
+            due = time.monotonic() - self.last_log >= interval
+            if due:
+                self.last_log = time.monotonic()
+        if due:
+            self.log()
+
+    def report(self):
+        """Return ``{view_name: figures}`` for every view seen."""
+        with self.lock:
+            return {name: stats.report()
+                    for name, stats in sorted(self.views.items())}
+
+    def log(self):
+        """Write one structured log line per view."""
+        for name, figures in self.report().items():
+            log.info(json.dumps(dict(figures, view=name)))
+
+    def reset(self):
+        """Drop everything recorded so far."""
+        with self.lock:
+            self.views = {}
+
+
+registry = Registry()
+
+_patched = False
+_patch_lock = threading.Lock()
+
+
+def time_templates():
+    """Make Django template rendering add its time to the current profile."""
+    global _patched
+    with _patch_lock:
+        if _patched:
+            return
+        from django.template.backends.django import Template
+        render = Template.render
+
+        def timed_render(self, context=None, request=None):
+            profile = current.get()
+            if profile is None:
+                return render(self, context, request)
+            start = time.perf_counter()
+            try:
+                return render(self, context, request)
+            finally:
+                profile.template_seconds += time.perf_counter() - start
+        Template.render = timed_render
+        _patched = True
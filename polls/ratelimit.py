@@ -0,0 +1,179 @@
+"""Token-bucket rate limiting for the vote view.
+
+Each client IP and each logged-in user has a bucket of
+``POLLS_VOTE_*BURST`` tokens refilled at ``POLLS_VOTE_*RATE`` tokens per
+second; a vote takes one token, and a vote with none left is answered
+with 429 before the view runs. ``POLLS_RATELIMIT`` picks where buckets
+live: ``'local'`` keeps them in process memory, ``'cache'`` in the
+default cache so several workers share them, and ``'off'`` disables
+limiting.
+"""
+import functools
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.crypto import get_random_string
+
+
+def get_client_ip(request):
+    """Return the client's IP address.
+
+    ``X-Forwarded-For`` is only believed with
+    ``POLLS_TRUST_X_FORWARDED_FOR``, since clients can set it themselves.
+    """
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for and getattr(settings, 'POLLS_TRUST_X_FORWARDED_FOR',
+                                   False):
+        return x_forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
+
+
+class LocalStore:
+    """Token buckets in process memory, shared by every thread."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.buckets = {}
+
+    def take(self, key, rate, burst, now=None):
+        """Take a token from `key`'s bucket.
+
+        Return 0 if one was available, otherwise the seconds until the
+        next token.
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            tokens, stamp, _ = self.buckets.get(key, (burst, now, now))
+            tokens = min(burst, tokens + (now - stamp) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            self.buckets[key] = (tokens, now,
+                                 now + (burst - tokens) / rate)
+            if len(self.buckets) > self.max_keys:
+                self.prune(now)
+            return wait
+
+    def prune(self, now):
+        """Forget buckets that have filled up again, or all if none have."""
+        self.buckets = {key: bucket for key, bucket in self.buckets.items()
+                        if bucket[2] > now}
+        if len(self.buckets) > self.max_keys:
+            self.buckets = {}
+
+    def reset(self):
+        """Forget every bucket."""
+        with self.lock:
+            self.buckets = {}
+
+
+class CacheStore:
+    """Counters in the default cache, shared by every worker.
+
+    Cache backends have no atomic read-modify-write beyond ``incr``, so
+    a bucket is approximated by a counter per window of
+    ``burst / rate`` seconds that admits `burst` requests: the same
+    sustained rate, with bursts of up to twice `burst` across a window
+    edge. Use a shared backend such as Memcached or Redis; LocMemCache is
+    per process and culls counters once it holds 300 keys.
+    """
+
+    def __init__(self):
+        self.prefix = 'polls:ratelimit:'
+
+    def take(self, key, rate, burst, now=None):
+        """Count one request for `key`; see ``LocalStore.take``."""
+        now = time.time() if now is None else now
+        window = burst / rate
+        slot = int(now // window)
+        cache_key = '%s%s:%d' % (self.prefix, key, slot)
+        timeout = math.ceil(window) + 1
+        cache.add(cache_key, 0, timeout)
+        try:
+            count = cache.incr(cache_key)
+        except ValueError:
+            cache.set(cache_key, 1, timeout)
+            count = 1
+        if count <= burst:
+            return 0.0
+        return (slot + 1) * window - now
+
+    def reset(self):
+        """Count under a new key prefix from now on.
+
+        Only this store's counters are affected; the old ones expire
+        within a window. Cache backends cannot delete keys by prefix.
+        """
+        self.prefix = 'polls:ratelimit:%s:' % get_random_string(8)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store():
+    """Return the store chosen by ``POLLS_RATELIMIT``, or None if off."""
+    kind = getattr(settings, 'POLLS_RATELIMIT', 'local')
+    if kind == 'off':
+        return None
+    with _stores_lock:
+        if kind not in _stores:
+            _stores[kind] = CacheStore() if kind == 'cache' else LocalStore()
+        return _stores[kind]
+
+
+def ip_wait(request, store):
+    """Take a vote token from the client IP's bucket; see ``vote_wait``.
+
+    It needs nothing but the request, so async views call it on the
+    event loop when `store` is a ``LocalStore``; a ``CacheStore`` talks
+    to the cache server and is called from a thread.
+    """
+    return store.take('ip:%s' % get_client_ip(request),
+                      settings.POLLS_VOTE_IP_RATE,
+                      settings.POLLS_VOTE_IP_BURST)
+
+
+def user_wait(request, store):
+    """Take a vote token from the logged-in user's bucket, if any.
+
+    The user id is read from the session without loading the user.
+    """
+    user_id = request.session.get(SESSION_KEY)
+    if user_id is None:
+        return 0.0
+    return store.take('user:%s' % user_id, settings.POLLS_VOTE_RATE,
+                      settings.POLLS_VOTE_BURST)
+
+
+def vote_wait(request):
+    """Take a vote token for the client; return the seconds to wait or 0."""
+    store = get_store()
+    if store is None:
+        return 0.0
+    return ip_wait(request, store) or user_wait(request, store)
+
+
+def too_many_votes(wait):
+    """Return the 429 response telling the client to wait `wait` seconds."""
+    response = HttpResponse("Too many votes; try again shortly.",
+                            status=429, content_type='text/plain')
+    response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+def limit_votes(view):
+    """Answer votes over the client's rate with 429 Too Many Requests."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        wait = vote_wait(request)
+        if wait:
+            return too_many_votes(wait)
+        return view(request, *args, **kwargs)
+    return wrapper
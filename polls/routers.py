@@ -0,0 +1,62 @@
+"""Send polls reads to read replicas and writes to the primary.
+
+Replicas are the database aliases listed in ``POLLS_READ_REPLICAS``.
+Code that must see its own writes runs inside ``use_primary()``; a user
+who just voted carries a short-lived cookie that pins their requests to
+the primary in the same way (see ``PrimaryPinMiddleware``).
+"""
+import contextlib
+import contextvars
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'polls_primary'
+
+pinned = contextvars.ContextVar('polls_pinned', default=False)
+
+
+@contextlib.contextmanager
+def use_primary():
+    """Route every polls read in the block to the primary."""
+    token = pinned.set(True)
+    try:
+        yield
+    finally:
+        pinned.reset(token)
+
+
+def pin_response(response):
+    """Make the client's next requests read from the primary for a while."""
+    response.set_cookie(PIN_COOKIE, '1', httponly=True, samesite='Lax',
+                        max_age=getattr(settings, 'POLLS_PRIMARY_PIN_SECONDS',
+                                        10))
+    return response
+
+
+class PrimaryReplicaRouter:
+    """Database router for the polls app."""
+
+    def db_for_read(self, model, **hints):
+        """Pick a replica for polls reads unless pinned to the primary."""
+        if model._meta.app_label != 'polls':
+            return None
+        replicas = getattr(settings, 'POLLS_READ_REPLICAS', [])
+        if pinned.get() or not replicas:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        """Send every polls write to the primary."""
+        if model._meta.app_label != 'polls':
+            return None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Allow relations between rows of the primary and its replicas."""
+        databases = {DEFAULT_DB_ALIAS,
+                     *getattr(settings, 'POLLS_READ_REPLICAS', [])}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,91 @@
+"""Full-text search over question text with SQLite FTS5.
+
+``install_fts`` runs after every ``migrate`` and (re)creates the FTS5
+index and the triggers that keep it in step with ``polls_question``.
+Django's SQLite schema editor rebuilds a table to alter it, which drops
+its triggers, so they are checked again each time. On other databases,
+or SQLite builds without FTS5, nothing is installed and ``is_available``
+is false.
+"""
+import logging
+
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db.models.expressions import RawSQL
+
+log = logging.getLogger("polls")
+
+FTS_TABLE = 'polls_question_fts'
+TRIGGERS = {
+    'polls_question_fts_insert': (
+        "AFTER INSERT ON polls_question BEGIN "
+        "INSERT INTO polls_question_fts (rowid, question_text) "
+        "VALUES (new.id, new.question_text); END"),
+    'polls_question_fts_delete': (
+        "AFTER DELETE ON polls_question BEGIN "
+        "INSERT INTO polls_question_fts "
+        "(polls_question_fts, rowid, question_text) "
+        "VALUES ('delete', old.id, old.question_text); END"),
+    'polls_question_fts_update': (
+        "AFTER UPDATE OF question_text ON polls_question BEGIN "
+        "INSERT INTO polls_question_fts "
+        "(polls_question_fts, rowid, question_text) "
+        "VALUES ('delete', old.id, old.question_text); "
+        "INSERT INTO polls_question_fts (rowid, question_text) "
+        "VALUES (new.id, new.question_text); END"),
+}
+
+
+def installed_triggers(cursor):
+    """Return the names of the FTS triggers present in the database."""
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+        "AND name IN (%s)" % ', '.join(['%s'] * len(TRIGGERS)),
+        list(TRIGGERS))
+    return {name for name, in cursor.fetchall()}
+
+
+def install_fts(sender=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Create the FTS5 index and its triggers unless they are all there."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        if installed_triggers(cursor) == set(TRIGGERS):
+            return
+        try:
+            cursor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS %s USING fts5("
+                "question_text, content='polls_question', "
+                "content_rowid='id')" % FTS_TABLE)
+        except OperationalError:
+            log.warning("SQLite has no FTS5; admin search uses prefixes.")
+            return
+        for name, body in TRIGGERS.items():
+            cursor.execute("CREATE TRIGGER IF NOT EXISTS %s %s"
+                           % (name, body))
+        cursor.execute("INSERT INTO %s (%s) VALUES ('rebuild')"
+                       % (FTS_TABLE, FTS_TABLE))
+
+
+def is_available(using=DEFAULT_DB_ALIAS):
+    """Check if the FTS index exists and is kept up to date."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        return installed_triggers(cursor) == set(TRIGGERS)
+
+
+def match_query(text):
+    """Return an FTS5 query matching every word of `text` as a prefix."""
+    return ' '.join('"%s"*' % word.replace('"', '""')
+                    for word in text.split())
+
+
+def matching(queryset, text):
+    """Filter a Question queryset to rows whose text matches `text`."""
+    if not text.split():
+        return queryset
+    return queryset.filter(pk__in=RawSQL(
+        "SELECT rowid FROM %s WHERE %s MATCH %%s" % (FTS_TABLE, FTS_TABLE),
+        [match_query(text)]))
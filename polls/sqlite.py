@@ -0,0 +1,19 @@
+"""Per-connection SQLite tuning.
+
+``apply_pragmas`` runs on every new database connection and issues the
+PRAGMAs listed in ``POLLS_SQLITE_PRAGMAS``, e.g. WAL journaling so vote
+writes stop blocking readers of the results page.
+"""
+from django.conf import settings
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """Signal receiver for ``connection_created``."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'POLLS_SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute('PRAGMA %s = %s' % (name, value))
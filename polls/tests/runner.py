@@ -0,0 +1,30 @@
+"""Test runner that keeps the audit log out of the working tree."""
+import os
+import shutil
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .. import audit
+
+
+class PollsTestRunner(DiscoverRunner):
+    """Run the tests with ``POLLS_AUDIT_LOG`` in a temporary directory.
+
+    Tests log in and vote, so the default audit log would collect their
+    events next to the real ones.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.audit_directory = tempfile.mkdtemp()
+        self.audit_settings = override_settings(POLLS_AUDIT_LOG=os.path.join(
+            self.audit_directory, 'audit.ndjson'))
+        self.audit_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        audit.stop()
+        self.audit_settings.disable()
+        shutil.rmtree(self.audit_directory)
+        super().teardown_test_environment(**kwargs)
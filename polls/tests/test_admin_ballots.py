@@ -0,0 +1,56 @@
+"""Unittests for the ballot CSV download in the admin."""
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from ..models import Question, Choice, Vote
+from .utils import create_question
+
+
+class BallotDownloadTests(TestCase):
+    """Unittests for streaming a poll's votes as CSV."""
+
+    def setUp(self):
+        self.question = create_question("Question.", days=-1, end_date=5)
+        yes = Choice.objects.create(question=self.question, choice_text="Yes")
+        no = Choice.objects.create(question=self.question, choice_text="No")
+        for i, choice in enumerate([yes, no]):
+            user = User.objects.create_user(username="user%d" % i)
+            Vote.objects.record_vote(user, self.question, choice)
+        self.admin = User.objects.create_superuser(username="admin",
+                                                   password="password")
+
+    def read(self, response):
+        """Return the streamed CSV as a list of lines."""
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_ballots_view(self):
+        """Test that the per-question URL streams every vote."""
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse(
+            'admin:polls_question_ballots', args=(self.question.pk,)))
+        lines = self.read(response)
+        self.assertEqual(lines[0], 'question,user,choice,voted_at')
+        self.assertEqual([line.rsplit(',', 1)[0] for line in lines[1:]], [
+            '%d,user0,Yes' % self.question.pk,
+            '%d,user1,No' % self.question.pk,
+        ])
+
+    def test_ballots_view_requires_staff(self):
+        """Test that non-staff users are sent to the admin login."""
+        self.client.force_login(User.objects.get(username="user0"))
+        response = self.client.get(reverse(
+            'admin:polls_question_ballots', args=(self.question.pk,)))
+        self.assertEqual(response.status_code, 302)
+
+    def test_admin_action(self):
+        """Test that the changelist action streams the selected polls."""
+        other = create_question("Other.", days=-1, end_date=5)
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            reverse('admin:polls_question_changelist'),
+            {'action': 'export_ballots',
+             '_selected_action': [self.question.pk, other.pk]})
+        self.assertEqual(len(self.read(response)), 3)
@@ -0,0 +1,81 @@
+"""Unittests for the question changelist in the admin."""
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .. import search
+from ..admin import EstimatedCountPaginator
+from ..models import Question, Choice
+from .utils import create_question
+
+
+class QuestionChangelistTests(TestCase):
+    """Unittests for QuestionAdmin's listing, search and paging."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin",
+                                                   password="password")
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:polls_question_changelist')
+
+    def add_questions(self, count):
+        """Create `count` questions with two choices each."""
+        for i in range(count):
+            question = create_question("Question %d." % i, days=-1,
+                                       end_date=5)
+            for text in ("Yes", "No"):
+                Choice.objects.create(question=question, choice_text=text)
+
+    def test_changelist_queries_do_not_grow(self):
+        """Test that choice counts are part of the changelist query."""
+        self.add_questions(2)
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.get(self.url)
+        self.assertContains(response, "Question 1.")
+        self.assertEqual(response.context['cl'].result_list[0].choice_count,
+                         2)
+        self.add_questions(10)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(self.url)
+        self.assertEqual(len(few), len(many))
+
+    def test_full_text_search(self):
+        """Test that search matches word prefixes anywhere in the text."""
+        create_question("What is your favourite colour?", days=-1,
+                        end_date=5)
+        create_question("Which pet?", days=-1, end_date=5)
+        self.assertTrue(search.is_available())
+        response = self.client.get(self.url, {'q': 'favo col'})
+        self.assertEqual([q.question_text for q in
+                          response.context['cl'].result_list],
+                         ["What is your favourite colour?"])
+        response = self.client.get(self.url, {'q': '"pet'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_search_index_follows_edits(self):
+        """Test that renamed and deleted questions leave the index."""
+        question = create_question("Old name", days=-1, end_date=5)
+        question.question_text = "New name"
+        question.save()
+        matches = search.matching(Question.objects.all(), "old")
+        self.assertFalse(matches.exists())
+        self.assertTrue(search.matching(Question.objects.all(),
+                                        "new").exists())
+        question.delete()
+        self.assertFalse(search.matching(Question.objects.all(),
+                                         "new").exists())
+
+    def test_estimated_count(self):
+        """Test that big lists are estimated rather than counted."""
+        self.add_questions(5)
+
+        class SmallLimit(EstimatedCountPaginator):
+            exact_limit = 3
+
+        questions = Question.objects.order_by('pk')
+        self.assertEqual(EstimatedCountPaginator(questions, 2).count, 5)
+        self.assertEqual(SmallLimit(questions, 2).count,
+                         questions.last().pk)
+        self.assertEqual(SmallLimit(questions.filter(pk__gt=0), 2).count, 3)
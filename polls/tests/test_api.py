@@ -0,0 +1,82 @@
+"""Unittests for the JSON API and conditional results responses."""
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from ..models import Question, Choice, Vote
+from .utils import create_question
+
+
+class ResultsApiTests(TestCase):
+    """Unittests for the listing and results endpoints."""
+
+    def setUp(self):
+        cache.clear()
+        self.question = create_question("Question.", days=-1)
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="Yes")
+        self.url = reverse('polls:api_results', args=(self.question.id,))
+
+    def vote(self, username):
+        """Record a vote for the only choice."""
+        user = User.objects.create_user(username=username)
+        Vote.objects.record_vote(user, self.question, self.choice)
+
+    def test_question_list(self):
+        """Test that the listing returns the published questions."""
+        create_question("Future.", days=3)
+        response = self.client.get(reverse('polls:api_questions'))
+        data = response.json()
+        self.assertEqual([q['question_text'] for q in data['questions']],
+                         ["Question."])
+        self.assertTrue(data['questions'][0]['open'])
+        etag = response['ETag']
+        response = self.client.get(reverse('polls:api_questions'),
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_results(self):
+        """Test that results carry counts, percentages and the total."""
+        self.vote("lisbono")
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['total_votes'], 1)
+        self.assertEqual(data['choices'][0]['votes'], 1)
+        self.assertEqual(data['choices'][0]['percent'], 100.0)
+
+    def test_not_modified_skips_aggregation(self):
+        """Test that a matching ETag costs only the version lookup."""
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_vote_changes_etag(self):
+        """Test that a vote makes the old ETag stale."""
+        etag = self.client.get(self.url)['ETag']
+        self.vote("lisbono")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_edit_changes_etag(self):
+        """Test that editing a choice makes the old ETag stale."""
+        etag = self.client.get(self.url)['ETag']
+        self.choice.choice_text = "Sure"
+        self.choice.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_html_results_not_modified(self):
+        """Test that the results page honours If-None-Match too."""
+        url = reverse('polls:results', args=(self.question.id,))
+        response = self.client.get(url)
+        self.assertNotEqual(response['ETag'],
+                            self.client.get(self.url)['ETag'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_question(self):
+        """Test that an unknown question gets a 404."""
+        url = reverse('polls:api_results', args=(999,))
+        self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,141 @@
+"""Unittests for the async polls pages served under POLLS_ASYNC_VIEWS."""
+import asyncio
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from .. import async_views, ratelimit, routers
+from ..models import Choice, Vote
+from .utils import create_question
+
+
+def form(**data):
+    """Return `data` urlencoded; AsyncClient cannot post multipart here."""
+    return {'data': urlencode(data),
+            'content_type': 'application/x-www-form-urlencoded'}
+
+
+@override_settings(ROOT_URLCONF='mysite.async_urls')
+class AsyncViewTests(TestCase):
+    """Unittests for the async index, detail, vote and results views."""
+
+    def setUp(self):
+        ratelimit.get_store().reset()
+        cache.clear()
+        self.question = create_question("Async question.", days=-1,
+                                        end_date=5)
+        self.yes = Choice.objects.create(question=self.question,
+                                         choice_text="Yes")
+        self.user = User.objects.create_user(username="lisbono",
+                                             password="password")
+        self.async_client.force_login(self.user)
+
+    def test_urls_use_async_views(self):
+        """Test that the async URLconf keeps the polls URL names."""
+        response = self.client.get(reverse('polls:index'))
+        self.assertEqual(response.resolver_match.func.__module__,
+                         'polls.async_views')
+
+    async def test_index(self):
+        """Test that the index lists published polls and the user."""
+        response = await self.async_client.get(reverse('polls:index'))
+        self.assertContains(response, "Async question.")
+        self.assertContains(response, "User: lisbono")
+
+    async def test_detail_requires_login(self):
+        """Test that anonymous users are sent to the login page."""
+        url = reverse('polls:detail', args=(self.question.id,))
+        response = await AsyncClient().get(url)
+        self.assertRedirects(response, '/accounts/login/?next=' + url,
+                             fetch_redirect_response=False)
+
+    async def test_detail(self):
+        """Test that the detail page shows the choices."""
+        response = await self.async_client.get(
+            reverse('polls:detail', args=(self.question.id,)))
+        self.assertContains(response, "Yes")
+
+    async def test_vote(self):
+        """Test that a vote is counted and pins the client to the primary."""
+        response = await self.async_client.post(
+            reverse('polls:vote', args=(self.question.id,)),
+            **form(choice=self.yes.pk))
+        self.assertRedirects(response, reverse('polls:results',
+                                               args=(self.question.id,)),
+                             fetch_redirect_response=False)
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_vote_is_stored(self):
+        """Test that the async vote view writes the vote, also under WSGI."""
+        self.client.force_login(self.user)
+        self.client.post(reverse('polls:vote', args=(self.question.id,)),
+                         {'choice': self.yes.pk})
+        self.assertTrue(Vote.objects.filter(user=self.user,
+                                            selected_choice=self.yes).exists())
+
+    async def test_vote_without_choice(self):
+        """Test that a vote without a choice shows the error message."""
+        response = await self.async_client.post(
+            reverse('polls:vote', args=(self.question.id,)), **form())
+        self.assertContains(response, "You didn&#x27;t select a choice.")
+
+    @override_settings(POLLS_RATELIMIT='local', POLLS_VOTE_IP_BURST=1)
+    async def test_vote_ip_limit(self):
+        """Test that votes over the IP's rate are refused with 429."""
+        url = reverse('polls:vote', args=(self.question.id,))
+        await self.async_client.post(url, **form(choice=self.yes.pk))
+        response = await self.async_client.post(url,
+                                                **form(choice=self.yes.pk))
+        ratelimit.get_store().reset()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    @override_settings(POLLS_RATELIMIT='cache')
+    async def test_vote_cache_limit_off_loop(self):
+        """Test that the cache store is never called on the event loop."""
+        calls = []
+
+        def ip_wait(request, store):
+            try:
+                asyncio.get_running_loop()
+                calls.append('loop')
+            except RuntimeError:
+                calls.append('thread')
+            return 0.0
+        url = reverse('polls:vote', args=(self.question.id,))
+        with mock.patch.object(ratelimit, 'ip_wait', ip_wait):
+            await self.async_client.post(url, **form(choice=self.yes.pk))
+        self.assertEqual(calls, ['thread'])
+
+    async def test_results_conditional(self):
+        """Test that the results page sends an ETag and honours it."""
+        url = reverse('polls:results', args=(self.question.id,))
+        response = await self.async_client.get(url)
+        self.assertContains(response, "Yes")
+        self.assertIn('Last-Modified', response)
+        # AsyncClient takes extra headers by name, not as WSGI keys.
+        cached = await self.async_client.get(
+            url, **{'If-None-Match': response['ETag']})
+        self.assertEqual(cached.status_code, 304)
+
+    async def test_results_fragment_evicted(self):
+        """Test that a fragment evicted before rendering costs no query."""
+        url = reverse('polls:results', args=(self.question.id,))
+        await self.async_client.get(url)
+        render = async_views.render
+
+        def evict_then_render(*args, **kwargs):
+            cache.clear()
+            return render(*args, **kwargs)
+        with mock.patch.object(async_views, 'render', evict_then_render):
+            response = await self.async_client.get(url)
+        self.assertContains(response, "Yes")
+
+    async def test_results_method(self):
+        """Test that the results page only answers GET and HEAD."""
+        response = await self.async_client.post(
+            reverse('polls:results', args=(self.question.id,)))
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,138 @@
+"""Unittests for the queued, batched audit log."""
+import json
+import logging
+import os
+import queue
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from .. import audit, ratelimit
+from ..models import Question, Choice
+from .utils import create_question
+
+
+def make_record(name, **fields):
+    """Return an audit log record for event `name`."""
+    record = audit.audit_log.makeRecord('polls.audit', logging.INFO, '', 0,
+                                        name, (), None)
+    record.audit = fields
+    return record
+
+
+class BatchRecorder:
+    """A handler that remembers the batches it was given."""
+
+    def __init__(self):
+        self.batches = []
+        self.level = logging.NOTSET
+
+    def handle_batch(self, records):
+        self.batches.append([record.getMessage() for record in records])
+
+
+class AuditLogTests(TestCase):
+    """Unittests for the audit events of logins, logouts and votes."""
+
+    def setUp(self):
+        ratelimit.get_store().reset()
+        audit.stop()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'audit.ndjson')
+        settings = override_settings(POLLS_AUDIT_LOG=self.path)
+        settings.enable()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(settings.disable)
+        self.addCleanup(audit.stop)
+        self.user = User.objects.create_user(username="lisbono",
+                                             password="password")
+
+    def events(self):
+        """Stop the pipeline and return the events written."""
+        audit.stop()
+        with open(self.path) as lines:
+            return [json.loads(line) for line in lines]
+
+    def test_vote(self):
+        """Test that a vote is logged with the user, poll, choice and IP."""
+        question = create_question("Question.", days=-1, end_date=5)
+        choice = Choice.objects.create(question=question, choice_text="Yes")
+        self.client.force_login(self.user)
+        self.client.post(reverse('polls:vote', args=(question.id,)),
+                         {'choice': choice.pk})
+        [vote] = [entry for entry in self.events()
+                  if entry['event'] == 'vote']
+        self.assertEqual(vote['user'], "lisbono")
+        self.assertEqual(vote['question'], question.pk)
+        self.assertEqual(vote['choice'], choice.pk)
+        self.assertEqual(vote['ip'], '127.0.0.1')
+        self.assertTrue(vote['time'].endswith('+00:00'))
+
+    def test_login_and_logout(self):
+        """Test that logins, failed logins and logouts are logged."""
+        self.client.login(username="lisbono", password="wrong")
+        self.client.post(reverse('login'), {'username': "lisbono",
+                                            'password': "password"})
+        self.client.post(reverse('logout'))
+        self.assertEqual([(entry['event'], entry['user'])
+                          for entry in self.events()],
+                         [('login_failed', "lisbono"), ('login', "lisbono"),
+                          ('logout', "lisbono")])
+
+    @override_settings(POLLS_AUDIT_LOG='')
+    def test_disabled(self):
+        """Test that an empty POLLS_AUDIT_LOG writes nothing."""
+        audit.event('vote', user="lisbono")
+        audit.stop()
+        self.assertFalse(os.path.exists(self.path))
+
+
+class AuditPipelineTests(TestCase):
+    """Unittests for the queue handler, listener and file handler."""
+
+    def test_full_queue_drops(self):
+        """Test that records over the queue size are counted, not waited on."""
+        handler = audit.DroppingQueueHandler(queue.Queue(1))
+        handler.handle(make_record('vote'))
+        handler.handle(make_record('vote'))
+        self.assertEqual(handler.dropped, 1)
+
+    def test_listener_batches(self):
+        """Test that waiting records are written together, in order."""
+        records = queue.Queue()
+        for index in range(5):
+            records.put(make_record('event-%d' % index))
+        recorder = BatchRecorder()
+        listener = audit.BatchListener(records, recorder, batch_size=3)
+        listener.start()
+        listener.stop()
+        self.assertEqual(recorder.batches, [
+            ['event-0', 'event-1', 'event-2'], ['event-3', 'event-4']])
+
+    def test_sentinel_survives_full_queue(self):
+        """Test that stopping works when records refill the queue."""
+        records = queue.Queue(1)
+        recorder = BatchRecorder()
+        listener = audit.BatchListener(records, recorder, batch_size=3)
+        records.put(listener._sentinel)
+        listener.handle(make_record('vote'))
+        records.put(make_record('late'))
+        self.assertIs(listener.dequeue(True), listener._sentinel)
+        self.assertEqual(recorder.batches, [['vote']])
+
+    def test_rotation(self):
+        """Test that the file is rotated before it grows past the limit."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'audit.ndjson')
+        handler = audit.NdjsonFileHandler(path, maxBytes=200, backupCount=2,
+                                          delay=True)
+        for _ in range(3):
+            handler.handle_batch([make_record('vote', user="x" * 60)] * 2)
+        handler.close()
+        self.assertTrue(os.path.exists(path + '.1'))
+        with open(path) as lines:
+            entries = [json.loads(line) for line in lines]
+        self.assertEqual([entry['user'] for entry in entries], ["x" * 60] * 2)
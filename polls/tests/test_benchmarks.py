@@ -0,0 +1,43 @@
+"""Unittests for the benchmark data generator and helpers."""
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from ..benchmarks import compare, percentile
+from ..models import Question, Choice, Vote
+
+
+class SeedPollsTests(TestCase):
+    """Unittests for the seed_polls command."""
+
+    def test_seed(self):
+        """Test that seeding creates the asked sizes with valid counters."""
+        call_command('seed_polls', questions=3, choices=4, votes=20,
+                     stdout=StringIO())
+        self.assertEqual(Question.objects.count(), 3)
+        self.assertEqual(Choice.objects.count(), 12)
+        self.assertEqual(Vote.objects.count(), 20)
+        call_command('rebuild_vote_counts', verify=True, stdout=StringIO(),
+                     stderr=StringIO())
+
+
+class BenchmarkHelperTests(TestCase):
+    """Unittests for percentile and compare."""
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 0.5), 50)
+        self.assertEqual(percentile(samples, 0.99), 99)
+        self.assertEqual(percentile([7], 0.99), 7)
+
+    def test_compare(self):
+        """Test that slower p50 and extra queries are reported."""
+        size = {'questions': 1, 'choices': 1, 'votes': 1}
+        baseline = {'results': [{'size': size, 'endpoint': 'polls:index',
+                                 'p50_ms': 1.0, 'queries': 1}]}
+        current = {'results': [{'size': size, 'endpoint': 'polls:index',
+                                'p50_ms': 1.1, 'queries': 2}]}
+        self.assertEqual(len(compare(baseline, current, 0.25)), 1)
+        current['results'][0]['p50_ms'] = 2.0
+        self.assertEqual(len(compare(baseline, current, 0.25)), 2)
@@ -0,0 +1,78 @@
+"""Unittests for cached sessions and the cached-user backend."""
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .. import ratelimit
+from ..auth import check_session_cache, user_key
+from ..benchmarks import auth_settings
+from ..models import Question, Choice
+from .utils import create_question
+
+
+class CachedAuthTests(TestCase):
+    """Unittests for loading sessions and users without queries."""
+
+    def setUp(self):
+        ratelimit.get_store().reset()
+        cache.clear()
+        self.question = create_question("Question.", days=-1, end_date=5)
+        self.yes = Choice.objects.create(question=self.question,
+                                         choice_text="Yes")
+        self.user = User.objects.create_user(username="lisbono",
+                                             password="password")
+        self.url = reverse('polls:detail', args=(self.question.id,))
+
+    def detail_queries(self, session_store, cached_users):
+        """Return the queries of a warm detail page request."""
+        with override_settings(**auth_settings(session_store, cached_users)):
+            # A new client, since SessionMiddleware keeps its engine.
+            client = Client()
+            client.force_login(self.user)
+            client.get(self.url)
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(self.url)
+            self.assertContains(response, "Yes")
+        return len(queries)
+
+    def test_query_counts(self):
+        """Test that each cache takes one query off the detail page."""
+        # Session, user and question; the choices come from the cache.
+        self.assertEqual(self.detail_queries('db', False), 3)
+        self.assertEqual(self.detail_queries('db', True), 2)
+        self.assertEqual(self.detail_queries('cached_db', False), 2)
+        self.assertEqual(self.detail_queries('cached_db', True), 1)
+        self.assertEqual(self.detail_queries('signed_cookies', True), 1)
+
+    @override_settings(**auth_settings('cached_db', True))
+    def test_saving_user_drops_cache(self):
+        """Test that a deactivated user is logged out on the next request."""
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+        self.assertIsNotNone(cache.get(user_key(self.user.pk)))
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(cache.get(user_key(self.user.pk)))
+        response = self.client.get(self.url)
+        self.assertRedirects(response, '/accounts/login/?next=' + self.url,
+                             fetch_redirect_response=False)
+
+    @override_settings(**auth_settings('signed_cookies', True))
+    def test_vote_with_signed_cookies(self):
+        """Test that the vote map survives in a signed cookie session."""
+        self.client.force_login(self.user)
+        self.client.post(reverse('polls:vote', args=(self.question.id,)),
+                         {'choice': self.yes.pk})
+        self.assertContains(self.client.get(self.url),
+                            "Your lastest vote : Yes")
+
+    def test_session_cache_check(self):
+        """Test that cached sessions in a per-process cache are flagged."""
+        with override_settings(**auth_settings('cached_db', False)):
+            self.assertEqual([warning.id for warning in check_session_cache()],
+                             ['polls.W001'])
+        with override_settings(**auth_settings('db', False)):
+            self.assertEqual(check_session_cache(), [])
@@ -0,0 +1,150 @@
+"""Unittests for hot-poll tracking, cache warming and single-flight fills."""
+import datetime
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from .. import caching, hotpolls
+from ..lifecycle import advance
+from ..models import Question, Choice
+from .utils import create_question
+
+
+class HotTrackerTests(SimpleTestCase):
+    """Unittests for the count-min sketch and the top-K of hot polls."""
+
+    def test_sketch_never_undercounts(self):
+        """Test that estimates are at least the true counts."""
+        sketch = hotpolls.CountMinSketch(width=16, depth=3)
+        for item in range(100):
+            for _ in range(item % 7):
+                sketch.add(item)
+        for item in range(100):
+            self.assertGreaterEqual(sketch.estimate(item), item % 7)
+
+    def test_top_k(self):
+        """Test that the most hit questions are kept, most hit first."""
+        tracker = hotpolls.HotTracker(size=3, window=10**6)
+        for question_id, hits in [(1, 5), (2, 50), (3, 1), (4, 20), (5, 2)]:
+            for _ in range(hits):
+                tracker.hit(question_id)
+        self.assertEqual(tracker.hottest(), [2, 4, 1])
+
+    def test_hit_starts_warming(self):
+        """Test that hits start a background pass at most once per interval."""
+        tracker = hotpolls.HotTracker(size=3, window=10**6)
+        tracker.last_warm -= 31
+        with mock.patch('threading.Thread') as thread, \
+                self.settings(POLLS_WARM_INTERVAL=30):
+            tracker.hit(1)
+            tracker.hit(1)
+        thread.assert_called_once_with(
+            target=hotpolls.warm_in_background, daemon=True)
+        thread.return_value.start.assert_called_once_with()
+
+    def test_cooling_down(self):
+        """Test that halving lets a newly busy poll displace an old one."""
+        tracker = hotpolls.HotTracker(size=1, window=100)
+        for _ in range(99):
+            tracker.hit(1)
+        for _ in range(60):
+            tracker.hit(2)
+        self.assertEqual(tracker.hottest(), [2])
+
+
+class SingleFlightTests(SimpleTestCase):
+    """Unittests for coalescing concurrent cache fills."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_one_load(self):
+        """Test that threads missing the same key share a single load."""
+        loads = []
+
+        def load():
+            loads.append(1)
+            time.sleep(0.1)
+            return 'value'
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            caching.single_flight('polls:test', load, 60)))
+            for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(results, ['value'] * 8)
+
+    def test_other_process_filling(self):
+        """Test that a fill lock held elsewhere is waited on, then ignored."""
+        cache.add('polls:test:filling', 1, 60)
+        with self.settings(POLLS_FILL_WAIT=0.05):
+            self.assertEqual(
+                caching.single_flight('polls:test', lambda: 'value', 60),
+                'value')
+
+
+class WarmingTests(TestCase):
+    """Unittests for the hits counted by views and the warming pass."""
+
+    def setUp(self):
+        cache.clear()
+        hotpolls.tracker.reset()
+        self.addCleanup(hotpolls.tracker.reset)
+        self.question = create_question("Question.", days=-1, end_date=5)
+        Choice.objects.create(question=self.question, choice_text="Yes")
+        self.user = User.objects.create_user(username="lisbono",
+                                             password="password")
+        self.client.force_login(self.user)
+
+    def test_views_count_hits(self):
+        """Test that detail and results page views make a poll hot."""
+        other = create_question("Other.", days=-1, end_date=5)
+        self.client.get(reverse('polls:detail', args=(other.id,)))
+        for view in ('polls:detail', 'polls:results'):
+            self.client.get(reverse(view, args=(self.question.id,)))
+        self.assertEqual(hotpolls.tracker.hottest(),
+                         [self.question.pk, other.pk])
+
+    def page_queries(self, view):
+        """Return the queries of a request for one of the question's pages."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(view,
+                                               args=(self.question.id,)))
+        self.assertContains(response, "Yes")
+        return len(queries)
+
+    def test_warm_pass(self):
+        """Test that a warmed hot poll's pages skip the choice queries."""
+        cold = self.page_queries('polls:results')
+        cache.clear()
+        hotpolls.tracker.hit(self.question.pk)
+        self.assertEqual(hotpolls.warm_pass(), 1)
+        self.assertEqual(self.page_queries('polls:results'), cold - 1)
+        self.assertEqual(self.page_queries('polls:detail'), 3)
+
+    def test_warm_upcoming(self):
+        """Test that polls opening soon are warmed before they open."""
+        upcoming = create_question("Upcoming.", days=0, end_date=5)
+        Question.objects.filter(pk=upcoming.pk).update(
+            status=Question.SCHEDULED,
+            pub_date=timezone.now() + datetime.timedelta(seconds=30))
+        upcoming.refresh_from_db()
+        Choice.objects.create(question=upcoming, choice_text="Soon")
+        upcoming.refresh_from_db()
+        self.assertEqual(hotpolls.warm_pass(), 1)
+        advance(upcoming.pub_date)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                [choice.choice_text
+                 for choice in caching.question_choices(upcoming)],
+                ["Soon"])
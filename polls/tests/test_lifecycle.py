@@ -0,0 +1,103 @@
+"""Unittests for the stored poll status and the scheduler."""
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from .. import lifecycle
+from ..models import Question, Choice, ResultSnapshot
+from .utils import create_question
+
+
+class LifecycleTests(TestCase):
+    """Unittests for moving polls between scheduled, open and closed."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_status_set_on_save(self):
+        """Test that saving a question sets the status from its dates."""
+        self.assertEqual(create_question("Future.", 1, 5).status,
+                         Question.SCHEDULED)
+        self.assertEqual(create_question("Open.", -1, 5).status,
+                         Question.OPEN)
+        self.assertEqual(create_question("Past.", -5, 1).status,
+                         Question.CLOSED)
+        endless = Question.objects.create(question_text="Endless.",
+                                          pub_date=timezone.now())
+        self.assertEqual(endless.status, Question.OPEN)
+
+    def test_advance_flips_due_polls(self):
+        """Test that advance opens and closes polls and fires the hooks."""
+        soon = create_question("Soon.", 1, 5)
+        ending = create_question("Ending.", -1, 2)
+        received = []
+
+        def receiver(sender, questions, **kwargs):
+            received.extend((q.question_text, q.status) for q in questions)
+        lifecycle.poll_opened.connect(receiver)
+        lifecycle.poll_closed.connect(receiver)
+        self.addCleanup(lifecycle.poll_opened.disconnect, receiver)
+        self.addCleanup(lifecycle.poll_closed.disconnect, receiver)
+        later = timezone.now() + datetime.timedelta(days=1, hours=12)
+        opened, closed = lifecycle.advance(later)
+        self.assertEqual([q.pk for q in opened], [soon.pk])
+        self.assertEqual([q.pk for q in closed], [ending.pk])
+        self.assertEqual(received, [("Soon.", Question.OPEN),
+                                    ("Ending.", Question.CLOSED)])
+        self.assertEqual(lifecycle.advance(later), ([], []))
+
+    def test_opening_refreshes_index(self):
+        """Test that an opened poll appears on a cached index."""
+        question = create_question("Soon.", 1, 5)
+        self.client.get(reverse('polls:index'))
+        Question.objects.filter(pk=question.pk).update(
+            pub_date=timezone.now() - datetime.timedelta(minutes=1))
+        lifecycle.advance()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, "Soon.")
+        self.assertContains(response, 'vote</button>')
+
+    def test_index_without_scheduler(self):
+        """Test that the index follows the dates if advance never runs."""
+        soon = create_question("Soon.", 1, 5)
+        ending = create_question("Ending.", -1, 2)
+        later = timezone.now() + datetime.timedelta(days=3)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            # The cached page expires at the first of these boundaries.
+            cache.clear()
+            response = self.client.get(reverse('polls:index'))
+        self.assertEqual(Question.objects.get(pk=soon.pk).status,
+                         Question.SCHEDULED)
+        self.assertEqual(
+            [(q.question_text, q.open_now)
+             for q in response.context['latest_question_list']],
+            [("Soon.", True), ("Ending.", False)])
+        self.assertContains(response, 'vote</button>', count=1)
+        self.assertEqual(Question.objects.get(pk=ending.pk).status,
+                         Question.OPEN)
+
+    def test_freeze_due(self):
+        """Test that closed polls are snapshotted after the grace period."""
+        question = create_question("Past.", -5, 1)
+        Choice.objects.create(question=question, choice_text="Yes")
+        self.assertEqual(lifecycle.freeze_due(), 1)
+        self.assertTrue(ResultSnapshot.objects.filter(
+            question=question).exists())
+        self.assertEqual(lifecycle.freeze_due(), 0)
+
+    def test_scheduler_command(self):
+        """Test one pass of run_poll_scheduler."""
+        question = create_question("Soon.", 1, 5)
+        Question.objects.filter(pk=question.pk).update(
+            pub_date=timezone.now() - datetime.timedelta(minutes=1))
+        out = StringIO()
+        call_command('run_poll_scheduler', stdout=out)
+        self.assertIn("Opened 1, closed 0", out.getvalue())
+        self.assertEqual(Question.objects.get(pk=question.pk).status,
+                         Question.OPEN)
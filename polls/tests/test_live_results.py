@@ -0,0 +1,123 @@
+"""Unittests for live results streaming."""
+import asyncio
+import json
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from ..live import (Broadcaster, LiveResultsRouter, broadcaster,
+                    read_tallies)
+from ..models import Question, Choice, Vote
+from .utils import create_question
+
+
+class LiveResultsTests(TestCase):
+    """Unittests for the tally broadcaster and the event stream."""
+
+    def setUp(self):
+        self.question = create_question("Question.", days=-1)
+        self.first = Choice.objects.create(question=self.question,
+                                           choice_text="First")
+        self.second = Choice.objects.create(question=self.question,
+                                            choice_text="Second")
+
+    def test_read_tallies_adds_shards(self):
+        """Test that tallies include votes held in shards."""
+        self.question.counter_shards = 3
+        self.question.save()
+        user = User.objects.create_user(username="lisbono")
+        Vote.objects.record_vote(user, self.question, self.second)
+        self.assertEqual(read_tallies([self.question.pk]),
+                         {self.question.pk: {self.first.pk: 0,
+                                             self.second.pk: 1}})
+
+    def test_publish_merges_deltas(self):
+        """Test that a slow subscriber gets only the latest changed counts."""
+        async def run():
+            broadcaster = Broadcaster(interval=3600)
+            subscriber = broadcaster.subscribe(1)
+            broadcaster.publish({1: {10: 0, 11: 0}})
+            broadcaster.publish({1: {10: 1, 11: 0}})
+            broadcaster.publish({1: {10: 2, 11: 0}})
+            pending = subscriber.take()
+            broadcaster.unsubscribe(1, subscriber)
+            broadcaster.task.cancel()
+            return pending
+        self.assertEqual(async_to_sync(run)(), {10: 2})
+
+    def test_wsgi_fallback(self):
+        """Test that the plain view answers with a single snapshot."""
+        response = self.client.get(reverse('polls:stream',
+                                           args=(self.question.id,)))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertContains(response, 'event: snapshot')
+
+    def call_router(self, path, bodies=1, after_snapshot=None):
+        """Run the ASGI router for `path` until `bodies` bodies are sent.
+
+        Like a real server, ``receive`` yields the (empty) request first
+        and only reports the disconnect once the client is done.
+        """
+        messages = []
+
+        async def run():
+            left = asyncio.Event()
+            received = []
+
+            async def receive():
+                if not received:
+                    received.append(1)
+                    return {'type': 'http.request', 'body': b'',
+                            'more_body': False}
+                await left.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                messages.append(message)
+                if message['type'] == 'http.response.body':
+                    sent = sum(m['type'] == 'http.response.body'
+                               for m in messages)
+                    if sent == 1 and after_snapshot:
+                        after_snapshot()
+                    if sent >= bodies:
+                        left.set()
+
+            async def django(scope, receive, send):
+                messages.append({'type': 'django'})
+
+            scope = {'type': 'http', 'method': 'GET', 'path': path}
+            await LiveResultsRouter(django)(scope, receive, send)
+        async_to_sync(run)()
+        return messages
+
+    def test_stream_snapshot(self):
+        """Test that the stream opens with the current tallies."""
+        messages = self.call_router('/polls/%d/stream/' % self.question.id)
+        self.assertEqual(messages[0]['status'], 200)
+        event = messages[1]['body'].decode()
+        self.assertTrue(event.startswith('event: snapshot'))
+        data = json.loads(event.split('data: ')[1])
+        self.assertEqual(data, {str(self.first.pk): 0,
+                                str(self.second.pk): 0})
+
+    def test_stream_delta(self):
+        """Test that changes after the snapshot reach the open stream."""
+        counts = {self.first.pk: 1, self.second.pk: 0}
+        messages = self.call_router(
+            '/polls/%d/stream/' % self.question.id, bodies=2,
+            after_snapshot=lambda: broadcaster.publish(
+                {self.question.pk: counts}))
+        event = messages[2]['body'].decode()
+        self.assertTrue(event.startswith('event: delta'))
+        self.assertEqual(json.loads(event.split('data: ')[1]),
+                         {str(self.first.pk): 1})
+
+    def test_stream_missing_question(self):
+        """Test that an unknown question gets a 404."""
+        messages = self.call_router('/polls/999/stream/')
+        self.assertEqual(messages[0]['status'], 404)
+
+    def test_other_paths_go_to_django(self):
+        """Test that the router leaves other URLs to Django."""
+        self.assertEqual(self.call_router('/polls/'), [{'type': 'django'}])
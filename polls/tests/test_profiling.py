@@ -0,0 +1,64 @@
+"""Unittests for the profiling middleware and report."""
+import datetime
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from ..models import Question, Choice
+from ..profiling import RequestProfile, ViewStats, registry
+
+MIDDLEWARE = ['polls.middleware.ProfilingMiddleware',
+              'django.contrib.sessions.middleware.SessionMiddleware',
+              'django.contrib.auth.middleware.AuthenticationMiddleware',
+              'django.contrib.messages.middleware.MessageMiddleware']
+
+
+@override_settings(POLLS_PROFILING=True, MIDDLEWARE=MIDDLEWARE)
+class ProfilingTests(TestCase):
+    """Unittests for ProfilingMiddleware."""
+
+    def setUp(self):
+        registry.reset()
+        now = timezone.now()
+        self.question = Question.objects.create(
+            question_text="Question.", pub_date=now - datetime.timedelta(1),
+            end_date=now + datetime.timedelta(1))
+        Choice.objects.create(question=self.question, choice_text="Yes")
+
+    def test_records_per_view(self):
+        """Test that requests are grouped by URL name with their queries."""
+        url = reverse('polls:results', args=(self.question.id,))
+        self.client.get(url)
+        self.client.get(url)
+        report = registry.report()['polls:results']
+        self.assertEqual(report['requests'], 2)
+        self.assertEqual(report['queries']['max'], 2)
+        self.assertGreater(report['template_ms']['max'], 0)
+        self.assertEqual(report['wall_ms']['count'], 2)
+
+    def test_report_for_staff(self):
+        """Test that staff can read the report and a log line is written."""
+        staff = User.objects.create_user(username="admin", password="pw",
+                                         is_staff=True)
+        self.client.force_login(staff)
+        self.client.get(reverse('polls:index'))
+        with self.settings(POLLS_PROFILING_LOG_INTERVAL=0), \
+                self.assertLogs('polls.profiling', 'INFO'):
+            response = self.client.get(reverse('polls:profiling'))
+        self.assertIn('polls:index', response.json())
+
+    def test_duplicate_sql(self):
+        """Test that a statement repeated in one request is reported."""
+        profile = RequestProfile()
+        profile.statements.update(['SELECT a', 'SELECT a', 'SELECT a',
+                                   'SELECT b'])
+        stats = ViewStats(10)
+        stats.add(profile, 0.001)
+        self.assertEqual(stats.report()['duplicate_sql'],
+                         [{'sql': 'SELECT a', 'repeats': 2}])
+
+    def test_report_is_staff_only(self):
+        """Test that anonymous users cannot read the report."""
+        response = self.client.get(reverse('polls:profiling'))
+        self.assertEqual(response.status_code, 302)
@@ -1,6 +1,7 @@
 """Unittests for polls."""
 import datetime
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from ..models import Question
 from django.urls import reverse
@@ -23,6 +24,9 @@ def create_question(question_text, days, end_date):
 class QuestionIndexViewTests(TestCase):
     """Unittests for index page (related to Question object)."""
 
+    def setUp(self):
+        cache.clear()
+
     def test_no_questions(self):
         """Test that there is no Question when not created any."""
         response = self.client.get(reverse('polls:index'))
@@ -68,3 +72,39 @@ class QuestionIndexViewTests(TestCase):
             response.context['latest_question_list'],
             ['<Question: Past question 2.>', '<Question: Past question 1.>']
         )
+
+    def test_new_question_invalidates_cache(self):
+        """Test that saving a question shows up on a cached index."""
+        create_question(question_text="Past question 1.", days=-30,
+                        end_date=-25)
+        self.client.get(reverse('polls:index'))
+        create_question(question_text="Past question 2.", days=-5,
+                        end_date=-3)
+        response = self.client.get(reverse('polls:index'))
+        self.assertEqual(len(response.context['latest_question_list']), 2)
+
+    def test_cached_index_skips_database(self):
+        """Test that a repeated index hit runs no queries."""
+        create_question(question_text="Past question.", days=-5, end_date=10)
+        self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, 'vote</button>')
+
+    @override_settings(POLLS_INDEX_PAGE_SIZE=2)
+    def test_keyset_pagination(self):
+        """Test that pages follow each other without gaps or repeats."""
+        for i in range(5):
+            create_question(question_text="Question %d." % i, days=-i - 1,
+                            end_date=30)
+        seen = []
+        response = self.client.get(reverse('polls:index'))
+        while True:
+            seen += [q.question_text
+                     for q in response.context['latest_question_list']]
+            cursor = response.context['next_cursor']
+            if cursor is None:
+                break
+            response = self.client.get(reverse('polls:index'),
+                                       {'before': cursor})
+        self.assertEqual(seen, ["Question %d." % i for i in range(5)])
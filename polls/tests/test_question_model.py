@@ -54,3 +54,11 @@ class QuestionModelTests(TestCase):
         end = timezone.now() + datetime.timedelta(days=5)
         unpublished = Question(pub_date=pub, end_date=end)
         self.assertIs(unpublished.is_published(), False)
+
+    def test_no_end_date(self):
+        """Test that a poll without an end date stays open."""
+        pub = timezone.now() + datetime.timedelta(days=-1)
+        endless = Question(pub_date=pub)
+        self.assertIs(endless.is_published(), True)
+        self.assertIs(endless.can_vote(), True)
+        self.assertEqual(endless.status_at(), Question.OPEN)
@@ -0,0 +1,50 @@
+"""Unittests for polls."""
+from django.contrib.auth.models import User
+from django.test import TestCase
+from ..models import Question, Choice, Vote
+from .utils import create_question
+from django.urls import reverse
+
+
+class QuestionResultsViewTests(TestCase):
+    """Unittests for results page (related to Question object)."""
+
+    def add_choices(self, question, count):
+        """Give `question` `count` choices."""
+        for i in range(count):
+            Choice.objects.create(question=question, choice_text="C%d" % i)
+
+    def test_percentages(self):
+        """Test that counts, percentages and total are shown."""
+        question = create_question("Question.", days=-1, end_date=5)
+        self.add_choices(question, 2)
+        first, second = question.choice_set.order_by('pk')
+        for i, choice in enumerate([first, first, first, second]):
+            user = User.objects.create_user(username="user%d" % i)
+            Vote.objects.record_vote(user, question, choice)
+        response = self.client.get(reverse('polls:results',
+                                           args=(question.id,)))
+        self.assertEqual(response.context['total_votes'], 4)
+        self.assertEqual([c.percent for c in response.context['choices']],
+                         [75.0, 25.0])
+        self.assertContains(response, '75.0%')
+
+    def test_no_votes(self):
+        """Test that a poll without votes shows zero percent."""
+        question = create_question("Question.", days=-1, end_date=5)
+        self.add_choices(question, 2)
+        response = self.client.get(reverse('polls:results',
+                                           args=(question.id,)))
+        self.assertEqual([c.percent for c in response.context['choices']],
+                         [0.0, 0.0])
+
+    def test_query_count_independent_of_choices(self):
+        """Test that the page runs the same queries for 1 or 20 choices."""
+        small = create_question("Small.", days=-1, end_date=5)
+        self.add_choices(small, 1)
+        large = create_question("Large.", days=-1, end_date=5)
+        self.add_choices(large, 20)
+        for question in (small, large):
+            with self.assertNumQueries(2):
+                self.client.get(reverse('polls:results',
+                                        args=(question.id,)))
@@ -0,0 +1,105 @@
+"""Unittests for the vote rate limiter."""
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from .. import ratelimit
+from ..benchmarks import limiter_overhead
+from ..models import Question, Choice, Vote
+from .utils import create_question
+
+
+class TokenBucketTests(TestCase):
+    """Unittests for the bucket stores."""
+
+    def test_local_store(self):
+        """Test that a bucket allows its burst, then refills at its rate."""
+        store = ratelimit.LocalStore()
+        self.assertEqual([store.take('a', 1.0, 3, now=0) for _ in range(3)],
+                         [0, 0, 0])
+        self.assertAlmostEqual(store.take('a', 1.0, 3, now=0), 1.0)
+        self.assertEqual(store.take('b', 1.0, 3, now=0), 0)
+        self.assertAlmostEqual(store.take('a', 1.0, 3, now=0.5), 0.5)
+        self.assertEqual(store.take('a', 1.0, 3, now=1.0), 0)
+
+    def test_local_store_prunes_full_buckets(self):
+        """Test that idle clients are forgotten once there are too many."""
+        store = ratelimit.LocalStore(max_keys=2)
+        store.take('a', 1.0, 3, now=0)
+        store.take('b', 1.0, 3, now=0)
+        store.take('c', 1.0, 3, now=10)
+        self.assertEqual(set(store.buckets), {'c'})
+
+    def test_cache_store(self):
+        """Test that the cache store counts per window of burst / rate."""
+        cache.clear()
+        store = ratelimit.CacheStore()
+        self.assertEqual([store.take('a', 1.0, 2, now=100) for _ in range(2)],
+                         [0, 0])
+        self.assertAlmostEqual(store.take('a', 1.0, 2, now=100.5), 1.5)
+        self.assertEqual(store.take('a', 1.0, 2, now=102), 0)
+
+    def test_cache_store_reset(self):
+        """Test that resetting the cache store leaves other entries alone."""
+        store = ratelimit.CacheStore()
+        cache.set('polls:other', 'kept')
+        store.take('a', 1.0, 1, now=100)
+        self.assertTrue(store.take('a', 1.0, 1, now=100))
+        store.reset()
+        self.assertEqual(store.take('a', 1.0, 1, now=100), 0)
+        self.assertEqual(cache.get('polls:other'), 'kept')
+
+    def test_client_ip(self):
+        """Test that X-Forwarded-For is only used when trusted."""
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1',
+                                       HTTP_X_FORWARDED_FOR='1.2.3.4, 5.6.7.8')
+        self.assertEqual(ratelimit.get_client_ip(request), '10.0.0.1')
+        with override_settings(POLLS_TRUST_X_FORWARDED_FOR=True):
+            self.assertEqual(ratelimit.get_client_ip(request), '1.2.3.4')
+
+    @override_settings(POLLS_RATELIMIT='local')
+    def test_overhead_benchmark(self):
+        """Test that the overhead benchmark reports microsecond figures."""
+        ratelimit.get_store().reset()
+        result = limiter_overhead(50, threads=2, keys=10)
+        self.assertEqual(result['requests'], 100)
+        self.assertLess(result['p50_us'], 1000)
+
+
+@override_settings(POLLS_RATELIMIT='local', POLLS_VOTE_BURST=2,
+                   POLLS_VOTE_IP_BURST=3)
+class VoteRateLimitTests(TestCase):
+    """Unittests for throttling the vote view."""
+
+    def setUp(self):
+        ratelimit.get_store().reset()
+        self.question = create_question("Question.", days=-1, end_date=5)
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="Yes")
+        self.url = reverse('polls:vote', args=(self.question.id,))
+
+    def test_user_limit(self):
+        """Test that a user's votes past the burst get 429 Retry-After."""
+        self.client.force_login(User.objects.create_user(username="user"))
+        statuses = [self.client.post(self.url, {'choice': self.choice.pk})
+                    .status_code for _ in range(3)]
+        self.assertEqual(statuses, [302, 302, 429])
+        response = self.client.post(self.url, {'choice': self.choice.pk})
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(Vote.objects.count(), 1)
+
+    def test_ip_limit_refuses_before_database(self):
+        """Test that an IP over its limit is refused without any query."""
+        for _ in range(3):
+            self.client.post(self.url, {'choice': self.choice.pk})
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url, {'choice': self.choice.pk})
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(POLLS_RATELIMIT='off')
+    def test_off(self):
+        """Test that limiting can be switched off."""
+        for _ in range(5):
+            response = self.client.post(self.url, {'choice': self.choice.pk})
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,101 @@
+"""Unittests for frozen results of closed polls."""
+import datetime
+import gzip
+import json
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from .. import ratelimit
+from ..models import Question, Choice, ResultSnapshot, Vote
+from .utils import create_question
+
+
+class ResultSnapshotTests(TestCase):
+    """Unittests for ResultSnapshot and the commands that use it."""
+
+    def setUp(self):
+        ratelimit.get_store().reset()
+        self.question = create_question("Question.", days=-10, end_date=5)
+        self.yes = Choice.objects.create(question=self.question,
+                                         choice_text="Yes")
+        self.no = Choice.objects.create(question=self.question,
+                                        choice_text="No")
+        for i, choice in enumerate([self.yes, self.yes, self.no]):
+            user = User.objects.create_user(username="user%d" % i)
+            Vote.objects.record_vote(user, self.question, choice)
+        self.question.end_date = timezone.now() - datetime.timedelta(days=1)
+        self.question.save()
+        self.question.refresh_from_db()
+
+    def test_closed_poll_served_from_snapshot(self):
+        """Test that a closed poll's results stop reading the counters."""
+        self.assertEqual([c.votes for c in self.question.results()], [2, 1])
+        self.assertTrue(ResultSnapshot.objects.filter(
+            question=self.question).exists())
+        Choice.objects.filter(pk=self.yes.pk).update(votes=100)
+        question = Question.objects.get(pk=self.question.pk)
+        response = self.client.get(reverse('polls:results',
+                                           args=(question.id,)))
+        self.assertEqual([c.votes for c in response.context['choices']],
+                         [2, 1])
+        self.assertEqual(response.context['total_votes'], 3)
+
+    def test_open_poll_not_snapshotted(self):
+        """Test that open polls are still counted live."""
+        question = create_question("Open.", days=-1, end_date=5)
+        question.results()
+        self.assertFalse(ResultSnapshot.objects.filter(
+            question=question).exists())
+
+    def test_vote_on_closed_poll_refused(self):
+        """Test that a closed poll does not accept ballots."""
+        User.objects.create_user(username="late", password="88998899")
+        self.client.login(username="late", password="88998899")
+        self.client.post(reverse('polls:vote', args=(self.question.id,)),
+                         {'choice': self.no.id})
+        self.assertEqual(Vote.objects.count(), 3)
+
+    def test_snapshot_command(self):
+        """Test that the command snapshots closed polls only once."""
+        out = StringIO()
+        call_command('snapshot_results', stdout=out)
+        call_command('snapshot_results', stdout=out)
+        self.assertEqual(ResultSnapshot.objects.count(), 1)
+        self.assertIn("Snapshotted 0", out.getvalue())
+
+    def test_archive_votes(self):
+        """Test that archived votes leave the table but not the results."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        call_command('archive_votes', days=0, output=directory,
+                     stdout=StringIO())
+        self.assertFalse(Vote.objects.exists())
+        path = Path(directory) / ('question-%d-votes.ndjson.gz'
+                                  % self.question.pk)
+        with gzip.open(path, 'rt') as archive:
+            rows = [json.loads(line) for line in archive]
+        self.assertEqual(sorted(row['choice'] for row in rows),
+                         sorted([self.yes.pk, self.yes.pk, self.no.pk]))
+        call_command('rebuild_vote_counts', stdout=StringIO(),
+                     stderr=StringIO())
+        question = Question.objects.get(pk=self.question.pk)
+        self.assertEqual(question.total_votes(), 3)
+        self.assertEqual([c.votes for c in question.results()], [2, 1])
+
+    def test_archive_waits_for_grace(self):
+        """Test that a poll closed inside the grace period keeps its votes."""
+        Question.objects.filter(pk=self.question.pk).update(
+            end_date=timezone.now() - datetime.timedelta(seconds=10))
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        call_command('archive_votes', days=0, output=directory,
+                     stdout=StringIO())
+        self.assertEqual(Vote.objects.count(), 3)
+        self.assertFalse(ResultSnapshot.objects.exists())
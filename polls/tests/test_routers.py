@@ -0,0 +1,121 @@
+"""Unittests for the primary/replica database router."""
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections
+from django.test import (RequestFactory, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from .. import ratelimit
+from ..middleware import PrimaryPinMiddleware
+from ..models import Question, Choice, ResultSnapshot, Vote
+from ..routers import (PIN_COOKIE, PrimaryReplicaRouter, pinned,
+                       use_primary)
+
+
+@override_settings(POLLS_READ_REPLICAS=['replica1', 'replica2'])
+class RouterTests(TestCase):
+    """Unittests for PrimaryReplicaRouter and the primary pin."""
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    def test_reads_go_to_replicas(self):
+        """Test that polls reads are spread over the replicas."""
+        for model in (Question, Choice, Vote):
+            self.assertIn(self.router.db_for_read(model),
+                          ['replica1', 'replica2'])
+
+    def test_writes_go_to_primary(self):
+        """Test that polls writes always use the primary."""
+        self.assertEqual(self.router.db_for_write(Vote), 'default')
+
+    def test_other_apps_untouched(self):
+        """Test that models outside polls use Django's default routing."""
+        self.assertIsNone(self.router.db_for_read(User))
+
+    def test_pinned_reads_go_to_primary(self):
+        """Test that use_primary() overrides the replicas."""
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(Question), 'default')
+        self.assertNotEqual(self.router.db_for_read(Question), 'default')
+
+    def test_cookie_pins_request(self):
+        """Test that the middleware pins requests carrying the cookie."""
+        middleware = PrimaryPinMiddleware(lambda request: pinned.get())
+        request = RequestFactory().get('/')
+        self.assertFalse(middleware(request))
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertTrue(middleware(request))
+
+
+class PinCookieTests(TestCase):
+    """Unittests for pinning voters to the primary."""
+
+    def test_vote_sets_pin_cookie(self):
+        """Test that voting pins the voter's next requests."""
+        ratelimit.get_store().reset()
+        now = timezone.now()
+        question = Question.objects.create(
+            question_text="Question.", pub_date=now - datetime.timedelta(1),
+            end_date=now + datetime.timedelta(1))
+        choice = Choice.objects.create(question=question, choice_text="Yes")
+        User.objects.create_user(username="lisbono", password="88998899")
+        self.client.login(username="lisbono", password="88998899")
+        response = self.client.post(reverse('polls:vote',
+                                            args=(question.id,)),
+                                    {'choice': choice.id})
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+
+# The alias DB_REPLICA_FILES adds, registered before the test runner sets
+# up its databases so that it is mirrored onto the test database.
+connections.databases.setdefault('replica1', dict(
+    connections.databases['default'], TEST={'MIRROR': 'default'}))
+
+
+@override_settings(POLLS_READ_REPLICAS=['replica1'])
+class ReplicaReadTests(TransactionTestCase):
+    """Unittests reading through a replica of the test database.
+
+    The rows are committed, so the replica's own connection sees them.
+    """
+
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        ratelimit.get_store().reset()
+        cache.clear()
+        now = timezone.now()
+        self.question = Question.objects.create(
+            question_text="Question.", pub_date=now - datetime.timedelta(1),
+            end_date=now + datetime.timedelta(1))
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="Yes")
+        User.objects.create_user(username="lisbono", password="88998899")
+        self.client.login(username="lisbono", password="88998899")
+
+    def test_voter_reads_primary(self):
+        """Test that the voter's results page skips the replica."""
+        replica = connections['replica1']
+        with CaptureQueriesContext(replica) as queries:
+            self.client.post(reverse('polls:vote',
+                                     args=(self.question.id,)),
+                             {'choice': self.choice.id})
+        self.assertTrue(queries, "the vote should read from the replica")
+        with CaptureQueriesContext(replica) as queries:
+            response = self.client.get(reverse('polls:results',
+                                               args=(self.question.id,)))
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response.context['total_votes'], 1)
+
+    def test_snapshot_counts_primary(self):
+        """Test that frozen results are never counted on a replica."""
+        Question.objects.filter(pk=self.question.pk).update(
+            end_date=timezone.now() - datetime.timedelta(1))
+        with CaptureQueriesContext(connections['replica1']) as queries:
+            ResultSnapshot.take(self.question)
+        self.assertEqual(len(queries), 0)
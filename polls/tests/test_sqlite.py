@@ -0,0 +1,30 @@
+"""Unittests for the SQLite connection tuning."""
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from ..sqlite import apply_pragmas
+
+
+@skipUnless(connection.vendor == 'sqlite', "SQLite only")
+class SqlitePragmaTests(TestCase):
+    """Unittests for apply_pragmas."""
+
+    def cache_size(self):
+        """Return the connection's current cache_size PRAGMA."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            return cursor.fetchone()[0]
+
+    @override_settings(POLLS_SQLITE_PRAGMAS={'cache_size': -1234})
+    def test_pragmas_applied(self):
+        """Test that the configured PRAGMAs run on the connection."""
+        apply_pragmas(sender=None, connection=connection)
+        self.assertEqual(self.cache_size(), -1234)
+
+    @override_settings(POLLS_SQLITE_PRAGMAS={})
+    def test_no_pragmas(self):
+        """Test that nothing runs without a tuned profile."""
+        before = self.cache_size()
+        apply_pragmas(sender=None, connection=connection)
+        self.assertEqual(self.cache_size(), before)
@@ -0,0 +1,65 @@
+"""Unittests for cached template fragments and the cached loader."""
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.template import engines
+from django.template.loaders import cached
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from ..benchmarks import polls_endpoints, render_times
+from ..models import Question, Choice, Vote
+from .utils import create_question
+
+
+class FragmentCacheTests(TestCase):
+    """Unittests for the per-question fragments of the polls pages."""
+
+    def setUp(self):
+        cache.clear()
+        self.question = create_question("Question.", days=-1, end_date=5)
+        self.yes = Choice.objects.create(question=self.question,
+                                         choice_text="Yes")
+        self.user = User.objects.create_user(username="lisbono")
+
+    def test_results_table_cached_until_vote(self):
+        """Test that a cached results table skips counting, and votes clear it."""
+        url = reverse('polls:results', args=(self.question.id,))
+        self.assertContains(self.client.get(url), '<td id="votes-%d">0</td>'
+                            % self.yes.pk)
+        # Only the question lookup for the version is left.
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        Vote.objects.record_vote(self.user, self.question, self.yes)
+        self.assertContains(self.client.get(url), '<td id="votes-%d">1</td>'
+                            % self.yes.pk)
+
+    def test_choice_list_follows_edits(self):
+        """Test that editing a choice replaces the cached choice list."""
+        self.client.force_login(self.user)
+        url = reverse('polls:detail', args=(self.question.id,))
+        self.assertContains(self.client.get(url), "Yes")
+        self.yes.choice_text = "Sure"
+        self.yes.save()
+        response = self.client.get(url)
+        self.assertContains(response, "Sure")
+        self.assertNotContains(response, "Yes")
+
+    def test_index_list_follows_new_polls(self):
+        """Test that a new poll appears despite the cached index list."""
+        url = reverse('polls:index')
+        self.client.get(url)
+        create_question("Newer.", days=0, end_date=5)
+        self.assertContains(self.client.get(url), "Newer.")
+
+    def test_cached_loader(self):
+        """Test that templates are compiled once when not debugging."""
+        with override_settings(DEBUG=False):
+            loader = engines['django'].engine.template_loaders[0]
+        self.assertIsInstance(loader, cached.Loader)
+
+    def test_render_times(self):
+        """Test that the render benchmark reports request and template time."""
+        endpoint = polls_endpoints(self.question, self.yes)[3]
+        result = render_times(endpoint, 3, warm=False)
+        self.assertEqual(result['endpoint'], 'polls:results')
+        self.assertGreater(result['template_ms'], 0)
@@ -0,0 +1,149 @@
+"""Unittests for the stored vote counters."""
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from django.urls import reverse
+from .. import ratelimit
+from ..models import Question, Choice, ChoiceShard, Vote
+from .utils import create_question
+
+
+class VoteCounterTests(TestCase):
+    """Unittests for Choice.votes and Question.vote_total."""
+
+    def setUp(self):
+        ratelimit.get_store().reset()
+        self.question = create_question("Question.", days=-1)
+        self.first = Choice.objects.create(question=self.question,
+                                           choice_text="First")
+        self.second = Choice.objects.create(question=self.question,
+                                            choice_text="Second")
+        self.user = User.objects.create_user(username="lisbono",
+                                             password="88998899")
+        self.client.login(username="lisbono", password="88998899")
+
+    def vote(self, choice):
+        """Post a vote for `choice`."""
+        url = reverse('polls:vote', args=(self.question.id,))
+        return self.client.post(url, {'choice': choice.id})
+
+    def assertCounts(self, first, second, total):
+        """Check the stored counters after reloading them."""
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.question.refresh_from_db()
+        self.assertEqual(self.first.votes, first)
+        self.assertEqual(self.second.votes, second)
+        self.assertEqual(self.question.vote_total, total)
+
+    def test_first_vote(self):
+        """Test that a new vote increments its choice and the total."""
+        self.vote(self.first)
+        self.assertCounts(1, 0, 1)
+
+    def test_same_vote_twice(self):
+        """Test that voting the same choice again changes nothing."""
+        self.vote(self.first)
+        self.vote(self.first)
+        self.assertCounts(1, 0, 1)
+
+    def test_change_vote(self):
+        """Test that changing a vote moves the count to the new choice."""
+        self.vote(self.first)
+        self.vote(self.second)
+        self.assertCounts(0, 1, 1)
+        self.assertEqual(Vote.objects.count(), 1)
+
+    def test_rebuild_counters(self):
+        """Test that the command repairs counters that drifted."""
+        self.vote(self.first)
+        Choice.objects.filter(pk=self.first.pk).update(votes=5)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_vote_counts', verify=True,
+                         stdout=StringIO(), stderr=StringIO())
+        call_command('rebuild_vote_counts', stdout=StringIO(),
+                     stderr=StringIO())
+        self.assertCounts(1, 0, 1)
+        call_command('rebuild_vote_counts', verify=True, stdout=StringIO(),
+                     stderr=StringIO())
+
+
+class ShardedCounterTests(TestCase):
+    """Unittests for questions that count votes in ChoiceShard rows."""
+
+    def setUp(self):
+        cache.clear()
+        self.question = create_question("Question.", days=-1)
+        self.question.counter_shards = 4
+        self.question.save()
+        self.first = Choice.objects.create(question=self.question,
+                                           choice_text="First")
+        self.second = Choice.objects.create(question=self.question,
+                                            choice_text="Second")
+        self.users = [User.objects.create_user(username="user%d" % i)
+                      for i in range(6)]
+
+    def test_votes_go_to_shards(self):
+        """Test that votes skip the plain counters and sum across shards."""
+        for user in self.users:
+            Vote.objects.record_vote(user, self.question, self.first)
+        Vote.objects.record_vote(self.users[0], self.question, self.second)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.votes, 0)
+        self.assertEqual(self.question.shard_counts(),
+                         {self.first.pk: 5, self.second.pk: 1})
+        self.assertEqual(self.question.total_votes(), 6)
+        self.assertEqual([c.votes for c in self.question.results()], [5, 1])
+
+    def test_rebuild_folds_shards(self):
+        """Test that rebuilding moves shard counts into Choice.votes."""
+        for user in self.users[:3]:
+            Vote.objects.record_vote(user, self.question, self.second)
+        call_command('rebuild_vote_counts', stdout=StringIO(),
+                     stderr=StringIO())
+        self.assertFalse(ChoiceShard.objects.exists())
+        self.second.refresh_from_db()
+        self.question.refresh_from_db()
+        self.assertEqual(self.second.votes, 3)
+        self.assertEqual(self.question.vote_total, 3)
+
+    def test_unshard_folds_shards(self):
+        """Test that turning sharding off keeps the counted votes."""
+        for user in self.users[:3]:
+            Vote.objects.record_vote(user, self.question, self.second)
+        Vote.objects.record_vote(self.users[3], self.question, self.first)
+        self.question.counter_shards = 1
+        self.question.save()
+        self.assertFalse(ChoiceShard.objects.exists())
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.total_votes(), 4)
+        self.assertEqual([c.votes for c in self.question.results()], [1, 3])
+
+
+class UniqueVoteTests(TestCase):
+    """Unittests for the one-vote-per-user-and-question constraint."""
+
+    def setUp(self):
+        self.question = create_question("Question.", days=-1)
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="Only")
+        self.user = User.objects.create_user(username="lisbono")
+
+    def test_duplicate_vote_rejected(self):
+        """Test that the database refuses a second vote row."""
+        Vote.objects.create(user=self.user, question=self.question,
+                            selected_choice=self.choice)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.objects.create(user=self.user, question=self.question,
+                                selected_choice=self.choice)
+
+    def test_insert_if_absent(self):
+        """Test that the upsert inserts once and then reports a conflict."""
+        args = (self.user.pk, self.question.pk, self.choice.pk)
+        self.assertTrue(Vote.objects.insert_if_absent(*args))
+        self.assertFalse(Vote.objects.insert_if_absent(*args))
+        self.assertEqual(Vote.objects.count(), 1)
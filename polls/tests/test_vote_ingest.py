@@ -0,0 +1,85 @@
+"""Unittests for buffered vote ingestion."""
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from .. import ratelimit
+from ..ingest import get_spool
+from ..models import Question, Choice, Vote
+from .utils import create_question
+
+
+class BufferedVoteTests(TestCase):
+    """Unittests for the vote spool and the flush_votes command."""
+
+    def setUp(self):
+        ratelimit.get_store().reset()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(
+            POLLS_VOTE_INGESTION='buffered',
+            POLLS_VOTE_SPOOL=str(Path(directory) / 'spool.sqlite3'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.question = create_question("Question.", days=-1)
+        self.first = Choice.objects.create(question=self.question,
+                                           choice_text="First")
+        self.second = Choice.objects.create(question=self.question,
+                                            choice_text="Second")
+        self.user = User.objects.create_user(username="lisbono",
+                                             password="88998899")
+        self.client.login(username="lisbono", password="88998899")
+
+    def vote(self, choice):
+        """Post a vote for `choice`."""
+        url = reverse('polls:vote', args=(self.question.id,))
+        return self.client.post(url, {'choice': choice.id})
+
+    def test_vote_is_spooled(self):
+        """Test that a buffered vote waits in the spool until flushed."""
+        self.vote(self.first)
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual(get_spool().depth(), 1)
+        call_command('flush_votes', stdout=StringIO())
+        self.assertEqual(get_spool().depth(), 0)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.votes, 1)
+
+    def test_last_vote_wins(self):
+        """Test that the latest spooled ballot per user is the one kept."""
+        self.vote(self.first)
+        self.vote(self.second)
+        self.vote(self.first)
+        self.vote(self.second)
+        call_command('flush_votes', batch_size=3, stdout=StringIO())
+        vote = Vote.objects.get()
+        self.assertEqual(vote.selected_choice, self.second)
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.question.refresh_from_db()
+        self.assertEqual((self.first.votes, self.second.votes), (0, 1))
+        self.assertEqual(self.question.vote_total, 1)
+
+    def test_deleted_user_dropped(self):
+        """Test that a ballot whose user is gone is dropped, not retried."""
+        self.vote(self.first)
+        User.objects.filter(pk=self.user.pk).delete()
+        call_command('flush_votes', stdout=StringIO())
+        self.assertEqual(get_spool().depth(), 0)
+        self.assertFalse(Vote.objects.exists())
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.votes, 0)
+
+    def test_metrics(self):
+        """Test that flushing records its batch size and latency."""
+        self.vote(self.first)
+        get_spool().flush()
+        metrics = get_spool().metrics()
+        self.assertEqual(metrics['depth'], 0)
+        self.assertEqual(metrics['flushed_total'], 1)
+        self.assertIsNotNone(metrics['last_flush_ms'])
@@ -0,0 +1,81 @@
+"""Unittests for the per-session vote map used by the detail page."""
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from .. import ratelimit
+from ..models import Question, Choice, Vote
+from ..votestate import SESSION_KEY
+from .utils import create_question
+
+
+class VoteStateTests(TestCase):
+    """Unittests for showing the user's latest vote without queries."""
+
+    def setUp(self):
+        ratelimit.get_store().reset()
+        self.question = create_question("Question.", days=-1, end_date=5)
+        self.yes = Choice.objects.create(question=self.question,
+                                         choice_text="Yes")
+        self.no = Choice.objects.create(question=self.question,
+                                        choice_text="No")
+        self.user = User.objects.create_user(username="lisbono",
+                                             password="password")
+        self.url = reverse('polls:detail', args=(self.question.id,))
+
+    def test_login_fills_vote_map(self):
+        """Test that logging in stores the user's existing votes."""
+        Vote.objects.record_vote(self.user, self.question, self.no)
+        self.client.login(username="lisbono", password="password")
+        self.assertEqual(self.client.session[SESSION_KEY],
+                         {str(self.question.pk): self.no.pk})
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['voted_choice'], self.no)
+
+    def test_vote_updates_vote_map(self):
+        """Test that voting changes the latest vote shown on the detail page."""
+        self.client.force_login(self.user)
+        self.client.post(reverse('polls:vote', args=(self.question.id,)),
+                         {'choice': self.yes.pk})
+        self.assertEqual(self.client.session[SESSION_KEY],
+                         {str(self.question.pk): self.yes.pk})
+        self.assertContains(self.client.get(self.url),
+                            "Your lastest vote : Yes")
+
+    def test_detail_does_not_query_votes(self):
+        """Test that the detail page reads only the session, user and poll."""
+        Vote.objects.record_vote(self.user, self.question, self.no)
+        self.client.force_login(self.user)
+        # Session, user, question and its choices.
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertContains(response, "Your lastest vote : No")
+
+    def test_missing_vote_map_is_loaded(self):
+        """Test that sessions from before the map existed still work."""
+        Vote.objects.record_vote(self.user, self.question, self.yes)
+        self.client.force_login(self.user)
+        session = self.client.session
+        del session[SESSION_KEY]
+        session.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['voted_choice'], self.yes)
+
+    def test_vote_map_keeps_latest(self):
+        """Test that the map drops the oldest votes and older ones still show."""
+        others = [create_question("Other %d." % i, days=-1, end_date=5)
+                  for i in range(3)]
+        for other in others:
+            choice = Choice.objects.create(question=other, choice_text="Ok")
+            Vote.objects.record_vote(self.user, other, choice)
+        with self.settings(POLLS_SESSION_VOTES=2):
+            self.client.force_login(self.user)
+            self.assertEqual(list(self.client.session[SESSION_KEY]),
+                             [str(others[1].pk), str(others[2].pk)])
+            self.client.post(reverse('polls:vote', args=(self.question.id,)),
+                             {'choice': self.yes.pk})
+            self.assertEqual(list(self.client.session[SESSION_KEY]),
+                             [str(others[2].pk), str(self.question.pk)])
+            response = self.client.get(reverse('polls:detail',
+                                               args=(others[0].id,)))
+        self.assertContains(response, "Your lastest vote : Ok")
@@ -0,0 +1,116 @@
+"""Unittests for vote timestamps and the per-minute tally table."""
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from ..models import Question, Choice, Vote, VoteTally
+from .utils import create_question
+
+
+class VoteTallyTests(TestCase):
+    """Unittests for keeping VoteTally in step with the votes."""
+
+    def setUp(self):
+        self.question = create_question("Question.", days=-3, end_date=10)
+        self.yes = Choice.objects.create(question=self.question,
+                                         choice_text="Yes")
+        self.no = Choice.objects.create(question=self.question,
+                                        choice_text="No")
+        self.start = timezone.now().replace(minute=0, second=0,
+                                            microsecond=0) \
+            - datetime.timedelta(days=2)
+
+    def at(self, minutes):
+        """Return the time `minutes` after the start of the test data."""
+        return self.start + datetime.timedelta(minutes=minutes)
+
+    def tallies(self):
+        """Return ``{(choice_id, minute): count}`` of the non-empty tallies."""
+        return {(tally.choice_id, tally.minute): tally.count
+                for tally in VoteTally.objects.exclude(count=0)}
+
+    def test_vote_is_timestamped_and_tallied(self):
+        """Test that a vote records its time and counts in its minute."""
+        user = User.objects.create_user(username="user")
+        Vote.objects.record_vote(user, self.question, self.yes, self.at(1))
+        vote = Vote.objects.get(user=user)
+        self.assertEqual(vote.voted_at, self.at(1))
+        self.assertEqual(self.tallies(), {(self.yes.pk, self.at(1)): 1})
+
+    def test_changed_vote_moves_tally(self):
+        """Test that changing a vote takes it out of its old minute."""
+        user = User.objects.create_user(username="user")
+        Vote.objects.record_vote(user, self.question, self.yes, self.at(1))
+        Vote.objects.record_vote(user, self.question, self.no, self.at(90))
+        self.assertEqual(self.tallies(), {(self.no.pk, self.at(90)): 1})
+
+    def test_batch_uses_cast_time(self):
+        """Test that batched ballots are tallied in the minute they were cast."""
+        users = [User.objects.create_user(username="user%d" % i)
+                 for i in range(3)]
+        Vote.objects.record_batch([
+            (users[0].pk, self.question.pk, self.yes.pk, self.at(0)),
+            (users[1].pk, self.question.pk, self.yes.pk,
+             self.at(0) + datetime.timedelta(seconds=30)),
+            (users[2].pk, self.question.pk, self.no.pk, self.at(61)),
+        ])
+        self.assertEqual(self.tallies(), {(self.yes.pk, self.at(0)): 2,
+                                          (self.no.pk, self.at(61)): 1})
+        Vote.objects.record_batch([
+            (users[0].pk, self.question.pk, self.no.pk, self.at(62))])
+        self.assertEqual(self.tallies(), {(self.yes.pk, self.at(0)): 1,
+                                          (self.no.pk, self.at(61)): 1,
+                                          (self.no.pk, self.at(62)): 1})
+
+    def test_curve_in_one_query(self):
+        """Test that the vote curve is summed from the tallies in one query."""
+        for i in range(6):
+            user = User.objects.create_user(username="user%d" % i)
+            Vote.objects.record_vote(user, self.question, self.yes,
+                                     self.at(i * 30))
+        with self.assertNumQueries(1):
+            curve = list(self.question.vote_curve(step='hour'))
+        self.assertEqual([row['votes'] for row in curve], [2, 2, 2])
+        since = self.at(60)
+        self.assertEqual(sum(row['votes'] for row in self.question.vote_curve(
+            since, self.at(120), 'day')), 2)
+
+    def test_curve_api(self):
+        """Test the curve endpoint's buckets and its argument checks."""
+        user = User.objects.create_user(username="user")
+        Vote.objects.record_vote(user, self.question, self.yes, self.at(5))
+        url = reverse('polls:api_curve', args=(self.question.pk,))
+        data = self.client.get(url, {'step': 'minute'}).json()
+        self.assertEqual(len(data['buckets']), 1)
+        self.assertEqual(data['buckets'][0]['votes'], {str(self.yes.pk): 1})
+        self.assertEqual(self.client.get(url, {'step': 'week'}).status_code,
+                         400)
+        self.assertEqual(self.client.get(url, {'since': 'soon'}).status_code,
+                         400)
+
+    def test_sharded_question_spreads_tallies(self):
+        """Test that a sharded poll's tallies still sum to its curve."""
+        Question.objects.filter(pk=self.question.pk).update(counter_shards=4)
+        self.question.refresh_from_db()
+        for i in range(20):
+            user = User.objects.create_user(username="user%d" % i)
+            Vote.objects.record_vote(user, self.question, self.yes,
+                                     self.at(1))
+        rows = VoteTally.objects.filter(choice=self.yes)
+        self.assertLessEqual(rows.count(), 4)
+        self.assertTrue(all(row.shard < 4 for row in rows))
+        self.assertEqual([row['votes'] for row in
+                          self.question.vote_curve(step='minute')], [20])
+
+    def test_rebuild_recounts_tallies(self):
+        """Test that rebuild_vote_counts restores lost tallies."""
+        user = User.objects.create_user(username="user")
+        Vote.objects.record_vote(user, self.question, self.yes, self.at(1))
+        VoteTally.objects.all().delete()
+        call_command('rebuild_vote_counts', stdout=StringIO(),
+                     stderr=StringIO())
+        self.assertEqual(self.tallies(), {(self.yes.pk, self.at(1)): 1})
@@ -0,0 +1,148 @@
+"""Unittests for the export_votes and import_votes commands."""
+import datetime
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from .. import transfer
+from ..models import Question, Choice, Vote
+from .utils import create_question
+
+
+class VoteTransferTests(TestCase):
+    """Unittests for moving polls data between databases."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.question = create_question("Question.", days=-1, end_date=5)
+        self.yes = Choice.objects.create(question=self.question,
+                                         choice_text="Yes")
+        self.no = Choice.objects.create(question=self.question,
+                                        choice_text="No")
+        for i, choice in enumerate([self.yes, self.yes, self.no]):
+            user = User.objects.create_user(username="user%d" % i)
+            Vote.objects.record_vote(user, self.question, choice)
+
+    def round_trip(self, filename, **options):
+        """Export, wipe the polls tables and import the file again."""
+        path = os.path.join(self.directory, filename)
+        call_command('export_votes', output=path, batch_size=2,
+                     stderr=StringIO())
+        Question.objects.all().delete()
+        out = StringIO()
+        call_command('import_votes', path, batch_size=2, stdout=out,
+                     stderr=StringIO(), **options)
+        return out.getvalue()
+
+    def assert_restored(self):
+        """Check that the poll, its votes and its counters came back."""
+        question = Question.objects.get(pk=self.question.pk)
+        self.assertEqual(question.question_text, "Question.")
+        self.assertEqual(question.end_date, self.question.end_date)
+        self.assertEqual(question.vote_total, 3)
+        self.assertEqual([c.votes for c in question.choice_set.order_by('pk')],
+                         [2, 1])
+        self.assertEqual(Vote.objects.filter(
+            selected_choice=self.yes.pk).count(), 2)
+
+    def test_ndjson_round_trip(self):
+        """Test that an NDJSON export imports back unchanged."""
+        output = self.round_trip('votes.ndjson')
+        self.assert_restored()
+        self.assertIn("3 vote(s)", output)
+
+    def test_compressed_csv_round_trip(self):
+        """Test that a gzipped CSV export imports back unchanged."""
+        self.round_trip('votes.csv.gz')
+        self.assert_restored()
+
+    def test_import_skips_existing_rows(self):
+        """Test that importing into a database that has the data is a no-op."""
+        path = os.path.join(self.directory, 'votes.ndjson')
+        call_command('export_votes', output=path, stderr=StringIO())
+        call_command('import_votes', path, stdout=StringIO(),
+                     stderr=StringIO())
+        self.assertEqual(Question.objects.count(), 1)
+        self.assertEqual(Vote.objects.count(), 3)
+        self.assert_restored()
+
+    def test_unknown_users(self):
+        """Test that votes of missing users are skipped unless created."""
+        path = os.path.join(self.directory, 'votes.ndjson')
+        call_command('export_votes', output=path, stderr=StringIO())
+        Question.objects.all().delete()
+        User.objects.filter(username="user2").delete()
+        output = StringIO()
+        call_command('import_votes', path, stdout=output, stderr=StringIO())
+        self.assertIn("skipped 1 vote(s)", output.getvalue())
+        self.assertEqual(Vote.objects.count(), 2)
+        call_command('import_votes', path, create_users=True,
+                     stdout=StringIO(), stderr=StringIO())
+        self.assertTrue(User.objects.filter(username="user2").exists())
+        self.assert_restored()
+
+    def test_taken_ids_are_replaced(self):
+        """Test that rows whose ids are taken here get new ids."""
+        path = os.path.join(self.directory, 'votes.ndjson')
+        call_command('export_votes', output=path, stderr=StringIO())
+        Question.objects.all().delete()
+        other = Question.objects.create(
+            pk=self.question.pk, question_text="Other.",
+            pub_date=timezone.now())
+        Choice.objects.create(pk=self.yes.pk, question=other,
+                              choice_text="Maybe")
+        call_command('import_votes', path, stdout=StringIO(),
+                     stderr=StringIO())
+        self.assertFalse(other.choice_set.exclude(choice_text="Maybe")
+                         .exists())
+        self.assertEqual(Vote.objects.filter(question=other).count(), 0)
+        imported = Question.objects.get(question_text="Question.")
+        self.assertNotEqual(imported.pk, other.pk)
+        self.assertEqual(imported.vote_total, 3)
+        self.assertEqual(
+            {(c.choice_text, c.votes) for c in imported.choice_set.all()},
+            {("Yes", 2), ("No", 1)})
+        newer = create_question("Newer.", days=-1, end_date=5)
+        self.assertGreater(newer.pk, imported.pk)
+
+    def test_anonymous_votes_imported_once(self):
+        """Test that re-importing keeps one copy of each anonymous vote."""
+        voted_at = timezone.now()
+        Vote.objects.bulk_create([
+            Vote(question=self.question, selected_choice=self.no,
+                 voted_at=voted_at) for _ in range(2)])
+        path = os.path.join(self.directory, 'votes.ndjson')
+        call_command('export_votes', output=path, stderr=StringIO())
+        for _ in range(2):
+            call_command('import_votes', path, batch_size=1,
+                         stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(Vote.objects.filter(user=None).count(), 2)
+
+    def test_anonymous_votes_forgotten_per_question(self):
+        """Test that the importer only remembers the current question."""
+        other = create_question("Other.", days=-1, end_date=5)
+        maybe = Choice.objects.create(question=other, choice_text="Maybe")
+        voted_at = timezone.now()
+        Vote.objects.bulk_create([
+            Vote(question=question, selected_choice=choice,
+                 voted_at=voted_at + datetime.timedelta(seconds=i))
+            for i in range(3)
+            for question, choice in [(other, maybe),
+                                     (self.question, self.no)]])
+        rows = [row for row in transfer.export_rows()
+                if row['model'] == 'vote']
+        self.assertEqual([row['question'] for row in rows],
+                         [self.question.pk] * 6 + [other.pk] * 3)
+        Vote.objects.filter(user=None).delete()
+        importer = transfer.Importer(batch_size=2)
+        for row in rows:
+            importer.add(row)
+        importer.flush()
+        self.assertEqual({key[0] for key in importer.anonymous}, {other.pk})
+        self.assertEqual(Vote.objects.filter(user=None).count(), 6)
@@ -0,0 +1,13 @@
+"""Helpers shared by the polls unittests."""
+import datetime
+
+from django.utils import timezone
+from ..models import Question
+
+
+def create_question(question_text, days, end_date=7):
+    """Create a question published `days` from now, closing `end_date` later."""
+    pub_time = timezone.now() + datetime.timedelta(days=days)
+    end_time = pub_time + datetime.timedelta(days=end_date)
+    return Question.objects.create(question_text=question_text,
+                                   pub_date=pub_time, end_date=end_time)
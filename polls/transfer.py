@@ -0,0 +1,250 @@
+"""Streaming export and import of questions, choices and votes.
+
+Rows are plain dicts with a ``model`` key, written as NDJSON or CSV in
+the order questions, choices, votes, with the votes grouped by question.
+Both directions work in fixed-size batches, so memory use does not grow
+with the number of votes. Question and choice ids are kept as exported
+where they are free, and votes name their user by username so they can
+move between databases.
+"""
+import csv
+import json
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connections, router
+from django.utils.dateparse import parse_datetime
+
+from .models import Question, Choice, Vote
+
+BATCH_SIZE = 2000
+CSV_FIELDS = ['model', 'id', 'question', 'text', 'pub_date', 'end_date',
+              'counter_shards', 'choice', 'user', 'voted_at']
+
+
+def export_rows(question_ids=None, batch_size=BATCH_SIZE):
+    """Yield every question, choice and vote as a dict.
+
+    Votes come grouped by question, which lets ``Importer`` forget a
+    question's anonymous votes once it has moved on.
+    """
+    questions = Question.objects.order_by('pk')
+    choices = Choice.objects.order_by('pk')
+    votes = Vote.objects.order_by('question', 'pk')
+    if question_ids:
+        questions = questions.filter(pk__in=question_ids)
+        choices = choices.filter(question__in=question_ids)
+        votes = votes.filter(question__in=question_ids)
+    for pk, text, pub_date, end_date, shards in questions.values_list(
+            'pk', 'question_text', 'pub_date', 'end_date', 'counter_shards')\
+            .iterator(chunk_size=batch_size):
+        yield {'model': 'question', 'id': pk, 'text': text,
+               'pub_date': pub_date.isoformat(),
+               'end_date': end_date and end_date.isoformat(),
+               'counter_shards': shards}
+    for pk, question_id, text in choices.values_list(
+            'pk', 'question', 'choice_text').iterator(chunk_size=batch_size):
+        yield {'model': 'choice', 'id': pk, 'question': question_id,
+               'text': text}
+    for question_id, choice_id, username, voted_at in votes.values_list(
+            'question', 'selected_choice', 'user__username', 'voted_at')\
+            .iterator(chunk_size=batch_size):
+        yield {'model': 'vote', 'question': question_id, 'choice': choice_id,
+               'user': username,
+               'voted_at': voted_at and voted_at.isoformat()}
+
+
+def write_ndjson(rows, stream):
+    """Write `rows` to `stream`, one JSON object per line."""
+    for row in rows:
+        stream.write(json.dumps(row) + '\n')
+
+
+def write_csv(rows, stream):
+    """Write `rows` to `stream` as CSV with the ``CSV_FIELDS`` header."""
+    writer = csv.DictWriter(stream, CSV_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+
+
+def read_ndjson(stream):
+    """Yield the rows of an NDJSON export."""
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(stream):
+    """Yield the rows of a CSV export, with empty cells as None."""
+    for row in csv.DictReader(stream):
+        yield {key: value if value != '' else None
+               for key, value in row.items()}
+
+
+class Importer:
+    """Write exported rows back in batches, skipping rows that exist.
+
+    A question or choice whose id is taken here by a row with the same
+    text (and, for questions, the same pub_date) is the same row and is
+    skipped. One whose id is taken by a different row is inserted under a
+    new id, and the rows that refer to it follow. Votes are matched on
+    user and question, or for anonymous votes on question, choice and
+    time, so importing a file twice adds nothing. That relies on the
+    votes being grouped by question, as ``export_rows`` writes them.
+
+    ``counts`` tallies what was read per model, plus ``skipped`` votes
+    whose user is unknown (unless ``create_users`` is set).
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, create_users=False):
+        self.batch_size = batch_size
+        self.create_users = create_users
+        self.pending = []
+        self.model = None
+        self.counts = {'question': 0, 'choice': 0, 'vote': 0, 'skipped': 0}
+        # Exported id -> id here, for the rows that had to move.
+        self.question_ids = {}
+        self.choice_ids = {}
+        # (question, choice, voted_at) -> [rows here before, rows read],
+        # for the question the last batch ended on.
+        self.anonymous = {}
+
+    def add(self, row):
+        """Queue one row, writing the batch when full or the model changes."""
+        if row['model'] != self.model:
+            self.flush()
+            self.model = row['model']
+        self.pending.append(row)
+        self.counts[row['model']] += 1
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write the queued rows."""
+        if self.pending:
+            getattr(self, 'write_%ss' % self.model)(self.pending)
+            self.pending = []
+
+    def reset_sequences(self):
+        """Move the id sequences past the ids inserted explicitly."""
+        using = router.db_for_write(Question)
+        connection = connections[using]
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [Question, Choice, Vote])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def write_rows(self, model, objects, same, moved):
+        """Insert `objects` under their ids, or new ones where taken.
+
+        `same(existing, obj)` tells whether the row already holding an id
+        is `obj`; the new id of each moved object is recorded in `moved`.
+        """
+        existing = model.objects.in_bulk([obj.pk for obj in objects])
+        fresh = []
+        for obj in objects:
+            current = existing.get(obj.pk)
+            if current is None:
+                fresh.append(obj)
+            elif not same(current, obj):
+                exported = obj.pk
+                obj.pk = None
+                obj.save()
+                moved[exported] = obj.pk
+        model.objects.bulk_create(fresh)
+
+    def write_questions(self, rows):
+        """Insert a batch of questions, with the status their dates give."""
+        questions = [Question(
+            pk=int(row['id']), question_text=row['text'],
+            pub_date=parse_datetime(row['pub_date']),
+            end_date=row['end_date'] and parse_datetime(row['end_date']),
+            counter_shards=int(row['counter_shards'] or 1))
+            for row in rows]
+        for question in questions:
+            question.status = question.status_at()
+        self.write_rows(
+            Question, questions,
+            lambda current, new: (current.question_text, current.pub_date)
+            == (new.question_text, new.pub_date),
+            self.question_ids)
+
+    def write_choices(self, rows):
+        """Insert a batch of choices."""
+        choices = []
+        for row in rows:
+            question_id = int(row['question'])
+            choices.append(Choice(
+                pk=int(row['id']),
+                question_id=self.question_ids.get(question_id, question_id),
+                choice_text=row['text']))
+        self.write_rows(
+            Choice, choices,
+            lambda current, new: (current.question_id, current.choice_text)
+            == (new.question_id, new.choice_text),
+            self.choice_ids)
+
+    def write_votes(self, rows):
+        """Insert a batch of votes, resolving usernames to user ids."""
+        usernames = {row['user'] for row in rows if row['user']}
+        users = dict(User.objects.filter(username__in=usernames)
+                     .values_list('username', 'pk'))
+        missing = usernames - set(users)
+        if missing and self.create_users:
+            User.objects.bulk_create([User(username=username)
+                                      for username in missing],
+                                     ignore_conflicts=True)
+            users.update(User.objects.filter(username__in=missing)
+                         .values_list('username', 'pk'))
+        votes = []
+        for row in rows:
+            if row['user'] and row['user'] not in users:
+                self.counts['skipped'] += 1
+                continue
+            question_id = int(row['question'])
+            choice_id = int(row['choice'])
+            voted_at = row.get('voted_at')
+            votes.append(Vote(
+                question_id=self.question_ids.get(question_id, question_id),
+                selected_choice_id=self.choice_ids.get(choice_id, choice_id),
+                user_id=users.get(row['user']),
+                voted_at=parse_datetime(voted_at) if voted_at else None))
+        if votes:
+            # Votes are grouped by question, so only the one the last batch
+            # ended on can carry on into this one.
+            self.anonymous = {
+                vote_key: tally
+                for vote_key, tally in self.anonymous.items()
+                if vote_key[0] == votes[0].question_id}
+        votes = [vote for vote in votes if vote.user_id] \
+            + self.new_anonymous([vote for vote in votes if not vote.user_id])
+        # A user's vote on a question already here is a unique conflict.
+        Vote.objects.bulk_create(votes, ignore_conflicts=True)
+
+    def new_anonymous(self, votes):
+        """Return the anonymous `votes` that are not here yet.
+
+        Identical anonymous votes are told apart by how many of them the
+        file holds beyond those that were here before the import.
+        """
+        def key(vote):
+            return vote.question_id, vote.selected_choice_id, vote.voted_at
+        unseen = {key(vote) for vote in votes} - set(self.anonymous)
+        if unseen:
+            here = Counter(Vote.objects.filter(
+                user__isnull=True,
+                question__in={question for question, _, _ in unseen},
+            ).values_list('question', 'selected_choice', 'voted_at')\
+                .iterator())
+            for vote_key in unseen:
+                self.anonymous[vote_key] = [here[vote_key], 0]
+        new = []
+        for vote in votes:
+            tally = self.anonymous[key(vote)]
+            tally[1] += 1
+            if tally[1] > tally[0]:
+                new.append(vote)
+        return new
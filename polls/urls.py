@@ -1,11 +1,27 @@
 """Urls link for polls app."""
 from django.urls import include, path
-from . import views
+from . import api, async_views, views
 
 app_name = 'polls'
+shared_urlpatterns = [
+    path('<int:pk>/stream/', views.results_stream, name='stream'),
+    path('profiling/', views.profiling_report, name='profiling'),
+    path('api/questions/', api.question_list, name='api_questions'),
+    path('api/questions/<int:pk>/results/', api.question_results,
+         name='api_results'),
+    path('api/questions/<int:pk>/curve/', api.question_curve,
+         name='api_curve'),
+]
 urlpatterns = [
     path('', views.IndexView.as_view(), name='index'),
     path('<int:question_id>/', views.polls_navigate, name='detail'),
     path('<int:pk>/results/', views.ResultsView.as_view(), name='results'),
     path('<int:question_id>/vote/', views.vote, name='vote'),
-]
+] + shared_urlpatterns
+# Served instead of urlpatterns under POLLS_ASYNC_VIEWS.
+async_urlpatterns = [
+    path('', async_views.index, name='index'),
+    path('<int:question_id>/', async_views.polls_navigate, name='detail'),
+    path('<int:pk>/results/', async_views.results, name='results'),
+    path('<int:question_id>/vote/', async_views.vote, name='vote'),
+] + shared_urlpatterns
@@ -0,0 +1,15 @@
+"""Small helpers shared by the polls commands and benchmarks."""
+
+BATCH_SIZE = 1000
+
+
+def chunks(iterable, size=BATCH_SIZE):
+    """Yield lists of up to `size` items from `iterable`."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
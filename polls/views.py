@@ -1,52 +1,23 @@
 """Views for polls app' pages."""
-from datetime import datetime
-import logging
-
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.signals import user_logged_in, user_logged_out, user_login_failed
-from django.dispatch import receiver
-from django.http import HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+from django.http.response import HttpResponseBase
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from .models import Question, Choice, Vote
+from . import (api, audit, caching, hotpolls, ingest, live, profiling,
+               routers, votestate)
+from .ratelimit import limit_votes
 
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.http import condition
 from django.contrib import messages
 
-logging.basicConfig(level=logging.INFO)
-log = logging.getLogger("polls")
-
-
-# def get_client_ip(request):
-#     """ Method for getting user’s IP address."""
-#     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-#     if x_forwarded_for:
-#         ip = x_forwarded_for.split(',')[0]
-#     else:
-#         ip = request.META.get('REMOTE_ADDR')
-#     return ip
-# 
-# 
-# @receiver(user_logged_in)
-# def check_login(sender, request, user, **kwargs):
-#     """log when login success"""
-#     log.info("IP address: %s, %s Login at %s", get_client_ip(request),user, str(datetime.now()))
-# 
-# 
-# @receiver(user_login_failed)
-# def check_login_fail(sender, request, **kwargs):
-#     """log when login fail"""
-#     log.warning("IP address: %s:  Trying to Login at %s", 
-#                 get_client_ip(request), str(datetime.now()))
-# 
-# 
-# @receiver(user_logged_out)
-# def check_logout(sender, request, user, **kwargs):
-#     """log when logout success"""
-#     log.info("IP address: %s, %s Logout at %s", 
-#              get_client_ip(request), user, str(datetime.now()))
-
 
 class IndexView(generic.ListView):
     """View the index page."""
@@ -55,10 +26,39 @@ class IndexView(generic.ListView):
     context_object_name = 'latest_question_list'
 
     def get_queryset(self):
-        """Return published Question(s)."""
-        return Question.objects.filter(
-            pub_date__lte=timezone.now()
-        ).order_by('-pub_date')
+        """Return a cached page of published Question(s)."""
+        questions, self.next_cursor, self.page_key = caching.index_page(
+            self.request.GET.get('before'))
+        return questions
+
+    def get_context_data(self, **kwargs):
+        """Add the cursor of the next page and the page's fragment key."""
+        context = super().get_context_data(**kwargs)
+        context['next_cursor'] = self.next_cursor
+        context['fragment_key'] = self.page_key
+        context['fragment_timeout'] = settings.POLLS_FRAGMENT_CACHE_TIMEOUT
+        return context
+
+
+def detail_context(request, question, **context):
+    """Return the detail page context, with the user's latest vote.
+
+    The choices come from the cache until the question is edited. The
+    vote comes from the session's vote map and is matched against them,
+    so it costs no query of its own.
+    """
+    choices = caching.question_choices(question)
+    voted = votestate.voted_choice(request, question.pk)
+    context.update({
+        'question': question,
+        'choices': choices,
+        'fragment_key': caching.question_key(question,
+                                             question.edit_version),
+        'fragment_timeout': settings.POLLS_FRAGMENT_CACHE_TIMEOUT,
+        'voted_choice': next((choice for choice in choices
+                              if choice.pk == voted), None),
+    })
+    return context
 
 
 class DetailView(generic.DetailView):
@@ -72,42 +72,120 @@ class DetailView(generic.DetailView):
         return Question.objects.filter(pub_date__lte=timezone.now())\
             .order_by('-pub_date')
 
+    def get_context_data(self, **kwargs):
+        """Add the choices and the user's latest vote."""
+        context = super().get_context_data(**kwargs)
+        return detail_context(self.request, self.object, **context)
 
+
+@method_decorator(condition(etag_func=api.results_etag('html'),
+                            last_modified_func=api.results_last_modified),
+                  name='get')
 class ResultsView(generic.DetailView):
     """View the result page."""
 
     model = Question
     template_name = 'polls/results.html'
 
-@login_required()
-def vote(request, question_id):
-    """Vote mechanism for polls app."""
+    def get_object(self, queryset=None):
+        """Reuse the question loaded for the conditional headers."""
+        question = api.results_state(self.request, self.kwargs['pk'])[2]
+        hotpolls.tracker.hit(question.pk)
+        return question
+
+    def get_context_data(self, **kwargs):
+        """Add the choices with their counts and percentages.
+
+        They are only loaded if the cached results table is missing, and
+        only counted once per results version.
+        """
+        context = super().get_context_data(**kwargs)
+        question = self.object
+        version = api.results_state(self.request, question.pk)[0]
+        context['choices'] = SimpleLazyObject(
+            lambda: caching.question_results(question, version))
+        context['total_votes'] = SimpleLazyObject(question.total_votes)
+        context['fragment_key'] = caching.question_key(question, version)
+        context['fragment_timeout'] = settings.POLLS_FRAGMENT_CACHE_TIMEOUT
+        return context
+
+def cast_vote(request, question_id):
+    """Record the vote posted in `request`; return a response or a context.
+
+    A closed poll or a counted vote gets a redirect, and a missing or
+    unknown choice the detail page context with an error message.
+    """
     question = get_object_or_404(Question, pk=question_id)
+    if not question.can_vote():
+        # Closed polls keep frozen results, so late ballots are refused.
+        messages.warning(request, "Poll expired!, please choose another one")
+        return redirect('polls:index')
     try:
         selected_choice = question.choice_set.get(pk=request.POST['choice'])
     except (KeyError, Choice.DoesNotExist):
-        return render(request, 'polls/detail.html', {
-            'question': question,
-            'error_message': "You didn't select a choice.",
-        })
+        return detail_context(request, question,
+                              error_message="You didn't select a choice.")
+    if ingest.is_buffered():
+        ingest.get_spool().put(request.user.pk, question.pk,
+                               selected_choice.pk)
     else:
-        Vote.objects.update_or_create(user=request.user, question=question, defaults={'selected_choice': selected_choice})
-        # Always return an HttpResponseRedirect after successfully dealing
-        # with POST data. This prevents data from being posted twice if a
-        # user hits the Back button.
-        log_vote = logging.getLogger("polls")
-        log_vote.info("%s, Poll's ID: %d, at: %s.", request.user, question_id, str(datetime.now()))
-        return HttpResponseRedirect(reverse('polls:results',
-                                            args=(question.id,)))
+        Vote.objects.record_vote(request.user, question, selected_choice)
+    votestate.remember(request, question.pk, selected_choice.pk)
+    audit.event('vote', request, user=request.user.get_username(),
+                question=question.pk, choice=selected_choice.pk)
+    # Always return an HttpResponseRedirect after successfully dealing
+    # with POST data. This prevents data from being posted twice if a
+    # user hits the Back button.
+    return routers.pin_response(HttpResponseRedirect(
+        reverse('polls:results', args=(question.id,))))
+
+
+def navigate(request, question_id):
+    """Return the detail page context, or a redirect if the poll is closed."""
+    question = get_object_or_404(Question, pk=question_id)
+    hotpolls.tracker.hit(question.pk)
+    if not question.can_vote():
+        messages.warning(request, "Poll expired!, please choose another one")
+        return redirect('polls:index')
+    return detail_context(request, question)
+
+
+def respond(request, outcome):
+    """Return `outcome` if it is a response, else render the detail page."""
+    if isinstance(outcome, HttpResponseBase):
+        return outcome
+    return render(request, 'polls/detail.html', outcome)
+
+
+@limit_votes
+@login_required()
+def vote(request, question_id):
+    """Vote mechanism for polls app."""
+    return respond(request, cast_vote(request, question_id))
 
 
 @login_required()
 def polls_navigate(request, question_id):
     """Navigate to index if poll expired if not go to its detail."""
-    question = Question.objects.get(pk=question_id)
-    last_vote = Vote.objects.filter(question=question, user=request.user).first()
-    if not question.can_vote():
-        messages.warning(request, "Poll expired!, please choose another one")
-        return redirect('polls:index')
-    elif question.can_vote():
-        return render(request, 'polls/detail.html', {'question': question,'last_vote': last_vote})
+    return respond(request, navigate(request, question_id))
+
+
+def results_stream(request, pk):
+    """Send one results snapshot when not served by the ASGI stream.
+
+    Under ASGI, ``LiveResultsRouter`` answers this URL with a long-lived
+    stream. Under WSGI the browser gets one event and a retry delay, so
+    EventSource falls back to polling.
+    """
+    question = get_object_or_404(Question, pk=pk)
+    tallies = live.read_tallies([question.pk])[question.pk]
+    body = b'retry: 5000\n' + live.sse_event('snapshot', tallies)
+    response = HttpResponse(body, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@staff_member_required
+def profiling_report(request):
+    """Show the per-view timings gathered by ProfilingMiddleware."""
+    return JsonResponse(profiling.registry.report())
@@ -0,0 +1,64 @@
+"""Per-session record of which choice the user voted for in each poll.
+
+The ``{question_id: choice_id}`` map lives in the session. It is filled
+from the Vote table when the user logs in and updated by the vote view,
+so the detail page shows the user's latest vote without a query. Votes
+cast from another session show up at the next login.
+
+Only the ``POLLS_SESSION_VOTES`` most recent votes are kept, oldest
+first, so a prolific voter's session stays small; a poll missing from a
+full map is looked up in the Vote table instead.
+"""
+from django.conf import settings
+from django.db.models import F
+
+from .models import Vote
+
+SESSION_KEY = 'polls_votes'
+
+
+def limit():
+    """Return how many votes a session's map keeps."""
+    return getattr(settings, 'POLLS_SESSION_VOTES', 200)
+
+
+def load(user):
+    """Return the user's latest votes as ``{str(question_id): choice_id}``."""
+    latest = Vote.objects.filter(user=user)\
+        .order_by(F('voted_at').desc(nulls_last=True), '-pk')\
+        .values_list('question', 'selected_choice')[:limit()]
+    return {str(question_id): choice_id
+            for question_id, choice_id in reversed(latest)}
+
+
+def votes(request):
+    """Return the session's map, loading it first if it is missing."""
+    state = request.session.get(SESSION_KEY)
+    if state is None:
+        state = request.session[SESSION_KEY] = load(request.user)
+    return state
+
+
+def fill_on_login(sender, request, user, **kwargs):
+    """Store the user's votes in the new session."""
+    if request is not None and hasattr(request, 'session'):
+        request.session[SESSION_KEY] = load(user)
+
+
+def voted_choice(request, question_id):
+    """Return the id of the choice the user picked, or None."""
+    state = votes(request)
+    if str(question_id) in state or len(state) < limit():
+        return state.get(str(question_id))
+    return Vote.objects.filter(user=request.user, question_id=question_id)\
+        .values_list('selected_choice', flat=True).first()
+
+
+def remember(request, question_id, choice_id):
+    """Record that the user just voted for `choice_id`."""
+    state = votes(request)
+    state.pop(str(question_id), None)
+    state[str(question_id)] = choice_id
+    for key in list(state)[:len(state) - limit()]:
+        del state[key]
+    request.session.modified = True